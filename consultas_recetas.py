@@ -8,7 +8,9 @@ django.setup()
 
 
 from recetario_app.models import Chef, Recipe, Restaurant, RecipeStats, RestaurantConfig
-from django.db.models import Count, F, ExpressionWrapper, FloatField
+from django.db.models import F
+from recetario_app.querywatch import query_watch
+from recetario_app.services import sync_menus
 
 """
 Trabajo de Django ORM - Consultas sobre Recetas y Restaurantes
@@ -86,16 +88,20 @@ Objetivo: Realizar consultas que atraviesen relaciones entre modelos.
 """
 
 # 4.1 Encuentra todas las recetas disponibles en restaurantes ubicados en Londres.
-""" Filtro por el campo location del restaurante de la receta y uso distinct para evitar duplicados"""
-recipes_londres = Recipe.objects.filter(restaurants__location="Londres").distinct()
+""" Filtro por el campo location del restaurante de la receta. available_in() hace un semijoin sobre la tabla
+intermedia en lugar de JOIN + distinct() (EXISTS en PostgreSQL, id IN (SELECT ...) en SQLite): la receta sale una
+vez aunque esté en varios restaurantes de Londres """
+recipes_londres = Recipe.objects.available_in(location="Londres")
 
 # 4.2 Lista los chefs que tienen al menos una receta disponible en "Hell's Kitchen".
-""" Busco que en el campo nombre del restaurante de la receta del chef esté 'Hell's Kitchen' y uso distinct para evitar duplicados"""
-hells_kitchen_chefs = Chef.objects.filter(recipe__restaurants__name="Hell's Kitchen").distinct()
+""" Busco que en el campo nombre del restaurante de la receta del chef esté 'Hell's Kitchen'; with_recipe_in()
+lee la tabla ChefRestaurant (un par chef-restaurante por fila), así que no hace falta distinct para evitar duplicados"""
+hells_kitchen_chefs = Chef.objects.with_recipe_in(name="Hell's Kitchen")
 
 # 4.3 Filtra restaurantes que tienen más de 5 recetas en su menú.
-""" Uso annotate para obtener los restaurantes con un conteo de sus recetas y filtro para obtener los que tengan >5 recetas"""
-restaurantes_muchas_recetas = Restaurant.objects.annotate(recipe_count=Count('recipe')).filter(recipe_count__gt=5)
+""" Restaurant guarda el número de recetas de su menú en recipe_count (se mantiene con señales), así que basta con
+filtrar por el campo indexado en lugar de agrupar toda la tabla intermedia con annotate(Count('recipe')) """
+restaurantes_muchas_recetas = Restaurant.objects.filter(recipe_count__gt=5)
 
 """
 -------------------------------------------------------------------------------------------------
@@ -115,8 +121,11 @@ RecipeStats.objects.update(total_orders=F('total_orders') + 10)
 # 5.3 Calcula el porcentaje de opiniones positivas para cada receta.
 """ He usado ExpressionWrapper porque quiero que el resultado se guarde como Float para que el resultado semuestre correctamente,
 además he multiplicado primero para que los valores se conviertan a Float ya que positive_review y total_orders son enteros. 
-Si divido primero y luego multiplico por 100 daría un resultado incorrecto """
-porcentajes_opiniones_positivas = RecipeStats.objects.annotate(positive_percentage=ExpressionWrapper(F('positive_reviews') * 100.0 / F('total_orders'),output_field=FloatField()))
+Si divido primero y luego multiplico por 100 daría un resultado incorrecto.
+Ahora ese cálculo es el campo generado positive_percentage: lo guarda la base de datos en cada
+escritura (también en los update() con F de la sección 5.2 y del reto) y está indexado. """
+porcentajes_opiniones_positivas = RecipeStats.objects.values('recipe__title', 'positive_percentage')
+mejor_valoradas = RecipeStats.objects.leaderboard()[:10]
 
 """
 -------------------------------------------------------------------------------------------------
@@ -225,14 +234,21 @@ tarta = Recipe.objects.get(title="Tarta de chocolate con espuma de frambuesa")
 paella = Recipe.objects.get(title="Paella de mariscos")
 bacalao = Recipe.objects.get(title="Bacalao con musgo y hierbas")
 
-beef_wellington.restaurants.add(hells_kitchen, savoy)
-tortellini.restaurants.add(osteria)
-cordero.restaurants.add(celler)
-pato.restaurants.add(noma)
-helado.restaurants.add(fat_duck)
-tarta.restaurants.add(fat_duck)
-paella.restaurants.add(diverxo)
-bacalao.restaurants.add(noma, tickets)
+""" Una sola llamada a sync_menus en lugar de un restaurants.add() por receta: lee los menús actuales de esos
+restaurantes e inserta en bloque los enlaces que faltan (prune=False conserva el resto del menú) """
+sync_menus(
+    {
+        hells_kitchen.pk: [beef_wellington.pk],
+        savoy.pk: [beef_wellington.pk],
+        osteria.pk: [tortellini.pk],
+        celler.pk: [cordero.pk],
+        noma.pk: [pato.pk, bacalao.pk],
+        fat_duck.pk: [helado.pk, tarta.pk],
+        diverxo.pk: [paella.pk],
+        tickets.pk: [bacalao.pk],
+    },
+    prune=False,
+)
 
 stats = [
     RecipeStats(recipe=beef_wellington, total_orders=500, positive_reviews=450),
@@ -291,38 +307,42 @@ Consulta recetas específicas atravesando relaciones con chefs y restaurantes:
 """
 
 # i. Encuentra todas las recetas creadas por un chef con una especialidad específica
+""" receta.chef se carga con una consulta por receta (N+1); query_watch lo muestra.
+Con .select_related("chef") todo se resuelve en una sola consulta. """
 recetas_espanolas = Recipe.objects.filter(chef__specialty="Cocina española")
-for receta in recetas_espanolas:
-    print(f"- {receta.title} (Chef: {receta.chef.name})")
+with query_watch(threshold=2) as informe:
+    for receta in recetas_espanolas:
+        print(f"- {receta.title} (Chef: {receta.chef.name})")
+print(informe.summary())
 
 # ii. Lista todas las recetas que están disponibles en un restaurante ubicado en "Madrid"
-recetas_madrid = Recipe.objects.filter(restaurants__location="Madrid").distinct()
+recetas_madrid = Recipe.objects.available_in(location="Madrid")
 for receta in recetas_madrid:
     print(f"- {receta.title}")
 
 # iii. Encuentra todas las recetas de un chef llamado "Gordon Ramsay" que están en el restaurante "Hell's Kitchen"
 """ Se debe cumplir que nombre del chef y el nombre del restaurante sean los correctos """
-recetas_gordon_hk = Recipe.objects.filter(chef__name="Gordon Ramsay", restaurants__name="Hell's Kitchen").distinct()
+recetas_gordon_hk = Recipe.objects.filter(chef__name="Gordon Ramsay").available_in(name="Hell's Kitchen")
 for receta in recetas_gordon_hk:
     print(f"- {receta.title}")
 
 # iv. Lista todos los chefs que tienen al menos una receta en un restaurante en "Barcelona"
 """ Busco la location del restaurante de la receta y si hay recetas que tengan un restaurante en Barcelona me devuelve el resultado """
-chefs_barcelona = Chef.objects.filter(recipe__restaurants__location="Barcelona").distinct()
+chefs_barcelona = Chef.objects.with_recipe_in(location="Barcelona")
 for chef in chefs_barcelona:
     print(f"- {chef.name} (Especialidad: {chef.specialty})")
 
 # v. Encuentra todas las recetas que tardan menos de 30 minutos en preparación y están disponibles en un restaurante llamado "The Savoy Grill".
 """ tiempo de preparaación <30 y nombre del restaurante The Savoy Grill"""
-recetas_rapidas_savoy = Recipe.objects.filter(preparation_time__lt=30, restaurants__name="The Savoy Grill").distinct()
+recetas_rapidas_savoy = Recipe.objects.filter(preparation_time__lt=30).available_in(name="The Savoy Grill")
 for receta in recetas_rapidas_savoy:
     print(f"- {receta.title} ({receta.preparation_time} min)")
 
 # vi. Obtén todas las recetas disponibles en restaurantes que tienen más de 5 recetas.
-""" Primero creo con el annotate añado una cuenta del número de recetas asociadas a cada restaurante y luego filtro que haya >5 recetas, 
+""" Primero obtengo los restaurantes con >5 recetas usando el contador recipe_count,
 luego busco las recetas relacionadas con esos restaurantes """
-restaurantes_populares = Restaurant.objects.annotate(num_recetas=Count('recipe')).filter(num_recetas__gt=5)
-recetas_en_populares = Recipe.objects.filter(restaurants__in=restaurantes_populares).distinct()
+restaurantes_populares = Restaurant.objects.filter(recipe_count__gt=5)
+recetas_en_populares = Recipe.objects.available_in(restaurants=restaurantes_populares)
 
 """
 --------------------------------------------------
@@ -1,7 +1,199 @@
+"""
+Admin preparado para tablas de millones de filas.
+
+- Las claves ajenas y el ManyToMany de menús usan autocompletado: el formulario no carga
+  todos los chefs ni todos los restaurantes.
+- El listado carga chefs y restaurantes con select_related/prefetch_related en lugar de
+  una consulta por fila.
+- Los filtros por especialidad y ciudad sacan sus opciones de los índices de Chef.specialty
+  y Restaurant.location (los filtros de Django harían SELECT DISTINCT sobre la tabla
+  filtrada con sus JOIN) y filtran con semijoins, sin DISTINCT.
+- Sin filtros la paginación usa el número de filas que estima el motor en lugar de un
+  COUNT(*) por página, y con filtros no se cuenta además la tabla entera.
+"""
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, RestaurantConfig, RestaurantService
+
+# Por debajo de este número de filas COUNT(*) es barato y se cuenta de verdad.
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+def estimated_row_count(model, using):
+    """
+    Filas de la tabla según las estadísticas del motor, o None si no las tiene.
+
+    PostgreSQL las actualiza con autovacuum; SQLite solo tras ANALYZE (o PRAGMA optimize).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            # -1: la tabla nunca se ha analizado
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # El primer número de stat es el de filas de la tabla (o del índice, que son las mismas).
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Sin filtros ni búsqueda devuelve la estimación del motor si la tabla es grande"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Ordenar por un índice: la página se lee del índice sin ordenar la tabla.
+    ordering = ["-pk"]
+    # Con filtros, "3 de 1.000.000" hace un COUNT(*) de toda la tabla en cada página.
+    show_full_result_count = False
+
+
+class SpecialtyFilter(admin.SimpleListFilter):
+    title = "especialidad"
+    parameter_name = "specialty"
+    field_path = "specialty"
+
+    def lookups(self, request, model_admin):
+        specialties = Chef.objects.order_by("specialty").values_list("specialty", flat=True).distinct()
+        return [(specialty, specialty) for specialty in specialties]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_path: self.value()})
+        return queryset
+
+
+class RecipeSpecialtyFilter(SpecialtyFilter):
+    field_path = "chef__specialty"
+
+
+class RecipeStatsSpecialtyFilter(SpecialtyFilter):
+    field_path = "recipe__chef__specialty"
+
+
+class LocationFilter(admin.SimpleListFilter):
+    title = "ciudad"
+    parameter_name = "location"
+
+    def lookups(self, request, model_admin):
+        locations = Restaurant.objects.order_by("location").values_list("location", flat=True).distinct()
+        return [(location, location) for location in locations]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return self.filter_location(queryset, self.value())
+        return queryset
+
+    def filter_location(self, queryset, location):
+        return queryset.filter(location=location)
+
+
+class ChefLocationFilter(LocationFilter):
+    def filter_location(self, queryset, location):
+        return queryset.with_recipe_in(location=location)
+
+
+class RecipeLocationFilter(LocationFilter):
+    def filter_location(self, queryset, location):
+        return queryset.available_in(location=location)
+
+
+class ConfigLocationFilter(LocationFilter):
+    def filter_location(self, queryset, location):
+        return queryset.filter(restaurant__location=location)
+
+
+class ServiceFilter(admin.SimpleListFilter):
+    title = "servicio"
+    parameter_name = "service"
+
+    def lookups(self, request, model_admin):
+        names = RestaurantService.objects.order_by("name").values_list("name", flat=True).distinct()
+        return [(name, name) for name in names]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            # (config, name) es único: no hay filas repetidas.
+            return queryset.filter(service_rows__name=self.value())
+        return queryset
+
+
+@admin.register(Chef)
+class ChefAdmin(LargeTableAdmin):
+    ordering = ["name", "pk"]
+    list_display = ["name", "specialty", "recipe_count"]
+    list_filter = [SpecialtyFilter, ChefLocationFilter]
+    search_fields = ["^name"]
+    readonly_fields = ["recipe_count"]
+
+
+@admin.register(Restaurant)
+class RestaurantAdmin(LargeTableAdmin):
+    ordering = ["name", "pk"]
+    list_display = ["name", "location", "recipe_count"]
+    list_filter = [LocationFilter]
+    search_fields = ["^name"]
+    readonly_fields = ["recipe_count"]
+
+
+@admin.register(Recipe)
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ["title", "chef", "preparation_time", "menu"]
+    list_select_related = ["chef"]
+    list_filter = [RecipeSpecialtyFilter, RecipeLocationFilter]
+    search_fields = ["title"]
+    autocomplete_fields = ["chef", "restaurants"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch("restaurants", queryset=Restaurant.objects.only("name"))
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Busca con el índice FTS5 (Recipe.objects.search) en lugar de title__icontains"""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=Recipe.objects.search(search_term).values("pk")), False
+
+    @admin.display(description="restaurantes")
+    def menu(self, recipe):
+        return ", ".join(restaurant.name for restaurant in recipe.restaurants.all())
+
+
+@admin.register(RecipeStats)
+class RecipeStatsAdmin(LargeTableAdmin):
+    list_display = ["recipe", "total_orders", "positive_reviews", "positive_percentage"]
+    list_select_related = ["recipe"]
+    list_filter = [RecipeStatsSpecialtyFilter]
+    autocomplete_fields = ["recipe"]
+    readonly_fields = ["positive_percentage"]
 
-from recetario_app.models import Chef, Recipe, Restaurant
 
-admin.site.register(Chef)
-admin.site.register(Recipe)
-admin.site.register(Restaurant)
+@admin.register(RestaurantConfig)
+class RestaurantConfigAdmin(LargeTableAdmin):
+    list_display = ["restaurant", "service_count", "weekdays_open", "weekdays_close", "weekends_open", "weekends_close"]
+    list_select_related = ["restaurant"]
+    list_filter = [ConfigLocationFilter, ServiceFilter]
+    autocomplete_fields = ["restaurant"]
+    readonly_fields = RestaurantConfig.DERIVED_FIELDS
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecetarioAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recetario_app'
+
+    def ready(self):
+        from recetario_app import signals  # noqa: F401
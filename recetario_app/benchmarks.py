@@ -0,0 +1,229 @@
+"""
+Benchmark de los patrones de consulta de consultas_recetas.py sobre datos sintéticos.
+
+El conjunto de datos sigue distribuciones sesgadas (tipo Zipf): unos pocos chefs tienen
+la mayoría de las recetas y unos pocos restaurantes concentran la mayoría de los menús,
+que es lo que pasa con datos reales y lo que castiga a los planes sin índice.
+"""
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.db import DatabaseError, NotSupportedError, connection, transaction
+
+from recetario_app.explain import rows_scanned
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, RestaurantConfig
+from recetario_app.queries import LOOP_QUERIES, READ_QUERIES, SEMIJOIN_QUERIES, SNAPSHOT_FILTERS, WRITE_QUERIES
+from recetario_app.services import rebuild_chef_restaurants, rebuild_recipe_counts, sync_config_tables
+from recetario_app.snapshot import CatalogSnapshot, filter_queryset
+
+SPECIALTIES = [
+    "Cocina francesa", "Cocina italiana", "Cocina española", "Cocina nórdica",
+    "Cocina molecular", "Cocina japonesa", "Cocina mexicana", "Cocina india",
+]
+LOCATIONS = [
+    "Londres", "Madrid", "Barcelona", "Módena", "Girona", "Copenhague", "Bray",
+    "París", "Tokio", "Nueva York", "Lima", "Bilbao",
+]
+# Los primeros puestos del ranking reciben la mayor parte del peso.
+FAMOUS_CHEFS = ["Gordon Ramsay", "Massimo Bottura", "Joan Roca", "René Redzepi", "Heston Blumenthal"]
+FAMOUS_RESTAURANTS = [
+    ("Hell's Kitchen", "Londres"), ("The Savoy Grill", "Londres"), ("Osteria Francescana", "Módena"),
+    ("El Celler de Can Roca", "Girona"), ("Noma", "Copenhague"), ("The Fat Duck", "Bray"),
+    ("DiverXO", "Madrid"), ("Tickets", "Barcelona"),
+]
+TITLE_WORDS = ["Beef", "Chocolate", "Paella", "Tarta", "Cordero", "Bacalao", "Helado", "Pato", "Risotto", "Ceviche"]
+SERVICES = ["delivery", "takeaway", "dine-in", "catering", "private events", "internet gratuito"]
+HOURS = ["12pm-11pm", "1pm-10pm", "5pm-11pm", "8am-10pm", "10am-11pm", "11am-10pm", None]
+
+
+def zipf_weights(n, s=1.1):
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def build_dataset(recipes, seed=0, batch_size=5000, menu_size=3):
+    """
+    Crea `recipes` recetas con sus chefs, restaurantes, menús, estadísticas y configuraciones.
+
+    Cada receta está en el menú de entre 1 y `menu_size` restaurantes.
+    """
+    rng = random.Random(seed)
+    n_chefs = max(len(FAMOUS_CHEFS), recipes // 100)
+    n_restaurants = max(len(FAMOUS_RESTAURANTS), recipes // 200)
+
+    chefs = [Chef(name=name, specialty=SPECIALTIES[i]) for i, name in enumerate(FAMOUS_CHEFS)]
+    chefs += [
+        Chef(name=f"Chef {i}", specialty=rng.choice(SPECIALTIES)) for i in range(len(chefs), n_chefs)
+    ]
+    Chef.objects.bulk_create(chefs, batch_size=batch_size)
+
+    restaurants = [Restaurant(name=name, location=location) for name, location in FAMOUS_RESTAURANTS]
+    restaurants += [
+        Restaurant(name=f"Restaurante {i}", location=rng.choice(LOCATIONS))
+        for i in range(len(restaurants), n_restaurants)
+    ]
+    Restaurant.objects.bulk_create(restaurants, batch_size=batch_size)
+
+    configs = []
+    for restaurant in restaurants:
+        settings = {
+            "opening_hours": {"weekdays": rng.choice(HOURS[:-1]), "weekends": rng.choice(HOURS)},
+            "services": rng.sample(SERVICES, rng.randint(1, 4)),
+            "restricted_dishes": {"alcohol": rng.random() < 0.3, "pork": rng.random() < 0.2},
+        }
+        if rng.random() < 0.05:
+            settings["restricted_dishes"]["platos exclusivos"] = True
+        config = RestaurantConfig(restaurant=restaurant, settings=settings)
+        config.refresh_derived_fields()
+        configs.append(config)
+    RestaurantConfig.objects.bulk_create(configs, batch_size=batch_size)
+    sync_config_tables(configs)
+
+    chef_ids = [chef.pk for chef in chefs]
+    restaurant_ids = [restaurant.pk for restaurant in restaurants]
+    chef_weights = zipf_weights(len(chef_ids))
+    restaurant_weights = zipf_weights(len(restaurant_ids))
+    MenuLink = Recipe.restaurants.through
+
+    for start in range(0, recipes, batch_size):
+        with transaction.atomic():
+            batch = [
+                Recipe(
+                    title=f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS).lower()} {i}",
+                    preparation_time=rng.randint(5, 240),
+                    chef_id=rng.choices(chef_ids, cum_weights=chef_weights)[0],
+                )
+                for i in range(start, min(start + batch_size, recipes))
+            ]
+            Recipe.objects.bulk_create(batch)
+            links = []
+            stats = []
+            for recipe in batch:
+                menu = set(rng.choices(restaurant_ids, cum_weights=restaurant_weights, k=rng.randint(1, menu_size)))
+                links.extend(MenuLink(recipe_id=recipe.pk, restaurant_id=pk) for pk in menu)
+                total = rng.randint(0, 1000)
+                stats.append(RecipeStats(recipe=recipe, total_orders=total, positive_reviews=rng.randint(0, total)))
+            MenuLink.objects.bulk_create(links)
+            RecipeStats.objects.bulk_create(stats)
+    rebuild_recipe_counts()
+    rebuild_chef_restaurants()
+
+
+class StatementRecorder:
+    """execute_wrapper que guarda el SQL y los parámetros de cada sentencia"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # SAVEPOINT/RELEASE de los atomic() no son consultas del patrón medido.
+        if not many and sql.lstrip()[:6].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def measure(run, repeat):
+    """
+    Ejecuta `run` `repeat` veces y devuelve tiempos, consultas y filas leídas.
+
+    Algunas consultas de consultas_recetas.py no están soportadas en todos los motores
+    (p.ej. `settings__services__contains` en SQLite); en ese caso se devuelve el error.
+    """
+    timings = []
+    for _ in range(repeat):
+        recorder = StatementRecorder()
+        try:
+            with connection.execute_wrapper(recorder):
+                started = time.perf_counter()
+                rows = run()
+                timings.append((time.perf_counter() - started) * 1000)
+        except (DatabaseError, NotSupportedError) as exc:
+            return {"error": str(exc)}
+    return {
+        "wall_ms_median": round(statistics.median(timings), 3),
+        "wall_ms_min": round(min(timings), 3),
+        "queries": len(recorder.statements),
+        "rows": rows,
+        "rows_scanned": sum(rows_scanned(sql, params) for sql, params in recorder.statements),
+    }
+
+
+def fetch_all(queryset):
+    """Ejecuta el SQL del QuerySet sin instanciar modelos: mide la base de datos, no Python"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return len(cursor.fetchall())
+
+
+def run_benchmark(repeat=5):
+    results = {}
+    for name, factory in READ_QUERIES:
+        results[name] = measure(lambda: fetch_all(factory()), repeat)
+    for name, function in LOOP_QUERIES:
+        results[name] = measure(lambda: len(function()), repeat)
+    for name, factory in WRITE_QUERIES:
+        # Las escrituras se deshacen para que todas las repeticiones vean los mismos datos.
+        def run(factory=factory):
+            with transaction.atomic():
+                rows = factory()
+                transaction.set_rollback(True)
+            return rows
+
+        results[name] = measure(run, repeat)
+    return results
+
+
+def run_semijoin_benchmark(repeat=5):
+    """JOIN + DISTINCT frente a semijoin para cada consulta de SEMIJOIN_QUERIES"""
+    results = {}
+    for name, distinct_factory, semijoin_factory in SEMIJOIN_QUERIES:
+        distinct = measure(lambda: fetch_all(distinct_factory()), repeat)
+        semijoin = measure(lambda: fetch_all(semijoin_factory()), repeat)
+        if "error" not in distinct and "error" not in semijoin and distinct["rows"] != semijoin["rows"]:
+            raise AssertionError(f"{name}: {distinct['rows']} filas con DISTINCT y {semijoin['rows']} sin él")
+        results[name] = {"join_distinct": distinct, "semijoin": semijoin}
+    return results
+
+
+def run_snapshot_benchmark(repeat=5):
+    """Construye una CatalogSnapshot y compara cada filtro de SNAPSHOT_FILTERS con su consulta del ORM"""
+    snapshot = CatalogSnapshot(using=connection.alias)
+    started = time.perf_counter()
+    snapshot.state()
+    results = {
+        "build_ms": round((time.perf_counter() - started) * 1000, 3),
+        "nbytes": snapshot.nbytes(),
+        "filters": {},
+    }
+    for name, filters in SNAPSHOT_FILTERS:
+        queryset = filter_queryset(Recipe.objects.all(), **filters)
+        expected = list(queryset.order_by("pk").values_list("pk", flat=True))
+        if snapshot.recipe_ids(**filters) != expected:
+            raise AssertionError(f"{name}: la copia en memoria no devuelve las mismas recetas que el ORM")
+        results["filters"][name] = {
+            "orm": measure(lambda: fetch_all(queryset.values_list("pk")), repeat),
+            "snapshot": measure(lambda: len(snapshot.recipe_ids(**filters)), repeat),
+        }
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Compara con un resultado anterior; devuelve la lista de consultas que empeoran"""
+    regressions = []
+    for name, current in results["queries"].items():
+        previous = baseline["queries"].get(name)
+        if previous is None or "error" in previous or "error" in current:
+            continue
+        if current["wall_ms_median"] > previous["wall_ms_median"] * (1 + threshold):
+            regressions.append(
+                f"{name}: {previous['wall_ms_median']} ms -> {current['wall_ms_median']} ms"
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {previous['queries']} -> {current['queries']} consultas")
+        if current["rows_scanned"] > previous["rows_scanned"] * (1 + threshold):
+            regressions.append(
+                f"{name}: {previous['rows_scanned']} -> {current['rows_scanned']} filas leídas"
+            )
+    return regressions
@@ -0,0 +1,120 @@
+"""
+Caché en memoria del proceso de RestaurantConfig.settings ya decodificado, por restaurante.
+
+    config_cache.get(restaurant_id)          -> dict o None si no tiene configuración
+    config_cache.get_many([id1, id2, ...])   -> {restaurant_id: dict}, una consulta para los fallos
+
+Es LRU con tamaño máximo y caducidad (RESTAURANT_CONFIG_CACHE en settings.py). Las señales
+post_save y post_delete de RestaurantConfig invalidan la entrada en este proceso; las
+escrituras masivas (bulk_create, update(), RestaurantConfig.objects.patch) llaman a
+invalidate_many. Los demás procesos no se enteran: la caducidad acota cuánto tiempo
+pueden servir una configuración antigua.
+
+Durante REPLICA_LAG segundos tras invalidar un restaurante sus fallos se leen de la base
+de datos principal: una réplica con retraso devolvería la configuración anterior y esta
+quedaría en la caché hasta la siguiente escritura.
+
+Los diccionarios devueltos se comparten entre peticiones: no deben modificarse.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+DEFAULTS = {"MAX_SIZE": 1024, "TIMEOUT": 60, "REPLICA_LAG": 5}
+# Restaurante sin configuración: también se guarda para no repetir la consulta.
+NO_CONFIG = object()
+
+
+class ConfigCache:
+    def __init__(self, max_size=None, timeout=None, replica_lag=None):
+        options = {**DEFAULTS, **getattr(settings, "RESTAURANT_CONFIG_CACHE", {})}
+        self.max_size = options["MAX_SIZE"] if max_size is None else max_size
+        self.timeout = options["TIMEOUT"] if timeout is None else timeout
+        self.replica_lag = options["REPLICA_LAG"] if replica_lag is None else replica_lag
+        self._entries = OrderedDict()
+        # restaurant_id -> (hasta cuándo, base de datos) de las invalidaciones recientes
+        self._written = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, restaurant_id):
+        return self.get_many([restaurant_id]).get(restaurant_id)
+
+    def get_many(self, restaurant_ids):
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for restaurant_id in dict.fromkeys(restaurant_ids):
+                entry = self._entries.get(restaurant_id)
+                if entry is None or entry[0] < now:
+                    missing.append(restaurant_id)
+                    continue
+                self._entries.move_to_end(restaurant_id)
+                found[restaurant_id] = entry[1]
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            loaded = dict.fromkeys(missing, NO_CONFIG)
+            loaded.update(self.load(missing))
+            self.store(loaded)
+            found.update(loaded)
+        return {restaurant_id: value for restaurant_id, value in found.items() if value is not NO_CONFIG}
+
+    def load(self, restaurant_ids):
+        from recetario_app.models import RestaurantConfig
+
+        now = time.monotonic()
+        by_database = defaultdict(list)
+        with self._lock:
+            for restaurant_id in restaurant_ids:
+                until, using = self._written.get(restaurant_id, (0, None))
+                # None: lo que decida el router (normalmente una réplica)
+                by_database[using if until > now else None].append(restaurant_id)
+        loaded = {}
+        for using, ids in by_database.items():
+            queryset = RestaurantConfig.objects.filter(restaurant_id__in=ids)
+            if using is not None:
+                queryset = queryset.using(using)
+            loaded.update(queryset.values_list("restaurant_id", "settings"))
+        return loaded
+
+    def store(self, values):
+        expires = time.monotonic() + self.timeout
+        with self._lock:
+            for restaurant_id, value in values.items():
+                self._entries[restaurant_id] = (expires, value)
+                self._entries.move_to_end(restaurant_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_many(self, restaurant_ids, using=None):
+        restaurant_ids = list(restaurant_ids)
+        self._discard(restaurant_ids, using)
+        # Otra vez al confirmar: una lectura concurrente pudo guardar la versión anterior, y
+        # el plazo de leer de la principal empieza a contar ahora.
+        transaction.on_commit(lambda: self._discard(restaurant_ids, using), using=using)
+
+    def invalidate(self, restaurant_id, using=None):
+        self.invalidate_many([restaurant_id], using)
+
+    def _discard(self, restaurant_ids, using):
+        now = time.monotonic()
+        written = (now + self.replica_lag, using or DEFAULT_DB_ALIAS)
+        with self._lock:
+            if len(self._written) > self.max_size:
+                self._written = {key: value for key, value in self._written.items() if value[0] > now}
+            for restaurant_id in restaurant_ids:
+                self._entries.pop(restaurant_id, None)
+                self._written[restaurant_id] = written
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._written.clear()
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,86 @@
+"""
+Lectura del JSON de RestaurantConfig.settings.
+
+Funciones puras (sin modelos) para que también las puedan usar las migraciones.
+El formato esperado es el de consultas_recetas.py:
+
+    {
+        "opening_hours": {"weekdays": "12pm-11pm", "weekends": "10am-11pm"},
+        "services": ["delivery", "takeaway", "dine-in"],
+        "restricted_dishes": {"alcohol": True, "pork": False},
+    }
+"""
+import re
+
+DAY_TYPES = ("weekdays", "weekends")
+MINUTES_PER_DAY = 24 * 60
+TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*$", re.IGNORECASE)
+
+
+def config_services(settings):
+    """Servicios sin repetir y en el orden en que aparecen"""
+    services = settings.get("services") if isinstance(settings, dict) else None
+    if not isinstance(services, list):
+        return []
+    return list(dict.fromkeys(service for service in services if isinstance(service, str)))
+
+
+def config_service_count(settings):
+    """Longitud de la lista de servicios, igual que settings__services__N__isnull"""
+    services = settings.get("services") if isinstance(settings, dict) else None
+    return len(services) if isinstance(services, list) else 0
+
+
+def config_restrictions(settings):
+    """Diccionario plato -> restringido (solo valores booleanos)"""
+    restricted = settings.get("restricted_dishes") if isinstance(settings, dict) else None
+    if not isinstance(restricted, dict):
+        return {}
+    return {dish: value for dish, value in restricted.items() if isinstance(value, bool)}
+
+
+def parse_time(value):
+    """'10am', '10:30pm', '22:00' -> minutos desde medianoche; None si no es una hora"""
+    match = TIME_RE.match(value)
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_opening_hours(value):
+    """
+    '12pm-11pm' -> (720, 1380). Devuelve (None, None) si el día está cerrado (null) o el
+    texto no se entiende.
+
+    El cierre siempre es mayor que la apertura: si el horario pasa de medianoche
+    ('6pm-2am') se guarda sumando un día al cierre (1080, 1560), y un mismo valor en
+    apertura y cierre significa abierto 24 horas.
+    """
+    if not isinstance(value, str) or value.count("-") != 1:
+        return None, None
+    opens, closes = (parse_time(part) for part in value.split("-"))
+    if opens is None or closes is None:
+        return None, None
+    if closes <= opens:
+        closes += MINUTES_PER_DAY
+    return opens, closes
+
+
+def date_day_type(date):
+    """"weekdays" de lunes a viernes, "weekends" en sábado y domingo"""
+    return "weekends" if date.weekday() >= 5 else "weekdays"
+
+
+def config_opening_hours(settings):
+    """{'weekdays': (apertura, cierre), 'weekends': (apertura, cierre)}"""
+    hours = settings.get("opening_hours") if isinstance(settings, dict) else None
+    if not isinstance(hours, dict):
+        hours = {}
+    return {day_type: parse_opening_hours(hours.get(day_type)) for day_type in DAY_TYPES}
@@ -0,0 +1,198 @@
+"""
+Búfer en memoria para los contadores de RecipeStats.
+
+Cada pedido o reseña como un UPDATE propio compite por las mismas filas y, en SQLite,
+por el bloqueo de escritura de toda la base de datos. RecipeStats.record_order() y
+RecipeStats.record_review() solo suman en memoria; el búfer escribe los incrementos
+acumulados con un UPDATE ... SET total_orders = total_orders + n por receta, y un
+RecipeEvent por receta y tipo, todos en una misma transacción:
+
+    - cada FLUSH_INTERVAL segundos, desde un hilo en segundo plano;
+    - en cuanto hay MAX_PENDING recetas con incrementos pendientes, desde el hilo que añade
+      la última (si falla, lo reintenta el hilo en segundo plano);
+    - al terminar el proceso (atexit), para no perder incrementos al apagar.
+
+Se configura con el diccionario STATS_BUFFER de settings.py. Con ENABLED=False cada
+llamada escribe directamente (útil en tests).
+
+Los incrementos pendientes viven en la memoria de cada proceso: se pierden si el proceso
+muere sin apagarse ordenadamente (SIGKILL), como mucho los de FLUSH_INTERVAL segundos.
+Los de recetas que ya no existen se descartan con un aviso en el log.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connections, router, transaction
+from django.db.models import F
+
+logger = logging.getLogger("recetario_app.counters")
+
+DEFAULTS = {"ENABLED": True, "FLUSH_INTERVAL": 5.0, "MAX_PENDING": 1000}
+
+
+class CounterBuffer:
+    def __init__(self, flush_interval=None, max_pending=None, enabled=None):
+        options = {**DEFAULTS, **getattr(settings, "STATS_BUFFER", {})}
+        self.flush_interval = options["FLUSH_INTERVAL"] if flush_interval is None else flush_interval
+        self.max_pending = options["MAX_PENDING"] if max_pending is None else max_pending
+        self.enabled = options["ENABLED"] if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])
+        # Lo que está escribiendo flush(): sigue contando en pending() hasta el COMMIT.
+        self._flushing = {}
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._pid = None
+
+    def add(self, recipe_id, orders=0, reviews=0):
+        with self._lock:
+            self._check_fork()
+            deltas = self._pending[recipe_id]
+            deltas[0] += orders
+            deltas[1] += reviews
+            full = len(self._pending) >= self.max_pending
+        if not self.enabled:
+            self.flush()
+            return
+        self._start()
+        if full:
+            # Se escribe ya, en el hilo de quien llama, salvo que otro hilo esté escribiendo.
+            # Un error no llega a la petición: los incrementos siguen en el búfer y los
+            # reintenta el hilo en segundo plano.
+            try:
+                self.flush(wait=False)
+            except Exception:
+                logger.exception("No se pudieron escribir los contadores de RecipeStats; se reintentará")
+
+    def pending(self, recipe_id):
+        """(pedidos, reseñas positivas) aún sin escribir para una receta"""
+        with self._lock:
+            orders, reviews = self._pending.get(recipe_id, (0, 0))
+            flushing_orders, flushing_reviews = self._flushing.get(recipe_id, (0, 0))
+        return orders + flushing_orders, reviews + flushing_reviews
+
+    def flush(self, wait=True):
+        """
+        Escribe los incrementos pendientes y devuelve cuántas recetas se han actualizado. Con
+        wait=False no espera si otro hilo está escribiendo (y devuelve 0).
+        """
+        with self._lock:
+            self._check_fork()
+        if not self._flush_lock.acquire(blocking=wait):
+            return 0
+        try:
+            with self._lock:
+                flushing, self._pending = self._pending, defaultdict(lambda: [0, 0])
+                self._flushing = flushing
+            try:
+                written = self._write({recipe_id: deltas for recipe_id, deltas in flushing.items() if any(deltas)})
+            except (OperationalError, IntegrityError):
+                # Errores que el siguiente intento puede superar (base de datos bloqueada, o una
+                # receta borrada entre la comprobación y la escritura, que el siguiente flush
+                # descarta): los incrementos vuelven al búfer.
+                with self._lock:
+                    for recipe_id, (orders, reviews) in flushing.items():
+                        deltas = self._pending[recipe_id]
+                        deltas[0] += orders
+                        deltas[1] += reviews
+                    self._flushing = {}
+                raise
+            except Exception:
+                # Cualquier otro error se repetiría en cada intento y bloquearía el búfer.
+                with self._lock:
+                    self._flushing = {}
+                logger.exception("Se descartan los contadores de %d recetas", len(flushing))
+                raise
+            with self._lock:
+                self._flushing = {}
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, pending):
+        from recetario_app.models import Recipe, RecipeEvent, RecipeStats
+
+        if not pending:
+            return 0
+        using = router.db_for_write(RecipeStats)
+        with transaction.atomic(using=using):
+            missing = []
+            for recipe_id, (orders, reviews) in sorted(pending.items()):
+                updated = RecipeStats.objects.using(using).filter(recipe_id=recipe_id).update(
+                    total_orders=F("total_orders") + orders,
+                    positive_reviews=F("positive_reviews") + reviews,
+                )
+                if not updated:
+                    missing.append(recipe_id)
+            if missing:
+                # Sin fila de estadísticas: se crea si la receta existe; si se ha borrado
+                # (o nunca existió) sus incrementos se descartan.
+                existing = set(Recipe.objects.using(using).filter(pk__in=missing).values_list("pk", flat=True))
+                dropped = [recipe_id for recipe_id in missing if recipe_id not in existing]
+                if dropped:
+                    logger.warning("Se descartan contadores de recetas que no existen: %s", dropped[:10])
+                    for recipe_id in dropped:
+                        del pending[recipe_id]
+                RecipeStats.objects.using(using).bulk_create(
+                    [
+                        RecipeStats(recipe_id=recipe_id, total_orders=orders, positive_reviews=reviews)
+                        for recipe_id, (orders, reviews) in pending.items()
+                        if recipe_id in existing
+                    ]
+                )
+            # Los mismos incrementos quedan en el registro de eventos para las ventanas
+            # de tiempo (recetario_app/rollups.py).
+            RecipeEvent.objects.using(using).bulk_create(
+                [
+                    RecipeEvent(recipe_id=recipe_id, kind=kind, quantity=quantity)
+                    for recipe_id, deltas in pending.items()
+                    for kind, quantity in zip((RecipeEvent.ORDER, RecipeEvent.REVIEW), deltas)
+                    if quantity
+                ]
+            )
+        return len(pending)
+
+    def _check_fork(self):
+        # Tras un fork (p.ej. workers de gunicorn) el hilo del padre no existe en el hijo.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+            self._pending.clear()
+            self._flushing = {}
+            # El hilo que lo tenía en el padre no existe en el hijo.
+            self._flush_lock = threading.Lock()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="recipe-stats-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("No se pudieron escribir los contadores de RecipeStats")
+            finally:
+                # Este hilo no atiende peticiones: nadie más cerraría sus conexiones.
+                connections.close_all()
+
+    def shutdown(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Se han perdido contadores de RecipeStats al apagar")
+
+
+buffer = CounterBuffer()
+atexit.register(buffer.shutdown)
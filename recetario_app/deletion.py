@@ -0,0 +1,139 @@
+"""
+Borrado por conjuntos de chefs o restaurantes con todo lo que cuelga de ellos.
+
+    fast_delete(Chef.objects.filter(pk=chef_id))
+    fast_delete(Restaurant.objects.filter(location="Lima"), skip_signals=True)
+
+QuerySet.delete() carga en memoria cada objeto relacionado (cada receta del chef, con sus
+estadísticas, eventos y enlaces de menú) para decidir qué borrar. fast_delete sigue las
+mismas relaciones CASCADE del esquema pero solo lee ids: borra con DELETE ... WHERE fk IN
+(...) por lotes, de las tablas hijas a la padre, en una transacción. Los modelos con
+receptores de pre_delete/post_delete se cargan por lotes para emitir las señales igual
+que Django.
+
+Con skip_signals=True no se emite ninguna señal: los datos desnormalizados que mantienen
+los receptores de signals.py (recipe_count, ChefRestaurant, config_cache) se corrigen con
+una consulta por lote. Solo debe usarse si ningún otro receptor necesita las señales.
+
+Devuelve lo mismo que QuerySet.delete(): (total, {"recetario_app.Recipe": n, ...}). Las
+filas de ChefRestaurant que los receptores o los ajustes por conjuntos ya han borrado al
+llegar a cero recetas no se cuentan; QuerySet.delete() tampoco las cuenta siempre.
+"""
+from collections import Counter, defaultdict
+
+from django.db import models, router, transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, pre_delete
+
+from recetario_app.config_cache import config_cache
+from recetario_app.models import Chef, Recipe, Restaurant, RestaurantConfig
+from recetario_app.services import apply_chef_restaurant_deltas
+
+MenuLink = Recipe.restaurants.through
+BATCH_SIZE = 1000
+
+
+def cascade_relations(model):
+    """Relaciones inversas afectadas al borrar `model`: las mismas que recorre el Collector"""
+    return [
+        field
+        for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_one or field.one_to_many)
+    ]
+
+
+def has_delete_receivers(model):
+    return pre_delete.has_listeners(model) or post_delete.has_listeners(model)
+
+
+def subtract_recipe_counts(model, counts, using):
+    """Resta {pk: n} a model.recipe_count con un UPDATE por cada n distinto"""
+    by_count = defaultdict(list)
+    for pk, n in counts.items():
+        by_count[n].append(pk)
+    for n, pks in by_count.items():
+        model._base_manager.using(using).filter(pk__in=pks).update(recipe_count=F("recipe_count") - n)
+
+
+def uncount_recipes(queryset):
+    per_chef = queryset.values_list("chef").annotate(n=Count("pk")).order_by()
+    subtract_recipe_counts(Chef, dict(per_chef), queryset.db)
+
+
+def uncount_menu_links(queryset):
+    rows = list(queryset.values_list("restaurant", "recipe__chef").annotate(n=Count("pk")).order_by())
+    per_restaurant = Counter()
+    for restaurant, _, n in rows:
+        per_restaurant[restaurant] += n
+    subtract_recipe_counts(Restaurant, per_restaurant, queryset.db)
+    apply_chef_restaurant_deltas({(chef, restaurant): -n for restaurant, chef, n in rows})
+
+
+def invalidate_configs(queryset):
+    config_cache.invalidate_many(queryset.values_list("restaurant_id", flat=True), using=queryset.db)
+
+
+# Lo que hacen los receptores de signals.py, por conjuntos, para skip_signals=True.
+SIGNAL_FREE_UPDATES = {
+    Recipe: uncount_recipes,
+    MenuLink: uncount_menu_links,
+    RestaurantConfig: invalidate_configs,
+}
+
+
+class FastDeleter:
+    def __init__(self, origin, using, skip_signals=False, batch_size=BATCH_SIZE):
+        self.origin = origin
+        self.using = using
+        self.skip_signals = skip_signals
+        self.batch_size = batch_size
+        self.counts = Counter()
+
+    def delete(self, model, ids):
+        for start in range(0, len(ids), self.batch_size):
+            self.delete_batch(model, ids[start : start + self.batch_size])
+
+    def delete_batch(self, model, ids):
+        instances = []
+        if not self.skip_signals and has_delete_receivers(model):
+            instances = list(model._base_manager.using(self.using).filter(pk__in=ids))
+            for instance in instances:
+                pre_delete.send(sender=model, instance=instance, using=self.using, origin=self.origin)
+        for relation in cascade_relations(model):
+            self.delete_related(relation, ids)
+        self.raw_delete(model, model._base_manager.using(self.using).filter(pk__in=ids))
+        for instance in instances:
+            post_delete.send(sender=model, instance=instance, using=self.using, origin=self.origin)
+
+    def delete_related(self, relation, ids):
+        model = relation.related_model
+        queryset = model._base_manager.using(self.using).filter(**{f"{relation.field.name}__in": ids})
+        if relation.on_delete is models.DO_NOTHING:
+            return
+        if relation.on_delete is models.SET_NULL:
+            queryset.update(**{relation.field.name: None})
+            return
+        if relation.on_delete is not models.CASCADE:
+            raise ValueError(
+                f"{model._meta.label}.{relation.field.name} usa {relation.on_delete.__name__}: usa QuerySet.delete()"
+            )
+        if cascade_relations(model) or (not self.skip_signals and has_delete_receivers(model)):
+            self.delete(model, list(queryset.values_list("pk", flat=True)))
+        else:
+            self.raw_delete(model, queryset)
+
+    def raw_delete(self, model, queryset):
+        if self.skip_signals and model in SIGNAL_FREE_UPDATES:
+            SIGNAL_FREE_UPDATES[model](queryset)
+        deleted = queryset._raw_delete(self.using)
+        if deleted:
+            self.counts[model._meta.label] += deleted
+
+
+def fast_delete(queryset, skip_signals=False, batch_size=BATCH_SIZE):
+    """Borra `queryset` y sus objetos relacionados en cascada por lotes, sin cargarlos en memoria"""
+    using = queryset._db or router.db_for_write(queryset.model)
+    with transaction.atomic(using=using):
+        deleter = FastDeleter(queryset, using, skip_signals, batch_size)
+        deleter.delete(queryset.model, list(queryset.using(using).values_list("pk", flat=True)))
+    return sum(deleter.counts.values()), dict(deleter.counts)
@@ -0,0 +1,88 @@
+"""
+Utilidades para leer planes de ejecución en SQLite y PostgreSQL.
+"""
+import json
+import re
+
+from django.db import NotSupportedError, connections, transaction
+
+# Django usa alias como U0 o T3 en subconsultas y joins repetidos.
+ALIAS_RE = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?\b')
+
+
+def table_aliases(sql):
+    return {alias: table for table, alias in ALIAS_RE.findall(sql)}
+
+
+def sqlite_plan(cursor, sql, params):
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def full_scans(sql, params, using="default"):
+    """Devuelve las tablas que el plan recorre completas (sin búsqueda por índice)"""
+    connection = connections[using]
+    aliases = table_aliases(sql)
+    tables = set(connection.introspection.table_names())
+    scans = []
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for detail in sqlite_plan(cursor, sql, params):
+                # "SCAN tabla", "SCAN tabla USING COVERING INDEX ..." -> recorrido completo.
+                # "SEARCH tabla USING INDEX ..." -> búsqueda acotada por índice.
+                match = re.match(r"SCAN (\S+)", detail)
+                # Tablas virtuales FTS5: "VIRTUAL TABLE INDEX 0:M1" usa el índice (MATCH).
+                if match and re.search(r"VIRTUAL TABLE INDEX \d+:\S*M", detail):
+                    continue
+                if match:
+                    table = aliases.get(match.group(1), match.group(1))
+                    if table in tables:
+                        scans.append(table)
+        elif connection.vendor == "postgresql":
+            for node in postgres_nodes(cursor, sql, params, analyze=False):
+                if node["Node Type"] == "Seq Scan":
+                    scans.append(node["Relation Name"])
+        else:
+            raise NotSupportedError(f"EXPLAIN no soportado para {connection.vendor}")
+    return scans
+
+
+def postgres_nodes(cursor, sql, params, analyze):
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    cursor.execute(f"EXPLAIN ({options}) " + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    pending = [plan[0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        pending.extend(node.get("Plans", []))
+        yield node
+
+
+def rows_scanned(sql, params, using="default"):
+    """
+    Estimación de las filas leídas por una consulta.
+
+    En PostgreSQL se suman las filas reales (más las descartadas por el filtro) de los
+    nodos que leen tablas según EXPLAIN ANALYZE. SQLite no expone ese dato, así que se
+    cuenta el tamaño de cada tabla recorrida completa: es la cota que deja ver si una
+    consulta ha pasado de buscar por índice a leer la tabla entera.
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        total = 0
+        # EXPLAIN ANALYZE ejecuta la sentencia: se deshace por si es un UPDATE o DELETE.
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for node in postgres_nodes(cursor, sql, params, analyze=True):
+                if "Relation Name" in node:
+                    loops = node.get("Actual Loops", 1)
+                    total += (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+            transaction.set_rollback(True, using=using)
+        return total
+    total = 0
+    with connection.cursor() as cursor:
+        for table in full_scans(sql, params, using):
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+            total += cursor.fetchone()[0]
+    return total
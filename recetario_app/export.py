@@ -0,0 +1,97 @@
+"""
+Exportación del catálogo de recetas en NDJSON o CSV con memoria constante.
+
+Las recetas se leen con .iterator(chunk_size=...) y las relaciones (restaurantes) se
+cargan con una consulta por bloque, así que en memoria solo hay un bloque cada vez. El
+formato de cada registro (title, preparation_time, chef, restaurants) es el que espera
+load_catalog --recipes, así que lo exportado se puede volver a cargar.
+
+aexport_lines() es la versión para ASGI: StreamingHttpResponse consume un iterador
+síncrono en ASGI con sync_to_async(list), es decir, genera la exportación entera en
+memoria antes de enviar el primer byte.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.db.models import Prefetch
+
+from recetario_app.models import Recipe, RecipeStats, Restaurant
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_COLUMNS = [
+    "id", "title", "preparation_time", "chef", "chef_specialty", "restaurants", "total_orders", "positive_reviews",
+]
+# Separador de listas dentro de una celda CSV (p.ej. restaurants="Noma|Tickets")
+CSV_LIST_SEPARATOR = "|"
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def export_queryset():
+    return (
+        Recipe.objects.select_related("chef", "recipestats")
+        .prefetch_related(Prefetch("restaurants", queryset=Restaurant.objects.only("name").order_by("pk")))
+        .order_by("pk")
+    )
+
+
+def export_records(chunk_size=DEFAULT_CHUNK_SIZE):
+    for recipe in export_queryset().iterator(chunk_size=chunk_size):
+        try:
+            stats = recipe.recipestats
+        except RecipeStats.DoesNotExist:
+            stats = None
+        yield {
+            "id": recipe.pk,
+            "title": recipe.title,
+            "preparation_time": recipe.preparation_time,
+            "chef": recipe.chef.name,
+            "chef_specialty": recipe.chef.specialty,
+            "restaurants": [restaurant.name for restaurant in recipe.restaurants.all()],
+            "total_orders": stats.total_orders if stats else None,
+            "positive_reviews": stats.positive_reviews if stats else None,
+        }
+
+
+class Echo:
+    """Objeto con write() que devuelve lo escrito, para usar csv.writer en un generador"""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def csv_lines(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for record in records:
+        record = {**record, "restaurants": CSV_LIST_SEPARATOR.join(record["restaurants"])}
+        yield writer.writerow([record[column] if record[column] is not None else "" for column in CSV_COLUMNS])
+
+
+def export_lines(export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    if export_format not in FORMATS:
+        raise ValueError(f"Formato no soportado: {export_format!r}")
+    records = export_records(chunk_size)
+    return ndjson_lines(records) if export_format == "ndjson" else csv_lines(records)
+
+
+async def aexport_lines(export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """export_lines por bloques de `chunk_size` líneas, cada uno generado en el hilo de sync_to_async"""
+    lines = export_lines(export_format, chunk_size)
+    # thread_sensitive (por defecto): todos los bloques salen del mismo hilo, el dueño del cursor.
+    next_chunk = sync_to_async(lambda: "".join(islice(lines, chunk_size)))
+    try:
+        while chunk := await next_chunk():
+            yield chunk
+    finally:
+        await sync_to_async(lines.close)()
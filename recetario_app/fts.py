@@ -0,0 +1,114 @@
+"""
+Índice de texto completo (FTS5) sobre Recipe.title en SQLite.
+
+La tabla virtual es de contenido externo: no duplica los títulos, solo guarda el índice,
+y la mantienen al día triggers sobre recetario_app_recipe (también para bulk_create y
+SQL directo).
+
+models.RecipeSearchIndex describe la tabla virtual para unirla a Recipe con el ORM (no la
+crea ni la escribe Django). Su campo `document` es la columna oculta con el nombre de la
+tabla, la que reciben MATCH y las funciones auxiliares como bm25():
+
+    Recipe.objects.filter(search_index__document__match='"beef"*')
+
+Ojo: cuando una migración obliga a SQLite a reconstruir recetario_app_recipe (crear tabla
+nueva, copiar y renombrar) los triggers se pierden. Esa migración tiene que volver a
+llamar a install_recipe_fts().
+"""
+import re
+
+from django.db import models
+
+FTS_TABLE = "recetario_app_recipe_fts"
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content='recetario_app_recipe', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recetario_app_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recetario_app_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title ON recetario_app_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+    # Indexa las recetas que ya existían
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def has_fts5(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Algunas compilaciones lo incluyen sin declararlo como opción
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+def install_recipe_fts(schema_editor):
+    if has_fts5(schema_editor.connection):
+        for sql in INSTALL_SQL:
+            schema_editor.execute(sql)
+
+
+def uninstall_recipe_fts(schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in UNINSTALL_SQL:
+            schema_editor.execute(sql)
+
+
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class SearchDocumentField(models.TextField):
+    """La columna oculta de una tabla FTS5, con el lookup __match"""
+
+
+SearchDocumentField.register_lookup(Match)
+
+
+def bm25(document):
+    """Relevancia de cada fila en la búsqueda (más negativa cuanto más relevante)"""
+    return models.Func(document, function="bm25", output_field=models.FloatField())
+
+
+_available = {}
+
+
+def fts_available(connection):
+    """Si la base de datos tiene la tabla FTS instalada (se cachea por base de datos)"""
+    key = (connection.alias, connection.settings_dict["NAME"])
+    if key not in _available:
+        _available[key] = connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+    return _available[key]
+
+
+def search_terms(query):
+    """Palabras de la búsqueda, sin signos de puntuación"""
+    return re.findall(r"\w+", query)
+
+
+def match_expression(terms, prefix=True):
+    """['beef', 'well'] -> '"beef"* AND "well"*' (las comillas evitan la sintaxis de FTS5)"""
+    star = "*" if prefix else ""
+    return " AND ".join(f'"{term}"{star}' for term in terms)
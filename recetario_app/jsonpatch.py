@@ -0,0 +1,129 @@
+"""
+Actualización parcial de un JSONField dentro de la base de datos.
+
+Las rutas usan puntos y los índices de lista son números; "[]" al final añade a la lista:
+
+    "restricted_dishes.alcohol"   -> settings["restricted_dishes"]["alcohol"]
+    "services.0"                  -> settings["services"][0]
+    "services[]"                  -> settings["services"].append(...)
+
+SQLite:      json_set(settings, '$."restricted_dishes"."alcohol"', json('true'))
+             json_insert(settings, '$."services"[#]', json('"delivery"'))
+PostgreSQL:  jsonb_set(settings, '{restricted_dishes,alcohol}', 'true'::jsonb, true)
+             jsonb_insert(settings, '{services,-1}', '"delivery"'::jsonb, true)
+
+SQLite crea los objetos intermedios que falten; jsonb_set de PostgreSQL solo crea la
+última clave. Para añadir a una lista esta tiene que existir en ambos motores.
+
+JSONField guarda las claves con escapes ("ñ" como "\\u00f1", '"' como '\\"') y las rutas de
+SQLite anteriores a 3.45 comparan con ese texto escapado, pero crean las claves que faltan
+escapando la ruta otra vez: ninguna ruta sirve para ambas cosas. Las rutas con alguna clave
+que lleve escapes se aplican con json_patch, que compara y copia las claves tal cual:
+
+    json_patch(settings, '{"men\\u00fa": {"platos": 14}}')
+
+Si el valor es un objeto, antes se borra la clave para reemplazarlo en lugar de mezclarlo.
+Con json_patch no se puede escribir null ni usar índices de lista ni "[]".
+"""
+import json
+
+from django.db import NotSupportedError
+from django.db.models import Expression, JSONField
+
+APPEND = "[]"
+
+
+def parse_path(path):
+    """"a.b.0" -> ["a", "b", 0]; "services[]" -> ["services", APPEND]"""
+    append = path.endswith(APPEND)
+    if append:
+        path = path[: -len(APPEND)]
+    if not path:
+        raise ValueError("La ruta no puede estar vacía")
+    parts = [int(part) if part.isdigit() else part for part in path.split(".")]
+    if any(part == "" for part in parts):
+        raise ValueError(f"Ruta no válida: {path!r}")
+    return parts + [APPEND] if append else parts
+
+
+def needs_escape(part):
+    return isinstance(part, str) and json.dumps(part)[1:-1] != part
+
+
+def merge_patch(parts, value):
+    """["a", "b"], value -> {"a": {"b": value}}"""
+    for part in reversed(parts):
+        value = {part: value}
+    return value
+
+
+def sqlite_path(parts):
+    path = "$"
+    for part in parts:
+        if part == APPEND:
+            path += "[#]"
+        elif isinstance(part, int):
+            path += f"[{part}]"
+        else:
+            path += '."' + part + '"'
+    return path
+
+
+def postgres_path(parts):
+    if parts[-1] == APPEND:
+        parts = [*parts[:-1], -1]
+    return [str(part) for part in parts]
+
+
+class JSONPatch(Expression):
+    """El valor de `field` con los cambios {ruta: valor} aplicados"""
+
+    output_field = JSONField()
+
+    def __init__(self, field, changes):
+        super().__init__()
+        self.source = field
+        self.changes = [(parse_path(path), value) for path, value in changes.items()]
+
+    def get_source_expressions(self):
+        return [self.source]
+
+    def set_source_expressions(self, exprs):
+        (self.source,) = exprs
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        clone = self.copy()
+        clone.source = self.source.resolve_expression(query, allow_joins, reuse, summarize, for_save)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(f"JSONPatch no está disponible en {connection.vendor}")
+
+    def as_sqlite(self, compiler, connection):
+        sql, params = compiler.compile(self.source)
+        params = list(params)
+        for parts, value in self.changes:
+            if not any(needs_escape(part) for part in parts):
+                function = "json_insert" if parts[-1] == APPEND else "json_set"
+                sql = f"{function}({sql}, %s, json(%s))"
+                params += [sqlite_path(parts), json.dumps(value)]
+                continue
+            if value is None or parts[-1] == APPEND or not all(isinstance(part, str) for part in parts):
+                raise ValueError(f"SQLite solo admite claves con escapes en rutas de claves y sin null: {parts!r}")
+            if isinstance(value, dict):
+                sql = f"json_patch({sql}, %s)"
+                params.append(json.dumps(merge_patch(parts, None)))
+            sql = f"json_patch({sql}, %s)"
+            params.append(json.dumps(merge_patch(parts, value)))
+        return sql, params
+
+    def as_postgresql(self, compiler, connection):
+        sql, params = compiler.compile(self.source)
+        params = list(params)
+        for parts, value in self.changes:
+            if parts[-1] == APPEND:
+                sql = f"jsonb_insert({sql}, %s::text[], %s::jsonb, true)"
+            else:
+                sql = f"jsonb_set({sql}, %s::text[], %s::jsonb, true)"
+            params += [postgres_path(parts), json.dumps(value)]
+        return sql, params
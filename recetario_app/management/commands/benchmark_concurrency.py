@@ -0,0 +1,133 @@
+"""
+Rendimiento con varios hilos de lectura y escritura para cada modo de conexión.
+
+Genera el conjunto sintético en una base de datos de test en fichero (en SQLite; WAL no
+se aplica a bases de datos en memoria) y, para cada modo, ejecuta durante --seconds
+segundos tres cargas con --threads hilos: solo lecturas, solo escrituras y mitad y mitad.
+
+    SQLite:      default (pragmas por defecto) y tuned (database.SQLITE_TUNED_PRAGMAS)
+    PostgreSQL:  persistent (CONN_MAX_AGE + health checks) y pool (pool de psycopg)
+
+Ejemplo:
+    python manage.py benchmark_concurrency --threads 8 --seconds 5 --output concurrency.json
+"""
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import F
+
+from recetario_app.benchmarks import build_dataset
+from recetario_app.models import Recipe, RecipeStats
+from sistema_gestion_restaurantes.database import postgres_options, sqlite_options
+
+MODES = {
+    "sqlite": {
+        # journal_mode se guarda en el fichero: se vuelve explícitamente al modo por defecto.
+        "default": {"OPTIONS": {**sqlite_options(tuned=False), "init_command": "PRAGMA journal_mode=DELETE"}},
+        "tuned": {"OPTIONS": sqlite_options(tuned=True)},
+    },
+    "postgresql": {
+        "persistent": {"OPTIONS": postgres_options(pool=False), "CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True},
+        "pool": {"OPTIONS": postgres_options(pool=True), "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    },
+}
+WORKLOADS = {"read": 0.0, "write": 1.0, "mixed": 0.5}
+
+
+def read_operation(rng, recipe_ids):
+    Recipe.objects.select_related("chef", "recipestats").get(pk=rng.choice(recipe_ids))
+
+
+def write_operation(rng, recipe_ids):
+    with transaction.atomic():
+        RecipeStats.objects.filter(recipe_id=rng.choice(recipe_ids)).update(total_orders=F("total_orders") + 1)
+
+
+def run_workload(threads, seconds, write_ratio, recipe_ids):
+    """Lecturas y escrituras por segundo y número de operaciones fallidas"""
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        try:
+            while time.perf_counter() < deadline:
+                write = rng.random() < write_ratio
+                try:
+                    (write_operation if write else read_operation)(rng, recipe_ids)
+                    local["writes" if write else "reads"] += 1
+                except DatabaseError:
+                    # "database is locked" en SQLite sin busy_timeout
+                    local["errors"] += 1
+        finally:
+            connections.close_all()
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return {
+        "reads_per_second": round(counts["reads"] / seconds, 1),
+        "writes_per_second": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+class Command(BaseCommand):
+    help = "Compara lecturas y escrituras por segundo con varios hilos en cada modo de conexión"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10_000, help="Número de recetas del conjunto sintético")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duración de cada carga")
+        parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in MODES:
+            raise CommandError(f"Motor no soportado: {connection.vendor}")
+        settings_dict = connection.settings_dict
+        original = {key: settings_dict.get(key) for key in ("OPTIONS", "CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        old_name = settings_dict["NAME"]
+        old_test_name = settings_dict["TEST"].get("NAME")
+        tmpdir = tempfile.TemporaryDirectory()
+        if connection.vendor == "sqlite":
+            settings_dict["TEST"]["NAME"] = str(Path(tmpdir.name) / "concurrency.sqlite3")
+
+        results = {"vendor": connection.vendor, "size": options["size"], "threads": options["threads"], "modes": {}}
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            build_dataset(options["size"])
+            recipe_ids = list(RecipeStats.objects.values_list("recipe_id", flat=True))
+            for mode, overrides in MODES[connection.vendor].items():
+                self.stderr.write(f"Modo {mode}...")
+                # Los hilos crean sus conexiones a partir de este mismo diccionario.
+                connections.close_all()
+                settings_dict.update(overrides)
+                results["modes"][mode] = {
+                    workload: run_workload(options["threads"], options["seconds"], ratio, recipe_ids)
+                    for workload, ratio in WORKLOADS.items()
+                }
+        finally:
+            connections.close_all()
+            settings_dict.update(original)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict["TEST"]["NAME"] = old_test_name
+            tmpdir.cleanup()
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output, encoding="utf-8")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,74 @@
+"""
+Benchmark de las consultas de consultas_recetas.py sobre un conjunto de datos sintético.
+
+Se ejecuta siempre sobre la base de datos de test (nunca sobre la de trabajo). Con
+--keepdb los datos generados se reutilizan entre ejecuciones del mismo tamaño.
+
+Ejemplo:
+    python manage.py benchmark_queries --size 100000 --output bench.json
+    python manage.py benchmark_queries --size 100000 --baseline bench.json --threshold 0.2
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError, connection
+
+from recetario_app.benchmarks import build_dataset, find_regressions, run_benchmark
+from recetario_app.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo, número de consultas y filas leídas de cada consulta de consultas_recetas.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", type=int, default=10_000, help="Número de recetas (p.ej. 10000, 100000, 1000000)"
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (por defecto, stdout)")
+        parser.add_argument("--baseline", help="Resultado JSON anterior con el que comparar")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2, help="Empeoramiento relativo permitido (0.2 = 20%%)"
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Conserva la base de datos de test y sus datos")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text(encoding="utf-8"))
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"])
+        try:
+            current = Recipe.objects.count()
+            if current not in (0, options["size"]):
+                raise CommandError(
+                    f"La base de datos de test ya tiene {current} recetas; ejecuta sin --keepdb para regenerarla"
+                )
+            if current == 0:
+                self.stderr.write(f"Generando {options['size']} recetas...")
+                build_dataset(options["size"], seed=options["seed"])
+            results = {
+                "size": options["size"],
+                "vendor": connection.vendor,
+                "repeat": options["repeat"],
+                "queries": run_benchmark(repeat=options["repeat"]),
+            }
+        except NotSupportedError as exc:
+            raise CommandError(exc) from exc
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(output, encoding="utf-8")
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options["threshold"])
+            if regressions:
+                raise CommandError("Regresiones detectadas:\n" + "\n".join(regressions))
+            self.stderr.write("Sin regresiones respecto a " + options["baseline"])
@@ -0,0 +1,69 @@
+"""
+JOIN + DISTINCT frente a semijoin (available_in, with_recipe_in) a medida que crecen los menús.
+
+Para cada valor de --menu-sizes genera el conjunto sintético en una base de datos de test
+nueva, con cada receta en el menú de entre 1 y ese número de restaurantes, y mide las
+consultas de queries.SEMIJOIN_QUERIES en sus dos formas. Cuantos más restaurantes por
+receta, más filas repetidas tiene que producir, ordenar y eliminar el JOIN + DISTINCT; el
+semijoin (EXISTS en PostgreSQL, IN (SELECT ...) en SQLite) no las produce.
+
+Ejemplo:
+    python manage.py benchmark_semijoins --size 100000 --menu-sizes 1,3,10,30 --output semijoins.json
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recetario_app.benchmarks import build_dataset, run_semijoin_benchmark
+from recetario_app.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Compara JOIN + DISTINCT con semijoins en las consultas sobre menús para varios tamaños de menú"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10_000, help="Número de recetas")
+        parser.add_argument(
+            "--menu-sizes", default="1,3,10,30", help="Máximo de restaurantes por receta, separados por comas"
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            menu_sizes = [int(size) for size in options["menu_sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--menu-sizes debe ser una lista de enteros separados por comas")
+        if any(size < 1 for size in menu_sizes):
+            raise CommandError("Los tamaños de menú deben ser mayores que 0")
+
+        results = {"size": options["size"], "vendor": connection.vendor, "repeat": options["repeat"], "menus": {}}
+        for menu_size in menu_sizes:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stderr.write(f"Generando {options['size']} recetas con menús de hasta {menu_size} restaurantes...")
+                build_dataset(options["size"], seed=options["seed"], menu_size=menu_size)
+                queries = run_semijoin_benchmark(repeat=options["repeat"])
+                results["menus"][menu_size] = {
+                    "menu_links": Recipe.restaurants.through.objects.count(),
+                    "queries": queries,
+                }
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            for name, forms in queries.items():
+                if "error" in forms["join_distinct"] or "error" in forms["semijoin"]:
+                    continue
+                self.stderr.write(
+                    f"  {name}: {forms['join_distinct']['wall_ms_median']} ms con DISTINCT, "
+                    f"{forms['semijoin']['wall_ms_median']} ms con semijoin"
+                )
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(output, encoding="utf-8")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,61 @@
+"""
+Filtros del catálogo en memoria (snapshot.CatalogSnapshot) frente a las consultas del ORM.
+
+Genera el conjunto sintético en una base de datos de test nueva, construye la copia en
+columnas y mide cada combinación de queries.SNAPSHOT_FILTERS (tiempo de preparación,
+especialidad, ciudad, servicios y pedidos) de las dos formas, comprobando antes que
+devuelven las mismas recetas. Usa NumPy si está instalado; si no, el recorrido en Python.
+
+Ejemplo:
+    python manage.py benchmark_snapshot --size 100000 --output snapshot.json
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recetario_app import snapshot
+from recetario_app.benchmarks import build_dataset, run_snapshot_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compara los filtros del catálogo en memoria con las consultas equivalentes del ORM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10_000, help="Número de recetas")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stderr.write(f"Generando {options['size']} recetas...")
+            build_dataset(options["size"], seed=options["seed"])
+            filters = run_snapshot_benchmark(repeat=options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stderr.write(f"Copia construida en {filters['build_ms']} ms, {filters['nbytes']} bytes")
+        for name, forms in filters["filters"].items():
+            if "error" in forms["orm"]:
+                continue
+            self.stderr.write(
+                f"  {name}: {forms['orm']['wall_ms_median']} ms con el ORM, "
+                f"{forms['snapshot']['wall_ms_median']} ms en memoria"
+            )
+
+        results = {
+            "size": options["size"],
+            "vendor": connection.vendor,
+            "backend": "numpy" if snapshot.np is not None else "array",
+            "repeat": options["repeat"],
+            **filters,
+        }
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(output, encoding="utf-8")
+        else:
+            self.stdout.write(output)
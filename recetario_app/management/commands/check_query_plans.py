@@ -0,0 +1,68 @@
+"""
+Comprueba con EXPLAIN que las consultas de consultas_recetas.py usan índices.
+
+Genera un conjunto de datos sintético en la base de datos de test y falla si alguna
+consulta del catálogo que no esté en EXPECTED_FULL_SCANS recorre una tabla completa.
+
+En PostgreSQL se ejecuta ANALYZE para que el planificador tenga estadísticas. En SQLite
+no: sin sqlite_stat1 el planificador supone que los índices son selectivos, que es justo
+lo que se quiere comprobar (que la consulta puede usar un índice), sin depender de la
+selectividad concreta de los datos sintéticos.
+
+Ejemplo:
+    python manage.py check_query_plans --size 10000
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, NotSupportedError, connection, transaction
+
+from recetario_app.benchmarks import StatementRecorder, build_dataset, fetch_all
+from recetario_app.explain import full_scans
+from recetario_app.queries import EXPECTED_FULL_SCANS, LOOP_QUERIES, READ_QUERIES, WRITE_QUERIES
+
+
+class Command(BaseCommand):
+    help = "Falla si alguna consulta de consultas_recetas.py recorre una tabla completa"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10_000, help="Número de recetas del conjunto sintético")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            build_dataset(options["size"])
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+            failures = self.check_catalog()
+        except NotSupportedError as exc:
+            raise CommandError(exc) from exc
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError("Consultas sin índice:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Ninguna consulta recorre tablas completas fuera de EXPECTED_FULL_SCANS"))
+
+    def check_catalog(self):
+        catalog = [(name, lambda factory=factory: fetch_all(factory())) for name, factory in READ_QUERIES]
+        catalog += LOOP_QUERIES + WRITE_QUERIES
+        failures = []
+        for name, run in catalog:
+            recorder = StatementRecorder()
+            try:
+                # Las escrituras se ejecutan dentro de una transacción que se deshace.
+                with transaction.atomic(), connection.execute_wrapper(recorder):
+                    run()
+                    transaction.set_rollback(True)
+            except (DatabaseError, NotSupportedError) as exc:
+                self.stdout.write(f"  {name}: no soportada en {connection.vendor} ({exc})")
+                continue
+            scans = sorted({table for sql, params in recorder.statements for table in full_scans(sql, params)})
+            if not scans:
+                self.stdout.write(f"  {name}: OK")
+            elif name in EXPECTED_FULL_SCANS:
+                self.stdout.write(f"  {name}: recorre {', '.join(scans)} ({EXPECTED_FULL_SCANS[name]})")
+            else:
+                failures.append(f"{name}: recorre {', '.join(scans)}")
+        return failures
@@ -0,0 +1,27 @@
+"""
+Exporta las recetas con su chef, restaurantes y estadísticas en NDJSON o CSV.
+
+Ejemplo:
+    python manage.py export_catalog --format csv --output recipes.csv
+"""
+from django.core.management.base import BaseCommand
+
+from recetario_app.export import DEFAULT_CHUNK_SIZE, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = "Exporta el catálogo de recetas en streaming (memoria constante)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+        parser.add_argument("--output", help="Fichero de salida (por defecto, stdout)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
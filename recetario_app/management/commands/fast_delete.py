@@ -0,0 +1,39 @@
+"""
+Borra chefs o restaurantes con sus recetas, estadísticas, menús y configuraciones por
+conjuntos (ver recetario_app/deletion.py).
+
+Ejemplo:
+    python manage.py fast_delete chef 12 15
+    python manage.py fast_delete restaurant 7 --skip-signals
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recetario_app.deletion import BATCH_SIZE, fast_delete
+from recetario_app.models import Chef, Restaurant
+
+MODELS = {"chef": Chef, "restaurant": Restaurant}
+
+
+class Command(BaseCommand):
+    help = "Borra chefs o restaurantes y todo lo que depende de ellos con DELETE por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(MODELS))
+        parser.add_argument("ids", nargs="+", type=int)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--skip-signals",
+            action="store_true",
+            help="No emite pre_delete/post_delete; los contadores del catálogo se corrigen por conjuntos",
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options["model"]]
+        queryset = model.objects.filter(pk__in=options["ids"])
+        missing = set(options["ids"]) - set(queryset.values_list("pk", flat=True))
+        if missing:
+            raise CommandError(f"No existen: {sorted(missing)}")
+        total, counts = fast_delete(queryset, skip_signals=options["skip_signals"], batch_size=options["batch_size"])
+        for label, n in sorted(counts.items()):
+            self.stdout.write(f"{label}: {n}")
+        self.stdout.write(f"Total: {total} filas")
@@ -0,0 +1,206 @@
+"""
+Carga masiva del catálogo (chefs, restaurantes, recetas, menús, estadísticas y
+configuraciones) desde ficheros JSONL o CSV.
+
+Los ficheros se leen de forma perezosa y se insertan en lotes de tamaño fijo,
+así que la memoria no crece con el número de filas. Las claves naturales son:
+
+    chef        -> name
+    restaurant  -> name
+    recipe      -> title (si hay títulos repetidos se usa la receta más reciente)
+
+Ejemplo:
+    python manage.py load_catalog --chefs chefs.csv --restaurants restaurants.csv \
+        --recipes recipes.jsonl --menus menus.csv --stats stats.jsonl --configs configs.jsonl
+"""
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recetario_app.export import CSV_LIST_SEPARATOR
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, RestaurantConfig
+from recetario_app.services import rebuild_chef_restaurants, rebuild_recipe_counts
+
+MenuLink = Recipe.restaurants.through
+
+
+def read_records(path):
+    """Devuelve un generador de diccionarios a partir de un fichero .jsonl/.ndjson o .csv"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        with path.open(encoding="utf-8") as fh:
+            for line_number, line in enumerate(fh, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f"{path}:{line_number}: JSON no válido ({exc})") from exc
+    elif suffix == ".csv":
+        with path.open(encoding="utf-8", newline="") as fh:
+            yield from csv.DictReader(fh)
+    else:
+        raise CommandError(f"{path}: formato no soportado, usa .jsonl, .ndjson o .csv")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def as_list(value):
+    """Las listas llegan como listas en JSONL y como texto separado por CSV_LIST_SEPARATOR en CSV"""
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    return list(value)
+
+
+def as_json(value):
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class Command(BaseCommand):
+    help = "Carga masiva del catálogo desde ficheros JSONL/CSV en lotes de tamaño fijo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chefs", help="Fichero con name, specialty")
+        parser.add_argument("--restaurants", help="Fichero con name, location")
+        parser.add_argument(
+            "--recipes", help="Fichero con title, preparation_time, chef y opcionalmente restaurants"
+        )
+        parser.add_argument("--menus", help="Fichero con recipe, restaurant")
+        parser.add_argument("--stats", help="Fichero con recipe, total_orders, positive_reviews")
+        parser.add_argument("--configs", help="Fichero con restaurant, settings")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        if self.batch_size < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+
+        # Chefs y restaurantes son dimensiones pequeñas: se mantienen en memoria.
+        self.chef_ids = dict(Chef.objects.values_list("name", "id"))
+        self.restaurant_ids = dict(Restaurant.objects.values_list("name", "id"))
+
+        steps = [
+            ("chefs", self.load_chefs),
+            ("restaurants", self.load_restaurants),
+            ("recipes", self.load_recipes),
+            ("menus", self.load_menus),
+            ("stats", self.load_stats),
+            ("configs", self.load_configs),
+        ]
+        if not any(options[name] for name, _ in steps):
+            raise CommandError("Indica al menos un fichero a cargar")
+
+        for name, loader in steps:
+            if options[name]:
+                total = 0
+                for batch in batched(read_records(options[name]), self.batch_size):
+                    with transaction.atomic():
+                        total += loader(batch)
+                self.stdout.write(f"{name}: {total} filas")
+
+        # bulk_create no emite señales: los contadores se recalculan al final de la carga.
+        if options["recipes"] or options["menus"]:
+            rebuild_recipe_counts()
+            rebuild_chef_restaurants()
+
+    def load_chefs(self, batch):
+        new = {}
+        for row in batch:
+            if row["name"] not in self.chef_ids:
+                new[row["name"]] = Chef(name=row["name"], specialty=row["specialty"])
+        Chef.objects.bulk_create(new.values())
+        self.chef_ids.update((chef.name, chef.pk) for chef in new.values())
+        return len(new)
+
+    def load_restaurants(self, batch):
+        new = {}
+        for row in batch:
+            if row["name"] not in self.restaurant_ids:
+                new[row["name"]] = Restaurant(name=row["name"], location=row["location"])
+        Restaurant.objects.bulk_create(new.values())
+        self.restaurant_ids.update((restaurant.name, restaurant.pk) for restaurant in new.values())
+        return len(new)
+
+    def load_recipes(self, batch):
+        recipes = [
+            Recipe(
+                title=row["title"],
+                preparation_time=int(row["preparation_time"]),
+                chef_id=self.resolve(self.chef_ids, row["chef"], "chef"),
+            )
+            for row in batch
+        ]
+        # En SQLite >= 3.35 y Postgres bulk_create devuelve las claves primarias,
+        # así que los menús en línea se enlazan sin volver a consultar.
+        Recipe.objects.bulk_create(recipes)
+        links = [
+            MenuLink(recipe_id=recipe.pk, restaurant_id=self.resolve(self.restaurant_ids, name, "restaurant"))
+            for recipe, row in zip(recipes, batch)
+            for name in as_list(row.get("restaurants"))
+        ]
+        MenuLink.objects.bulk_create(links, ignore_conflicts=True)
+        return len(recipes)
+
+    def load_menus(self, batch):
+        recipe_ids = self.recipe_ids(row["recipe"] for row in batch)
+        links = [
+            MenuLink(
+                recipe_id=self.resolve(recipe_ids, row["recipe"], "recipe"),
+                restaurant_id=self.resolve(self.restaurant_ids, row["restaurant"], "restaurant"),
+            )
+            for row in batch
+        ]
+        MenuLink.objects.bulk_create(links, ignore_conflicts=True)
+        return len(links)
+
+    def load_stats(self, batch):
+        recipe_ids = self.recipe_ids(row["recipe"] for row in batch)
+        stats = [
+            RecipeStats(
+                recipe_id=self.resolve(recipe_ids, row["recipe"], "recipe"),
+                total_orders=int(row["total_orders"]),
+                positive_reviews=int(row["positive_reviews"]),
+            )
+            for row in batch
+        ]
+        RecipeStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=["recipe"],
+            update_fields=["total_orders", "positive_reviews"],
+        )
+        return len(stats)
+
+    def load_configs(self, batch):
+        configs = RestaurantConfig.objects.bulk_upsert(
+            (self.resolve(self.restaurant_ids, row["restaurant"], "restaurant"), as_json(row["settings"]))
+            for row in batch
+        )
+        return len(configs)
+
+    def recipe_ids(self, titles):
+        """Resuelve las recetas de un lote con una única consulta (memoria constante)"""
+        return dict(
+            Recipe.objects.filter(title__in=set(titles)).order_by("id").values_list("title", "id")
+        )
+
+    @staticmethod
+    def resolve(ids, key, label):
+        try:
+            return ids[key]
+        except KeyError:
+            raise CommandError(f"{label} desconocido: {key!r}") from None
@@ -0,0 +1,146 @@
+"""
+Prueba de carga de la API de lectura servida con uvicorn (ASGI) y con gunicorn (WSGI).
+
+Arranca cada servidor en un subproceso contra la base de datos configurada (cárgala antes
+con load_catalog o con datos reales), lanza --requests peticiones con --concurrency
+clientes simultáneos y muestra peticiones por segundo y latencias en JSON.
+
+Ejemplo:
+    python manage.py load_test --path "/recetario/recipes/?limit=20" --concurrency 100
+    python manage.py load_test --server asgi --requests 5000 --output load.json
+"""
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = ("asgi", "wsgi")
+
+
+def server_command(server, port, workers, threads):
+    project = settings.ROOT_URLCONF.split(".")[0]
+    if server == "asgi":
+        return [
+            sys.executable, "-m", "uvicorn", f"{project}.asgi:application",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ]
+    return [
+        sys.executable, "-m", "gunicorn", f"{project}.wsgi:application",
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads),
+        "--log-level", "warning",
+    ]
+
+
+def wait_for_port(port, process, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"El servidor terminó al arrancar (código {process.returncode})")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"El servidor no escucha en el puerto {port} tras {timeout}s")
+
+
+async def fetch(port, path):
+    """Una petición HTTP/1.1 con Connection: close; devuelve el código de estado"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(port, path, requests, concurrency):
+    latencies = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in pending:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path)
+            except (OSError, ValueError, IndexError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        return {"errors": errors}
+    latencies.sort()
+    return {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "errors": errors,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compara el rendimiento de la API de lectura con uvicorn (ASGI) y gunicorn (WSGI)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=[*SERVERS, "both"], default="both")
+        parser.add_argument("--path", default="/recetario/recipes/?limit=20")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--workers", type=int, default=1, help="Procesos del servidor")
+        parser.add_argument("--threads", type=int, default=8, help="Hilos por proceso de gunicorn")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        servers = SERVERS if options["server"] == "both" else (options["server"],)
+        results = {
+            "path": options["path"],
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "workers": options["workers"],
+            "threads": options["threads"],
+        }
+        for server in servers:
+            self.stderr.write(f"Probando {server}...")
+            results[server] = self.measure(server, options)
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output, encoding="utf-8")
+        else:
+            self.stdout.write(output)
+
+    def measure(self, server, options):
+        command = server_command(server, options["port"], options["workers"], options["threads"])
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        try:
+            process = subprocess.Popen(command, env=env)
+        except OSError as exc:
+            raise CommandError(f"No se pudo arrancar {command[2]}: {exc}") from exc
+        try:
+            wait_for_port(options["port"], process)
+            return asyncio.run(run_load(options["port"], options["path"], options["requests"], options["concurrency"]))
+        finally:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,29 @@
+"""
+Comprueba o reconstruye ChefRestaurant a partir de los menús de las recetas.
+
+Ejemplo:
+    python manage.py rebuild_chef_restaurants --check
+    python manage.py rebuild_chef_restaurants
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recetario_app.services import chef_restaurant_mismatches, rebuild_chef_restaurants
+
+
+class Command(BaseCommand):
+    help = "Comprueba (--check) o reconstruye la tabla ChefRestaurant"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Solo comprueba; falla si hay filas incorrectas")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            stale, wrong = chef_restaurant_mismatches()
+            if stale or wrong:
+                raise CommandError(
+                    f"ChefRestaurant incorrecta: sobran {stale} filas y {wrong} faltan o no coinciden"
+                )
+            self.stdout.write(self.style.SUCCESS("ChefRestaurant correcta"))
+            return
+        deleted, written = rebuild_chef_restaurants()
+        self.stdout.write(f"Borradas {deleted} filas y escritas {written}")
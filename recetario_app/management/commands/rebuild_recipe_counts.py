@@ -0,0 +1,28 @@
+"""
+Comprueba o recalcula los contadores recipe_count de Chef y Restaurant.
+
+Ejemplo:
+    python manage.py rebuild_recipe_counts --check
+    python manage.py rebuild_recipe_counts
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recetario_app.services import rebuild_recipe_counts, recipe_count_mismatches
+
+
+class Command(BaseCommand):
+    help = "Comprueba (--check) o recalcula recipe_count de chefs y restaurantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Solo comprueba; falla si hay contadores incorrectos")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            chefs, restaurants = recipe_count_mismatches()
+            chefs, restaurants = chefs.count(), restaurants.count()
+            if chefs or restaurants:
+                raise CommandError(f"Contadores incorrectos: {chefs} chefs, {restaurants} restaurantes")
+            self.stdout.write(self.style.SUCCESS("Contadores correctos"))
+            return
+        chefs, restaurants = rebuild_recipe_counts()
+        self.stdout.write(f"Corregidos {chefs} chefs y {restaurants} restaurantes")
@@ -0,0 +1,34 @@
+"""
+Suma los RecipeEvent nuevos (desde la marca de agua) a los agregados por hora y por día.
+
+Pensado para ejecutarse periódicamente (cron, cada pocos minutos). Cada lote se agrega en
+una transacción junto con la nueva marca, así que interrumpirlo no duplica eventos.
+
+Ejemplo:
+    python manage.py rollup_events --batch-size 10000 --lag 60
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recetario_app.rollups import DEFAULT_BATCH_SIZE, aggregate_events
+
+
+class Command(BaseCommand):
+    help = "Agrega los eventos de pedidos y reseñas posteriores a la marca de agua"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--lag",
+            type=int,
+            default=0,
+            help="Segundos de margen: los eventos más recientes esperan a la siguiente ejecución",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+        lag = datetime.timedelta(seconds=options["lag"]) if options["lag"] else None
+        total = aggregate_events(options["batch_size"], lag)
+        self.stdout.write(f"{total} eventos agregados")
@@ -0,0 +1,41 @@
+"""
+Copia la base de datos SQLite principal en cada réplica SQLite (DATABASE_REPLICA_URLS).
+
+Sirve para probar en local PrimaryReplicaRouter con varios ficheros: las réplicas quedan
+como una foto de la principal y no ven las escrituras posteriores hasta la siguiente copia,
+igual que una réplica con retraso.
+
+Ejemplo:
+    DATABASE_REPLICA_URLS=sqlite:///replica1.sqlite3,sqlite:///replica2.sqlite3 \
+        python manage.py sync_sqlite_replicas
+"""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copia la base de datos SQLite principal en las réplicas SQLite"
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("La base de datos principal no es SQLite")
+        replicas = [
+            alias for alias in getattr(settings, "DATABASE_REPLICA_WEIGHTS", {})
+            if connections[alias].vendor == "sqlite"
+        ]
+        if not replicas:
+            raise CommandError("No hay réplicas SQLite en DATABASE_REPLICA_URLS")
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                # API de copia en caliente de SQLite: coherente aunque haya escrituras.
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"{alias}: copiada")
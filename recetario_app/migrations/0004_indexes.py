@@ -0,0 +1,68 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+def create_title_nocase_index(apps, schema_editor):
+    # En SQLite LIKE no distingue mayúsculas, así que title__startswith solo puede
+    # usar un índice con COLLATE NOCASE. En Postgres basta el índice _like de db_index.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE INDEX recipe_title_nocase_idx ON recetario_app_recipe (title COLLATE NOCASE)'
+        )
+
+
+def drop_title_nocase_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_title_nocase_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0003_restaurantconfig'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chef',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='chef',
+            name='specialty',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='preparation_time',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='restaurant',
+            name='location',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='restaurant',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['chef', 'preparation_time'], name='recipe_chef_preptime_idx'),
+        ),
+        # Índice inverso de la tabla intermedia Recipe.restaurants: recetas de un restaurante
+        # sin volver a la tabla (la restricción única ya cubre recipe_id, restaurant_id).
+        migrations.RunSQL(
+            'CREATE INDEX recipe_restaurants_rev_idx ON recetario_app_recipe_restaurants (restaurant_id, recipe_id)',
+            'DROP INDEX recipe_restaurants_rev_idx',
+        ),
+        migrations.RunPython(create_title_nocase_index, drop_title_nocase_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counts(apps, schema_editor):
+    Chef = apps.get_model('recetario_app', 'Chef')
+    Recipe = apps.get_model('recetario_app', 'Recipe')
+    Restaurant = apps.get_model('recetario_app', 'Restaurant')
+    MenuLink = Recipe.restaurants.through
+    per_chef = Recipe.objects.filter(chef=OuterRef('pk')).values('chef').annotate(n=Count('pk')).values('n')
+    per_restaurant = (
+        MenuLink.objects.filter(restaurant=OuterRef('pk')).values('restaurant').annotate(n=Count('pk')).values('n')
+    )
+    Chef.objects.update(recipe_count=Coalesce(Subquery(per_chef), 0))
+    Restaurant.objects.update(recipe_count=Coalesce(Subquery(per_restaurant), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chef',
+            name='recipe_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='recipe_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_recipe_counts, migrations.RunPython.noop),
+    ]
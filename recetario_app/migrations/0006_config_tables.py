@@ -0,0 +1,69 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from recetario_app.config_settings import config_restrictions, config_service_count, config_services
+
+
+def fill_config_tables(apps, schema_editor):
+    RestaurantConfig = apps.get_model('recetario_app', 'RestaurantConfig')
+    RestaurantService = apps.get_model('recetario_app', 'RestaurantService')
+    RestaurantRestriction = apps.get_model('recetario_app', 'RestaurantRestriction')
+    configs = list(RestaurantConfig.objects.only('settings'))
+    for config in configs:
+        config.service_count = config_service_count(config.settings)
+    RestaurantConfig.objects.bulk_update(configs, ['service_count'], batch_size=1000)
+    RestaurantService.objects.bulk_create(
+        [RestaurantService(config=config, name=name) for config in configs for name in config_services(config.settings)],
+        batch_size=1000,
+    )
+    RestaurantRestriction.objects.bulk_create(
+        [
+            RestaurantRestriction(config=config, dish=dish, restricted=restricted)
+            for config in configs
+            for dish, restricted in config_restrictions(config.settings).items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0005_recipe_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantconfig',
+            name='service_count',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='RestaurantRestriction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dish', models.CharField(max_length=100)),
+                ('restricted', models.BooleanField()),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restriction_rows', to='recetario_app.restaurantconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dish', 'restricted', 'config'], name='restaurantrestriction_dish_idx')],
+                'constraints': [models.UniqueConstraint(fields=('config', 'dish'), name='restaurantrestriction_config_dish_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestaurantService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_rows', to='recetario_app.restaurantconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'config'], name='restaurantservice_name_idx')],
+                'constraints': [models.UniqueConstraint(fields=('config', 'name'), name='restaurantservice_config_name_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_config_tables, migrations.RunPython.noop),
+    ]
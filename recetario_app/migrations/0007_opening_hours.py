@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:16
+
+from django.db import migrations, models
+
+from recetario_app.config_settings import config_opening_hours
+
+HOUR_FIELDS = ['weekdays_open', 'weekdays_close', 'weekends_open', 'weekends_close']
+
+
+def fill_opening_hours(apps, schema_editor):
+    RestaurantConfig = apps.get_model('recetario_app', 'RestaurantConfig')
+    configs = list(RestaurantConfig.objects.only('settings'))
+    for config in configs:
+        for day_type, (opens, closes) in config_opening_hours(config.settings).items():
+            setattr(config, f'{day_type}_open', opens)
+            setattr(config, f'{day_type}_close', closes)
+    RestaurantConfig.objects.bulk_update(configs, HOUR_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0006_config_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantconfig',
+            name='weekdays_close',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurantconfig',
+            name='weekdays_open',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurantconfig',
+            name='weekends_close',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurantconfig',
+            name='weekends_open',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantconfig',
+            index=models.Index(fields=['weekdays_close', 'weekdays_open'], name='config_weekdays_hours_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantconfig',
+            index=models.Index(fields=['weekends_close', 'weekends_open'], name='config_weekends_hours_idx'),
+        ),
+        migrations.RunPython(fill_opening_hours, migrations.RunPython.noop),
+    ]
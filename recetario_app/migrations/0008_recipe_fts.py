@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:17
+
+from django.db import migrations
+
+from recetario_app.fts import install_recipe_fts, uninstall_recipe_fts
+
+
+def install(apps, schema_editor):
+    # Solo en SQLite con FTS5; en el resto Recipe.objects.search() usa LIKE.
+    install_recipe_fts(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_recipe_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0007_opening_hours'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
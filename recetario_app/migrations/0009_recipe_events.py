@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0008_recipe_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order', 'Pedido'), ('review', 'Reseña positiva')], max_length=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recetario_app.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recetario_app.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'recipe'], name='recipedailyrollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'bucket'), name='recipedailyrollup_recipe_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recetario_app.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'recipe'], name='recipehourlyrollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'bucket'), name='recipehourlyrollup_recipe_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:26
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0009_recipe_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipestats',
+            name='positive_percentage',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('positive_reviews'), '*', models.Value(100.0)), '/', models.F('total_orders')), total_orders__gt=0), default=None), output_field=models.FloatField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='recipestats',
+            index=models.Index(fields=['positive_percentage', 'recipe'], name='recipestats_percentage_idx'),
+        ),
+    ]
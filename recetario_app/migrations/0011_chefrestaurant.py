@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_chef_restaurants(apps, schema_editor):
+    ChefRestaurant = apps.get_model('recetario_app', 'ChefRestaurant')
+    Recipe = apps.get_model('recetario_app', 'Recipe')
+    MenuLink = Recipe.restaurants.through
+    rows = MenuLink.objects.values('recipe__chef', 'restaurant', 'restaurant__location').annotate(n=Count('pk'))
+    ChefRestaurant.objects.bulk_create(
+        (
+            ChefRestaurant(
+                chef_id=row['recipe__chef'],
+                restaurant_id=row['restaurant'],
+                location=row['restaurant__location'],
+                recipes=row['n'],
+            )
+            for row in rows.order_by()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0010_positive_percentage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChefRestaurant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=100)),
+                ('recipes', models.PositiveIntegerField()),
+                ('chef', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recetario_app.chef')),
+                ('restaurant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recetario_app.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'chef'], name='chefrestaurant_location_idx')],
+                'constraints': [models.UniqueConstraint(fields=('restaurant', 'chef'), name='chefrestaurant_restaurant_chef_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_chef_restaurants, migrations.RunPython.noop),
+    ]
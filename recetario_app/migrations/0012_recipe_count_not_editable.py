@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0011_chefrestaurant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chef',
+            name='recipe_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='restaurant',
+            name='recipe_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:21
+
+import django.db.models.deletion
+import recetario_app.fts
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetario_app', '0012_recipe_count_not_editable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchIndex',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='recetario_app.recipe')),
+                ('document', recetario_app.fts.SearchDocumentField(db_column='recetario_app_recipe_fts')),
+            ],
+            options={
+                'db_table': 'recetario_app_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,35 +1,532 @@
-from django.db import models
+import datetime
 
-class Chef(models.Model):
-    name = models.CharField(max_length=100)
-    specialty = models.CharField(max_length=100)
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from recetario_app.config_settings import (
+    DAY_TYPES,
+    MINUTES_PER_DAY,
+    config_opening_hours,
+    config_service_count,
+    date_day_type,
+)
+from recetario_app.fts import FTS_TABLE, SearchDocumentField, bm25, fts_available, match_expression, search_terms
+from recetario_app.querycache import CachedQuerySet
+
+
+def restaurant_filters(location=None, name=None, restaurants=None, location_lookup="restaurant__location"):
+    """
+    Lookups sobre el restaurante de una fila de menú o de ChefRestaurant.
+
+    `restaurants` es un QuerySet de Restaurant o una lista de ids.
+    """
+    if location is None and name is None and restaurants is None:
+        raise TypeError("Indica location, name o restaurants")
+    lookups = {}
+    if location is not None:
+        lookups[location_lookup] = location
+    if name is not None:
+        lookups["restaurant__name"] = name
+    if restaurants is not None:
+        lookups["restaurant__in"] = restaurants
+    return lookups
+
+
+def menu_entries(location=None, name=None, restaurants=None):
+    """Filas de la tabla intermedia receta-restaurante cuyo restaurante cumple los filtros"""
+    return Recipe.restaurants.through.objects.filter(**restaurant_filters(location, name, restaurants))
+
+
+def semijoin(queryset, related, outer_field):
+    """
+    Filtra `queryset` por las filas de `related` cuyo `outer_field` apunta a ellas, sin JOIN +
+    DISTINCT: cada receta (o chef) sale una vez aunque esté en varios restaurantes.
+
+    En PostgreSQL es un EXISTS correlado, que el planificador ejecuta como semijoin. SQLite
+    evalúa un EXISTS correlado fila a fila recorriendo toda la tabla exterior, así que ahí se
+    usa id IN (SELECT ...), que parte de los índices de `related`.
+    """
+    if connections[queryset.db].vendor == "sqlite":
+        return queryset.filter(pk__in=related.values(outer_field))
+    return queryset.filter(models.Exists(related.filter(**{outer_field: models.OuterRef("pk")})))
+
+
+class ChefQuerySet(CachedQuerySet):
+    def with_recipe_in(self, location=None, name=None, restaurants=None):
+        """Chefs con al menos una receta en un restaurante que cumple los filtros, leyendo ChefRestaurant"""
+        lookups = restaurant_filters(location, name, restaurants, location_lookup="location")
+        return semijoin(self, ChefRestaurant.objects.filter(**lookups), "chef")
+
+
+class RecipeCountMixin:
+    """
+    recipe_count lo mantienen las señales con UPDATE ... F(): el UPDATE de save() no lo
+    escribe, o devolvería a la base de datos el valor con el que se cargó la instancia. Si
+    la fila ya no existe, save() la inserta como siempre, con todos los campos.
+    """
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        values = [value for value in values if value[0].name != "recipe_count"]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class Chef(RecipeCountMixin, models.Model):
+    name = models.CharField(max_length=100, db_index=True)
+    specialty = models.CharField(max_length=100, db_index=True)
+    # Contador desnormalizado, se mantiene con las señales de recetario_app/signals.py
+    recipe_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+
+    objects = ChefQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(CachedQuerySet):
+    def available_in(self, location=None, name=None, restaurants=None):
+        """Recetas en el menú de algún restaurante que cumple los filtros"""
+        return semijoin(self, menu_entries(location, name, restaurants), "recipe")
+
+    def search(self, query, prefix=True):
+        """
+        Recetas cuyo título contiene todas las palabras de `query` (con prefix=True basta
+        con que empiecen por ellas), ordenadas por relevancia en el campo `rank`.
+
+        En SQLite usa el índice FTS5 (ver recetario_app/fts.py); en otros motores, o si el
+        índice no está instalado, recurre a title__icontains por palabra sin ranking.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return self.none()
+        if not fts_available(connections[self.db]):
+            queryset = self
+            for term in terms:
+                queryset = queryset.filter(title__icontains=term)
+            return queryset.annotate(rank=models.Value(0.0)).order_by("title", "pk")
+        # JOIN con la tabla FTS: el MATCH y bm25() se evalúan una sola vez por búsqueda.
+        return (
+            self.filter(search_index__document__match=match_expression(terms, prefix))
+            .annotate(rank=bm25(models.F("search_index__document")))
+            .order_by("rank", "pk")
+        )
+
+
 class Recipe(models.Model):
-    title = models.CharField(max_length=200)
-    preparation_time = models.IntegerField()  # en minutos
+    title = models.CharField(max_length=200, db_index=True)
+    preparation_time = models.IntegerField(db_index=True)  # en minutos
     chef = models.ForeignKey(Chef, on_delete=models.CASCADE)
     restaurants = models.ManyToManyField("Restaurant")
 
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Recetas de un chef por rango de tiempo de preparación
+            models.Index(fields=["chef", "preparation_time"], name="recipe_chef_preptime_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
 
-class Restaurant(models.Model):
-    name = models.CharField(max_length=100)
-    location = models.CharField(max_length=100)
+class RecipeSearchIndex(models.Model):
+    """
+    La tabla virtual FTS5 de recetario_app/fts.py, que solo existe en SQLite. La mantienen
+    sus triggers; aquí solo se declara para que Recipe.objects.search() la una con un JOIN.
+    """
+    recipe = models.OneToOneField(
+        Recipe, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING, related_name="search_index"
+    )
+    document = SearchDocumentField(db_column=FTS_TABLE)
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+class Restaurant(RecipeCountMixin, models.Model):
+    name = models.CharField(max_length=100, db_index=True)
+    location = models.CharField(max_length=100, db_index=True)
+    # Recetas en el menú, se mantiene con las señales de recetario_app/signals.py
+    recipe_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+
+    objects = CachedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+
+class ChefRestaurant(models.Model):
+    """
+    Restaurantes en los que hay alguna receta de cada chef, con cuántas recetas.
+
+    Se mantiene con las señales de recetario_app/signals.py (o con
+    services.rebuild_chef_restaurants() tras operaciones masivas). `location` copia la del
+    restaurante para buscar los chefs de una ciudad con un solo índice.
+    """
+    chef = models.ForeignKey(Chef, on_delete=models.CASCADE)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, db_index=False)
+    location = models.CharField(max_length=100)
+    recipes = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "chef"], name="chefrestaurant_restaurant_chef_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["location", "chef"], name="chefrestaurant_location_idx"),
+        ]
+
+
+class RecipeStatsQuerySet(CachedQuerySet):
+    def leaderboard(self):
+        """Mejor porcentaje de reseñas positivas primero, leyendo recipestats_percentage_idx"""
+        return self.filter(positive_percentage__isnull=False).order_by("-positive_percentage", "-recipe")
+
+
 class RecipeStats(models.Model):
     recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE)
     total_orders = models.IntegerField()
     positive_reviews = models.IntegerField()
+    objects = RecipeStatsQuerySet.as_manager()
+    # Columna generada y almacenada: la calcula la base de datos en cada INSERT/UPDATE,
+    # también en los update() masivos con F() y Floor. Tras save() hay que llamar a
+    # refresh_from_db() para leer el valor nuevo. NULL si aún no hay pedidos.
+    positive_percentage = models.GeneratedField(
+        expression=models.Case(
+            models.When(total_orders__gt=0, then=models.F("positive_reviews") * 100.0 / models.F("total_orders")),
+            default=None,
+        ),
+        output_field=models.FloatField(null=True),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # (porcentaje, receta) recorrido hacia atrás = ORDER BY porcentaje DESC, receta DESC
+            models.Index(fields=["positive_percentage", "recipe"], name="recipestats_percentage_idx"),
+        ]
+
+    @staticmethod
+    def record_order(recipe_id, n=1):
+        """Suma n pedidos a la receta; se escriben en bloque (ver recetario_app/counters.py)"""
+        from recetario_app.counters import buffer
+
+        buffer.add(recipe_id, orders=n)
+
+    @staticmethod
+    def record_review(recipe_id, n=1):
+        """Suma n reseñas positivas a la receta; se escriben en bloque como record_order"""
+        from recetario_app.counters import buffer
+
+        buffer.add(recipe_id, reviews=n)
+
+    @classmethod
+    def live_counts(cls, recipe_id):
+        """(total_orders, positive_reviews) incluyendo los incrementos aún en el búfer"""
+        from recetario_app.counters import buffer
+
+        stored = cls.objects.filter(recipe_id=recipe_id).values_list("total_orders", "positive_reviews").first()
+        orders, reviews = buffer.pending(recipe_id)
+        stored_orders, stored_reviews = stored or (0, 0)
+        return stored_orders + orders, stored_reviews + reviews
+
+
+class RecipeEvent(models.Model):
+    """
+    Registro de pedidos y reseñas positivas, solo se añaden filas. Las ventanas de tiempo
+    se consultan en las tablas agregadas (ver recetario_app/rollups.py), no aquí.
+    """
+    ORDER = "order"
+    REVIEW = "review"
+    KINDS = [(ORDER, "Pedido"), (REVIEW, "Reseña positiva")]
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    quantity = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class RecipeRollup(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    orders = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class RecipeHourlyRollup(RecipeRollup):
+    """Pedidos y reseñas de una receta en una hora (bucket = inicio de la hora en UTC)"""
+    bucket = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["recipe", "bucket"], name="recipehourlyrollup_recipe_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["bucket", "recipe"], name="recipehourlyrollup_bucket_idx"),
+        ]
+
+
+class RecipeDailyRollup(RecipeRollup):
+    """Pedidos y reseñas de una receta en un día (UTC)"""
+    bucket = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["recipe", "bucket"], name="recipedailyrollup_recipe_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["bucket", "recipe"], name="recipedailyrollup_bucket_idx"),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Último RecipeEvent ya sumado a las tablas agregadas"""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+
+PATCH_BATCH_SIZE = 1000
+
+
+class RestaurantConfigQuerySet(CachedQuerySet):
+    """
+    Traduce los lookups sobre settings más usados a las tablas derivadas indexadas:
+
+        settings__services__contains="delivery"        -> RestaurantService.name
+        settings__services__icontains="delivery"       -> RestaurantService.name__icontains
+        settings__services__2__isnull=False            -> service_count > 2
+        settings__restricted_dishes__alcohol=True      -> RestaurantRestriction
+        settings__restricted_dishes__alcohol__isnull=False
+
+    Se traducen los argumentos con nombre de filter(), exclude() y get() y los que van
+    dentro de objetos Q, también anidados o negados. El resto de lookups sobre settings se
+    resuelven sobre el JSON como siempre.
+    """
+
+    def filter(self, *args, **kwargs):
+        args, kwargs = self._route_settings_lookups(args, kwargs)
+        return super().filter(*args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        args, kwargs = self._route_settings_lookups(args, kwargs)
+        return super().exclude(*args, **kwargs)
+
+    def _route_settings_lookups(self, args, kwargs):
+        routed = [self._route_q(arg) if isinstance(arg, models.Q) else arg for arg in args]
+        remaining = {}
+        for key, value in kwargs.items():
+            q = self._settings_lookup(key, value)
+            if q is None:
+                remaining[key] = value
+            else:
+                routed.append(q)
+        return routed, remaining
+
+    def _route_q(self, q):
+        children = []
+        for child in q.children:
+            if isinstance(child, models.Q):
+                child = self._route_q(child)
+            elif isinstance(child, tuple):
+                child = self._settings_lookup(*child) or child
+            children.append(child)
+        return models.Q.create(children, connector=q.connector, negated=q.negated)
+
+    def _settings_lookup(self, key, value):
+        """El Q equivalente sobre las tablas derivadas, o None si no hay traducción"""
+        parts = key.split("__")
+        if parts[:2] == ["settings", "services"]:
+            return self._services_lookup(parts[2:], value)
+        if parts[:2] == ["settings", "restricted_dishes"]:
+            return self._restrictions_lookup(parts[2:], value)
+        return None
+
+    def open_at(self, day_type, time, previous_day_type=None):
+        """
+        Configuraciones abiertas a la hora `time` (datetime.time o minutos desde medianoche)
+        en `day_type` ("weekdays" o "weekends"). Los días cerrados tienen las columnas a null.
+
+        De madrugada siguen abiertos los horarios del día anterior que pasan de medianoche;
+        `previous_day_type` es el tipo de ese día (por defecto `day_type`: el sábado de
+        madrugada es "weekends" pero el horario que sigue abierto es el del viernes).
+        """
+        previous_day_type = day_type if previous_day_type is None else previous_day_type
+        for value in (day_type, previous_day_type):
+            if value not in DAY_TYPES:
+                raise ValueError(f"day_type debe ser uno de {DAY_TYPES}, no {value!r}")
+        minute = time.hour * 60 + time.minute if isinstance(time, datetime.time) else int(time)
+        opens, closes = f"{day_type}_open", f"{day_type}_close"
+        # El cierre se guarda > apertura (sumando un día si pasa de medianoche), así que
+        # a la hora T está abierto si apertura <= T < cierre, o si T es la madrugada de un
+        # horario del día anterior: cierre > T + 24h.
+        return self.filter(
+            models.Q(**{f"{opens}__lte": minute, f"{closes}__gt": minute})
+            | models.Q(**{f"{previous_day_type}_close__gt": minute + MINUTES_PER_DAY})
+        )
+
+    def patch(self, filter, changes):
+        """
+        Aplica {ruta: valor} al JSON de settings de las configuraciones que cumplen `filter`
+        (un Q, un diccionario de lookups o None para todas) sin leer ni reescribir el
+        documento entero en Python; ver recetario_app/jsonpatch.py para las rutas.
+
+            RestaurantConfig.objects.patch({"restaurant__location": "Madrid"},
+                                           {"restricted_dishes.alcohol": True, "services[]": "terraza"})
+
+        Recalcula las columnas y tablas derivadas de las filas afectadas y devuelve cuántas son.
+        """
+        from recetario_app.config_cache import config_cache
+        from recetario_app.jsonpatch import JSONPatch
+        from recetario_app.services import sync_config_tables
+
+        queryset = self
+        if isinstance(filter, dict):
+            queryset = queryset.filter(**filter)
+        elif filter is not None:
+            queryset = queryset.filter(filter)
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            # Los ids se fijan antes: el filtro puede depender de lo que se va a cambiar.
+            ids = list(queryset.using(using).values_list("pk", flat=True))
+            for start in range(0, len(ids), PATCH_BATCH_SIZE):
+                batch = ids[start : start + PATCH_BATCH_SIZE]
+                self.model.objects.using(using).filter(pk__in=batch).update(
+                    settings=JSONPatch(models.F("settings"), changes)
+                )
+                configs = list(self.model.objects.using(using).filter(pk__in=batch).only("restaurant", "settings"))
+                for config in configs:
+                    config.refresh_derived_fields()
+                self.model.objects.using(using).bulk_update(configs, self.model.DERIVED_FIELDS)
+                sync_config_tables(configs)
+                config_cache.invalidate_many((config.restaurant_id for config in configs), using=using)
+        return len(ids)
+
+    def bulk_upsert(self, configs, batch_size=1000):
+        """
+        Crea o reemplaza la configuración de cada restaurante. `configs` son RestaurantConfig
+        sin guardar o pares (restaurant_id, settings). Hace unas pocas consultas por lote en
+        lugar de un save() por restaurante, y mantiene columnas y tablas derivadas.
+        """
+        from recetario_app.config_cache import config_cache
+        from recetario_app.services import sync_config_tables
+
+        configs = [
+            config
+            if isinstance(config, RestaurantConfig)
+            else RestaurantConfig(restaurant_id=config[0], settings=config[1])
+            for config in configs
+        ]
+        for config in configs:
+            config.refresh_derived_fields()
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            for start in range(0, len(configs), batch_size):
+                batch = configs[start : start + batch_size]
+                # En SQLite >= 3.35 y PostgreSQL devuelve el pk también de las filas actualizadas.
+                self.model.objects.using(using).bulk_create(
+                    batch,
+                    update_conflicts=True,
+                    unique_fields=["restaurant"],
+                    update_fields=["settings", *self.model.DERIVED_FIELDS],
+                )
+                sync_config_tables(batch)
+            config_cache.invalidate_many((config.restaurant_id for config in configs), using=using)
+        return configs
+
+    def open_now(self):
+        now = timezone.localtime()
+        yesterday = now - datetime.timedelta(days=1)
+        return self.open_at(date_day_type(now), now.time(), previous_day_type=date_day_type(yesterday))
+
+    @staticmethod
+    def _services_lookup(parts, value):
+        if parts in (["contains"], ["icontains"]) and isinstance(value, str):
+            name_lookup = "name" if parts == ["contains"] else "name__icontains"
+            return models.Q(pk__in=RestaurantService.objects.filter(**{name_lookup: value}).values("config_id"))
+        if len(parts) == 2 and parts[0].isdigit() and parts[1] == "isnull" and isinstance(value, bool):
+            index = int(parts[0])
+            return models.Q(service_count__lte=index) if value else models.Q(service_count__gt=index)
+        return None
+
+    @staticmethod
+    def _restrictions_lookup(parts, value):
+        if parts[1:] == ["exact"]:
+            parts = parts[:1]
+        if len(parts) == 1 and isinstance(value, bool):
+            restrictions = RestaurantRestriction.objects.filter(dish=parts[0], restricted=value)
+            return models.Q(pk__in=restrictions.values("config_id"))
+        if len(parts) == 2 and parts[1] == "isnull" and isinstance(value, bool):
+            q = models.Q(pk__in=RestaurantRestriction.objects.filter(dish=parts[0]).values("config_id"))
+            return ~q if value else q
+        return None
+
 
 class RestaurantConfig(models.Model):
     restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE)
-    settings = models.JSONField()
\ No newline at end of file
+    settings = models.JSONField()
+    # Derivado de settings al guardar (ver refresh_derived_fields)
+    service_count = models.PositiveSmallIntegerField(default=0, db_index=True)
+    # settings["opening_hours"] en minutos desde medianoche; null = cerrado
+    weekdays_open = models.PositiveSmallIntegerField(null=True, blank=True)
+    weekdays_close = models.PositiveSmallIntegerField(null=True, blank=True)
+    weekends_open = models.PositiveSmallIntegerField(null=True, blank=True)
+    weekends_close = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    objects = RestaurantConfigQuerySet.as_manager()
+
+    DERIVED_FIELDS = ["service_count", "weekdays_open", "weekdays_close", "weekends_open", "weekends_close"]
+
+    class Meta:
+        indexes = [
+            # open_at() filtra por rango sobre el cierre y después por la apertura
+            models.Index(fields=["weekdays_close", "weekdays_open"], name="config_weekdays_hours_idx"),
+            models.Index(fields=["weekends_close", "weekends_open"], name="config_weekends_hours_idx"),
+        ]
+
+    def refresh_derived_fields(self):
+        """Recalcula las columnas que se guardan a partir de settings"""
+        self.service_count = config_service_count(self.settings)
+        for day_type, (opens, closes) in config_opening_hours(self.settings).items():
+            setattr(self, f"{day_type}_open", opens)
+            setattr(self, f"{day_type}_close", closes)
+
+    def save(self, *args, **kwargs):
+        self.refresh_derived_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "settings" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *self.DERIVED_FIELDS}
+        # La fila y sus tablas derivadas (señal post_save) se escriben juntas.
+        with transaction.atomic(using=kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+
+class RestaurantService(models.Model):
+    """Un servicio de settings["services"], mantenido por services.sync_config_tables"""
+    config = models.ForeignKey(RestaurantConfig, on_delete=models.CASCADE, related_name="service_rows")
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["config", "name"], name="restaurantservice_config_name_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["name", "config"], name="restaurantservice_name_idx"),
+        ]
+
+
+class RestaurantRestriction(models.Model):
+    """Una entrada de settings["restricted_dishes"], mantenida por services.sync_config_tables"""
+    config = models.ForeignKey(RestaurantConfig, on_delete=models.CASCADE, related_name="restriction_rows")
+    dish = models.CharField(max_length=100)
+    restricted = models.BooleanField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["config", "dish"], name="restaurantrestriction_config_dish_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["dish", "restricted", "config"], name="restaurantrestriction_dish_idx"),
+        ]
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Catálogo de los patrones de consulta de consultas_recetas.py (secciones 3-6 y reto final).
+
+Cada entrada es (nombre, fábrica) donde la fábrica construye un QuerySet nuevo en cada
+llamada. Lo usan el benchmark y la comprobación de planes de ejecución, así que si se
+añade una consulta en consultas_recetas.py hay que añadirla también aquí.
+"""
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Floor
+
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, RestaurantConfig
+
+READ_QUERIES = [
+    # 3. Field lookups
+    ("2.1 title__icontains", lambda: Recipe.objects.filter(title__icontains="Beef")),
+    ("2.1 Recipe.objects.search", lambda: Recipe.objects.search("Beef")),
+    ("3.1 preparation_time 30-90", lambda: Recipe.objects.filter(preparation_time__gte=30, preparation_time__lte=90)),
+    ("3.2 title__startswith", lambda: Recipe.objects.filter(title__startswith="Chocolate")),
+    ("3.3 exclude chef__specialty", lambda: Recipe.objects.exclude(chef__specialty="Cocina francesa")),
+    # 4. Lookups que atraviesan relaciones
+    ("4.1 recetas en Londres", lambda: Recipe.objects.available_in(location="Londres")),
+    ("4.2 chefs en Hell's Kitchen", lambda: Chef.objects.with_recipe_in(name="Hell's Kitchen")),
+    (
+        "4.3 restaurantes con >5 recetas",
+        lambda: Restaurant.objects.filter(recipe_count__gt=5),
+    ),
+    # 5. F expressions
+    ("5.1 positive_reviews > total_orders", lambda: RecipeStats.objects.filter(positive_reviews__gt=F("total_orders"))),
+    ("5.3 porcentaje positivas", lambda: RecipeStats.objects.values("recipe", "positive_percentage")),
+    (
+        "5.3 mejor valoradas por especialidad",
+        lambda: RecipeStats.objects.filter(
+            Exists(Recipe.objects.filter(pk=OuterRef("recipe"), chef__specialty="Cocina española"))
+        ).leaderboard()[:10],
+    ),
+    # 6. JSONField
+    (
+        "6.2 services contiene delivery",
+        lambda: RestaurantConfig.objects.filter(settings__services__contains="delivery"),
+    ),
+    ("6.3 alcohol restringido", lambda: RestaurantConfig.objects.filter(settings__restricted_dishes__alcohol=True)),
+    (
+        "6.4 weekends empieza 10am",
+        lambda: RestaurantConfig.objects.filter(settings__opening_hours__weekends__startswith="10am"),
+    ),
+    ("6.5 más de dos servicios", lambda: RestaurantConfig.objects.filter(settings__services__2__isnull=False)),
+    # Reto final: relaciones
+    ("reto i recetas por especialidad", lambda: Recipe.objects.filter(chef__specialty="Cocina española")),
+    ("reto ii recetas en Madrid", lambda: Recipe.objects.available_in(location="Madrid")),
+    (
+        "reto iii Gordon Ramsay en Hell's Kitchen",
+        lambda: Recipe.objects.filter(chef__name="Gordon Ramsay").available_in(name="Hell's Kitchen"),
+    ),
+    ("reto iv chefs en Barcelona", lambda: Chef.objects.with_recipe_in(location="Barcelona")),
+    (
+        "reto v rápidas en The Savoy Grill",
+        lambda: Recipe.objects.filter(preparation_time__lt=30).available_in(name="The Savoy Grill"),
+    ),
+    (
+        "reto vi recetas en restaurantes populares",
+        lambda: Recipe.objects.available_in(restaurants=Restaurant.objects.filter(recipe_count__gt=5)),
+    ),
+    # Reto final: F expressions
+    (
+        "reto F iii positivas anotadas",
+        lambda: Recipe.objects.annotate(positive_reviews=F("recipestats__positive_reviews")).filter(
+            positive_reviews__gt=F("recipestats__total_orders")
+        ),
+    ),
+    # Reto final: JSONField
+    (
+        "reto JSON i delivery icontains",
+        lambda: RestaurantConfig.objects.filter(settings__services__icontains="delivery"),
+    ),
+    (
+        "reto JSON ii weekends istartswith 10am",
+        lambda: RestaurantConfig.objects.filter(settings__opening_hours__weekends__istartswith="10am"),
+    ),
+    (
+        "reto JSON iv contador de servicios",
+        lambda: RestaurantConfig.objects.annotate(servicios_contador=F("settings__services")).filter(
+            servicios_contador__gt=2
+        ),
+    ),
+    (
+        "reto JSON v weekdays 8am-10pm",
+        lambda: RestaurantConfig.objects.filter(settings__opening_hours__weekdays__icontains="8am-10pm"),
+    ),
+    (
+        "reto JSON vi cerrado fines de semana",
+        lambda: RestaurantConfig.objects.filter(settings__opening_hours__weekends=None),
+    ),
+    (
+        "reto JSON vii internet gratuito",
+        lambda: RestaurantConfig.objects.filter(settings__services__icontains="internet gratuito"),
+    ),
+    (
+        "reto JSON viii platos exclusivos",
+        lambda: RestaurantConfig.objects.filter(settings__icontains="platos exclusivos"),
+    ),
+]
+
+# Semijoins de la sección 4 y el reto final en su forma original y con available_in /
+# with_recipe_in: (nombre, JOIN + DISTINCT, semijoin). Los compara benchmark_semijoins a
+# medida que crecen los menús.
+SEMIJOIN_QUERIES = [
+    (
+        "4.1 recetas en Londres",
+        lambda: Recipe.objects.filter(restaurants__location="Londres").distinct(),
+        lambda: Recipe.objects.available_in(location="Londres"),
+    ),
+    (
+        "4.2 chefs en Hell's Kitchen",
+        lambda: Chef.objects.filter(recipe__restaurants__name="Hell's Kitchen").distinct(),
+        lambda: Chef.objects.with_recipe_in(name="Hell's Kitchen"),
+    ),
+    (
+        "reto iii Gordon Ramsay en Hell's Kitchen",
+        lambda: Recipe.objects.filter(chef__name="Gordon Ramsay", restaurants__name="Hell's Kitchen").distinct(),
+        lambda: Recipe.objects.filter(chef__name="Gordon Ramsay").available_in(name="Hell's Kitchen"),
+    ),
+    (
+        "reto iv chefs en Barcelona",
+        lambda: Chef.objects.filter(recipe__restaurants__location="Barcelona").distinct(),
+        lambda: Chef.objects.with_recipe_in(location="Barcelona"),
+    ),
+    (
+        "reto vi recetas en restaurantes populares",
+        lambda: Recipe.objects.filter(restaurants__in=Restaurant.objects.filter(recipe_count__gt=5)).distinct(),
+        lambda: Recipe.objects.available_in(restaurants=Restaurant.objects.filter(recipe_count__gt=5)),
+    ),
+]
+
+# Actualizaciones masivas: cada fábrica ejecuta el update y devuelve las filas afectadas.
+WRITE_QUERIES = [
+    ("5.2 total_orders + 10", lambda: RecipeStats.objects.update(total_orders=F("total_orders") + 10)),
+    (
+        "reto F ii positive_reviews + 5%",
+        lambda: RecipeStats.objects.update(
+            positive_reviews=F("positive_reviews") + Floor(F("positive_reviews") * 0.05)
+        ),
+    ),
+    (
+        "reto F v duplica total_orders > 100",
+        lambda: RecipeStats.objects.filter(total_orders__gt=100).update(total_orders=F("total_orders") * 2),
+    ),
+    (
+        "reto F vi resetea sin pedidos",
+        lambda: RecipeStats.objects.filter(total_orders__lt=1).update(total_orders=0, positive_reviews=0),
+    ),
+]
+
+
+def recipes_with_chef_names():
+    """Reto final i tal cual está escrito: un acceso perezoso a receta.chef por cada receta (N+1)"""
+    return [(receta.title, receta.chef.name) for receta in Recipe.objects.filter(chef__specialty="Cocina española")]
+
+
+# Patrones que ejecutan código Python sobre los resultados, no un único QuerySet.
+LOOP_QUERIES = [
+    ("reto i bucle receta.chef.name", recipes_with_chef_names),
+]
+
+# Consultas que recorren una tabla completa por diseño, con el motivo. check_query_plans
+# falla si cualquier otra consulta del catálogo deja de usar un índice.
+EXPECTED_FULL_SCANS = {
+    "2.1 title__icontains": "LIKE '%...%' no puede usar un índice B-tree",
+    "2.1 Recipe.objects.search": "solo sin FTS5 (p.ej. Postgres), donde recurre a LIKE",
+    "3.3 exclude chef__specialty": "NOT IN: devuelve casi todas las recetas",
+    "5.1 positive_reviews > total_orders": "compara dos columnas de la misma fila",
+    "5.3 porcentaje positivas": "lee el porcentaje de todas las filas",
+    "reto F iii positivas anotadas": "compara dos columnas de la misma fila",
+    "6.4 weekends empieza 10am": "lookup sobre JSON",
+    "reto JSON i delivery icontains": "icontains recorre la tabla de servicios (pequeña), no el JSON",
+    "reto JSON ii weekends istartswith 10am": "lookup sobre JSON",
+    "reto JSON iv contador de servicios": "lookup sobre JSON",
+    "reto JSON v weekdays 8am-10pm": "lookup sobre JSON",
+    "reto JSON vi cerrado fines de semana": "lookup sobre JSON",
+    "reto JSON vii internet gratuito": "icontains recorre la tabla de servicios (pequeña), no el JSON",
+    "reto JSON viii platos exclusivos": "lookup sobre JSON",
+    "5.2 total_orders + 10": "actualiza todas las filas",
+    "reto F ii positive_reviews + 5%": "actualiza todas las filas",
+    "reto F v duplica total_orders > 100": "total_orders cambia en cada pedido y no se indexa",
+    "reto F vi resetea sin pedidos": "total_orders cambia en cada pedido y no se indexa",
+}
+
+# Filtros de snapshot.CatalogSnapshot.recipe_ids; el ORM los resuelve con snapshot.filter_queryset.
+SNAPSHOT_FILTERS = [
+    ("tiempo 30-90", {"min_time": 30, "max_time": 90}),
+    ("cocina española", {"specialty": "Cocina española"}),
+    ("Londres con delivery", {"location": "Londres", "services": ["delivery"]}),
+    (
+        "tiempo <= 45, cocina italiana, Madrid",
+        {"max_time": 45, "specialty": "Cocina italiana", "location": "Madrid"},
+    ),
+    ("takeaway y catering, >= 500 pedidos", {"services": ["takeaway", "catering"], "min_orders": 500}),
+    (
+        "todos los filtros",
+        {
+            "min_time": 20, "max_time": 120, "specialty": "Cocina francesa", "location": "Londres",
+            "services": ["dine-in"], "min_orders": 100,
+        },
+    ),
+]
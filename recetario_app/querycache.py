@@ -0,0 +1,201 @@
+"""
+Caché opcional de resultados de QuerySet con invalidación por versión de tabla.
+
+    Chef.objects.filter(specialty="Cocina española").cached()
+    Recipe.objects.search("beef").select_related("chef").cached(timeout=60)
+
+La clave es el SQL compilado, sus parámetros, la base de datos y la versión actual de cada
+tabla que aparece en el SQL. Cualquier INSERT, UPDATE o DELETE sobre una tabla (save,
+delete, update(), bulk_create, bulk_update, cambios en un ManyToMany, cargas masivas...)
+cambia su versión, así que las entradas antiguas dejan de encontrarse y el backend las
+acaba descartando. Las versiones se cambian en el momento de la escritura y otra vez al
+confirmar la transacción, para que nadie guarde en caché datos anteriores al COMMIT con
+la versión nueva.
+
+Las réplicas pueden ir con retraso: durante QUERY_CACHE_REPLICA_LAG segundos desde el
+último cambio de versión de alguna de sus tablas, los fallos de caché se leen de la base
+de datos principal, para no guardar con la versión nueva lo que una réplica aún no tiene.
+Pasado ese margen se leen de donde diga el router. Con .using() se respeta el alias pedido.
+
+Solo se cachea la iteración del QuerySet (list(), for, get(), first()...); count(),
+exists() y aggregate() van siempre a la base de datos, igual que los QuerySet con
+prefetch_related.
+
+El backend es la caché QUERY_CACHE_ALIAS de CACHES: LocMemCache (LRU por proceso) por
+defecto, FileBasedCache (o cualquier otro backend de Django) para compartirla entre
+procesos. query_cache_stats() devuelve aciertos y fallos de este proceso.
+"""
+import hashlib
+import re
+import threading
+import time
+import uuid
+from functools import lru_cache, partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.backends.signals import connection_created
+
+VERSION_PREFIX = "querycache:version:"
+RESULT_PREFIX = "querycache:result:"
+IDENTIFIER_RE = re.compile(r'"(\w+)"')
+WRITE_RE = re.compile(r'^\s*(?:INSERT(?: OR \w+)? INTO|UPDATE|DELETE FROM|REPLACE INTO)\s+"?(\w+)"?', re.IGNORECASE)
+# Marca para distinguir "no está en la caché" de un resultado vacío guardado.
+MISSING = object()
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def backend():
+    return caches[getattr(settings, "QUERY_CACHE_ALIAS", "default")]
+
+
+@lru_cache(maxsize=None)
+def model_tables():
+    return {model._meta.db_table for model in apps.get_models(include_auto_created=True)}
+
+
+def query_tables(sql):
+    return sorted(set(IDENTIFIER_RE.findall(sql)) & model_tables())
+
+
+def new_version(changed_at=0):
+    """Una versión al azar, que nunca coincide con la de entradas anteriores, y cuándo cambió la tabla"""
+    return f"{uuid.uuid4().hex}:{changed_at}"
+
+
+def version_changed_at(version):
+    # Las versiones sin marca de tiempo (anteriores a ella) cuentan como antiguas.
+    return float(version.partition(":")[2] or 0)
+
+
+def table_versions(tables):
+    """Versión actual de cada tabla; si no existe (o el backend la ha descartado) se crea"""
+    cache = backend()
+    keys = [VERSION_PREFIX + table for table in tables]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Sin versión no se sabe cuándo cambió la tabla: se trata como un cambio antiguo.
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_tables(tables):
+    version = new_version(time.time())
+    backend().set_many({VERSION_PREFIX + table: version for table in tables}, timeout=None)
+    with _stats_lock:
+        _stats["invalidations"] += len(tables)
+
+
+def invalidate_on_write(execute, sql, params, many, context):
+    """execute_wrapper instalado en cada conexión: cambia la versión de la tabla escrita"""
+    match = WRITE_RE.match(sql)
+    result = execute(sql, params, many, context)
+    if match:
+        tables = [match.group(1)]
+        bump_tables(tables)
+        connection = context["connection"]
+        if connection.in_atomic_block:
+            transaction.on_commit(partial(bump_tables, tables), using=connection.alias)
+    return result
+
+
+def install_invalidation(sender, connection, **kwargs):
+    # connection_created se emite en cada reconexión del mismo DatabaseWrapper.
+    if invalidate_on_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(invalidate_on_write)
+
+
+connection_created.connect(install_invalidation, dispatch_uid="recetario_querycache_invalidation")
+
+
+def replica_lag():
+    return getattr(settings, "QUERY_CACHE_REPLICA_LAG", 5)
+
+
+def recently_changed(versions):
+    """True si alguna de las versiones ha cambiado dentro del margen de retraso de las réplicas"""
+    since = time.time() - replica_lag()
+    return any(version_changed_at(version) > since for version in versions)
+
+
+def query_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_query_cache_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet con .cached(); la caché solo se usa si se pide explícitamente"""
+
+    _cache_timeout = None
+    _cache_enabled = False
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone._cache_enabled = True
+        clone._cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_enabled = self._cache_enabled
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_enabled and not self._prefetch_related_lookups:
+            rows = self._cached_rows()
+            if rows is not None:
+                self._result_cache = rows
+        super()._fetch_all()
+
+    def _cached_rows(self):
+        try:
+            sql, params = self.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        tables = query_tables(sql)
+        versions = table_versions(tables)
+        # Las réplicas son copias de la principal: sin .using() todas comparten la entrada.
+        key = RESULT_PREFIX + hashlib.sha256(
+            repr((self._db, self._iterable_class.__name__, sql, params, versions)).encode()
+        ).hexdigest()
+        cache = backend()
+        rows = cache.get(key, MISSING)
+        if rows is not MISSING:
+            with _stats_lock:
+                _stats["hits"] += 1
+            return rows
+        with _stats_lock:
+            _stats["misses"] += 1
+        queryset = self
+        if self._db is None and recently_changed(versions):
+            queryset = self.using(DEFAULT_DB_ALIAS)
+        rows = list(self._iterable_class(queryset))
+        if self._cache_timeout is None:
+            cache.set(key, rows)
+        else:
+            cache.set(key, rows, self._cache_timeout)
+        return rows
+
+
+class CachedManager(models.Manager.from_queryset(CachedQuerySet)):
+    """Manager cuyas consultas usan la caché por defecto"""
+
+    def get_queryset(self):
+        return super().get_queryset().cached()
@@ -0,0 +1,231 @@
+"""
+Instrumentación de consultas: registra cada sentencia SQL con su duración y detecta N+1.
+
+Dos formas de uso:
+
+    # En scripts como consultas_recetas.py o en tests
+    with query_watch(budget=5) as report:
+        for receta in Recipe.objects.filter(chef__specialty="Cocina española"):
+            receta.chef.name
+    print(report.summary())
+
+    # Por petición: QueryWatchMiddleware (ver QUERY_WATCH en settings.py)
+
+Las sentencias se agrupan por forma (el SQL con los parámetros fuera y las listas IN
+colapsadas). Una forma que se repite al menos `threshold` veces desde la misma línea
+del proyecto es un N+1; si además la dispara un descriptor de relación (receta.chef,
+chef.recipe_set, receta.restaurants...) se marca como carga perezosa.
+"""
+import logging
+import re
+import sysconfig
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from recetario_app import querycache
+
+logger = logging.getLogger("recetario_app.querywatch")
+
+DEFAULT_THRESHOLD = 5
+DJANGO_DIR = str(Path(django.__file__).parent)
+# Ficheros del proyecto que no son el origen de una consulta: este y la caché de QuerySet,
+# que está en medio de la evaluación de todos los QuerySet del proyecto.
+SKIPPED_FILES = {__file__, querycache.__file__}
+# receta.chef y similares cargan el objeto desde este fichero de Django.
+RELATED_DESCRIPTORS = str(Path(DJANGO_DIR) / "db" / "models" / "fields" / "related_descriptors.py")
+# Desde aquí hacia dentro la pila es la ejecución de la consulta y sus execute_wrapper
+# (como el de querycache.py), no quien la ha pedido.
+BACKENDS_DIR = str(Path(DJANGO_DIR) / "db" / "backends")
+# chef.recipe_set.all() y receta.restaurants.all() se evalúan fuera del descriptor, pero su
+# SQL filtra por una única clave ajena: WHERE "tabla"."chef_id" = %s.
+RELATION_FILTER_RE = re.compile(r'WHERE \(?"\w+"\."\w+_id" = %s\)?(?: ORDER BY [^%]*)?(?: LIMIT \d+)?$')
+IN_LIST_RE = re.compile(r"\((?:%s, )+%s\)")
+LIBRARY_DIRS = (DJANGO_DIR, *{sysconfig.get_paths()[name] for name in ("stdlib", "purelib", "platlib")})
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class NPlusOneDetected(AssertionError):
+    pass
+
+
+def statement_shape(sql):
+    return IN_LIST_RE.sub("(...)", sql)
+
+
+def call_site(stack):
+    """
+    Línea más interna de la pila que no es de Django, de la biblioteca estándar ni de
+    SKIPPED_FILES, sin contar la ejecución de la consulta
+    """
+    for index, frame in enumerate(stack):
+        if frame.filename.startswith(BACKENDS_DIR):
+            stack = stack[:index]
+            break
+    for frame in reversed(stack):
+        if frame.filename not in SKIPPED_FILES and not frame.filename.startswith(LIBRARY_DIRS):
+            return f"{frame.filename}:{frame.lineno} en {frame.name}"
+    return "?"
+
+
+class Statement:
+    __slots__ = ("sql", "params", "duration", "call_site", "lazy", "alias")
+
+    def __init__(self, sql, params, duration, call_site, lazy, alias):
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.call_site = call_site
+        self.lazy = lazy
+        self.alias = alias
+
+    @property
+    def shape(self):
+        return statement_shape(self.sql)
+
+
+class QueryReport:
+    """execute_wrapper que acumula las sentencias de un bloque o de una petición"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, alias="default"):
+        self.threshold = threshold
+        self.alias = alias
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = traceback.extract_stack()[:-1]
+        lazy = bool(RELATION_FILTER_RE.search(sql)) or any(frame.filename == RELATED_DESCRIPTORS for frame in stack)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.statements.append(Statement(sql, params, duration, call_site(stack), lazy, self.alias))
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def duration(self):
+        return sum(statement.duration for statement in self.statements)
+
+    def groups(self):
+        """[(forma, veces, tiempo total)] de la forma más repetida a la menos"""
+        counts = Counter()
+        durations = defaultdict(float)
+        for statement in self.statements:
+            counts[statement.shape] += 1
+            durations[statement.shape] += statement.duration
+        return [(shape, count, durations[shape]) for shape, count in counts.most_common()]
+
+    def n_plus_one(self):
+        """[(forma, línea, veces, perezosa)] de las formas repetidas desde una misma línea"""
+        by_site = defaultdict(list)
+        for statement in self.statements:
+            by_site[(statement.shape, statement.call_site)].append(statement)
+        return [
+            (shape, site, len(statements), any(statement.lazy for statement in statements))
+            for (shape, site), statements in by_site.items()
+            if len(statements) >= self.threshold
+        ]
+
+    def summary(self):
+        lines = [f"{self.count} consultas en {self.duration * 1000:.1f} ms"]
+        for shape, site, count, lazy in self.n_plus_one():
+            kind = "carga perezosa de relación" if lazy else "consulta repetida"
+            lines.append(f"  N+1 ({kind}) x{count} en {site}: {shape[:200]}")
+        return "\n".join(lines)
+
+    def check(self, budget=None, raise_on_n_plus_one=False):
+        if budget is not None and self.count > budget:
+            raise QueryBudgetExceeded(f"{self.count} consultas, presupuesto {budget}\n{self.summary()}")
+        if raise_on_n_plus_one and self.n_plus_one():
+            raise NPlusOneDetected(self.summary())
+
+
+@contextmanager
+def query_watch(budget=None, threshold=DEFAULT_THRESHOLD, raise_on_n_plus_one=False, using=None):
+    """
+    Registra las consultas del bloque en todas las bases de datos (o solo en `using`).
+
+    Al salir falla con QueryBudgetExceeded si se supera `budget` y, con
+    raise_on_n_plus_one, con NPlusOneDetected si hay algún N+1.
+    """
+    aliases = [using] if using else list(connections)
+    reports = [QueryReport(threshold, alias) for alias in aliases]
+    report = QueryReport(threshold, using or "*")
+    with ExitStack() as stack:
+        for alias, alias_report in zip(aliases, reports):
+            stack.enter_context(connections[alias].execute_wrapper(alias_report))
+        yield report
+        # Se reúnen al final: las sentencias de cada alias ya están en orden.
+        for alias_report in reports:
+            report.statements.extend(alias_report.statements)
+    report.check(budget, raise_on_n_plus_one)
+
+
+class QueryWatchMiddleware:
+    """
+    Registra las consultas de cada petición. Se configura con el diccionario QUERY_WATCH:
+
+        ENABLED    activa el middleware (si no, Django lo descarta al arrancar)
+        THRESHOLD  repeticiones desde la misma línea a partir de las cuales hay N+1
+        BUDGET     número máximo de consultas por petición (None = sin límite)
+        RAISE      falla la petición en lugar de solo registrar un aviso (tests)
+
+    Añade las cabeceras X-Query-Count y X-Query-Time a la respuesta.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = getattr(settings, "QUERY_WATCH", {})
+        if not options.get("ENABLED"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = options.get("THRESHOLD", DEFAULT_THRESHOLD)
+        self.budget = options.get("BUDGET")
+        self.raise_errors = options.get("RAISE", False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with query_watch(threshold=self.threshold) as report:
+            response = self.get_response(request)
+        return self.finish(request, response, report)
+
+    async def __acall__(self, request):
+        # Las conexiones son locales a cada hilo: el wrapper se instala en el hilo donde
+        # sync_to_async ejecuta las consultas del ORM asíncrono de esta petición.
+        watch = query_watch(threshold=self.threshold)
+        report = await sync_to_async(watch.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(watch.__exit__)(None, None, None)
+        return self.finish(request, response, report)
+
+    def finish(self, request, response, report):
+        response["X-Query-Count"] = str(report.count)
+        response["X-Query-Time"] = f"{report.duration * 1000:.1f}ms"
+        over_budget = self.budget is not None and report.count > self.budget
+        if over_budget or report.n_plus_one():
+            if self.raise_errors:
+                report.check(self.budget, raise_on_n_plus_one=True)
+            logger.warning("%s %s: %s", request.method, request.path, report.summary())
+        return response
@@ -0,0 +1,164 @@
+"""
+Agregados por hora y por día de RecipeEvent.
+
+aggregate_events() suma a RecipeHourlyRollup y RecipeDailyRollup solo los eventos
+posteriores a la marca de agua (el id del último evento agregado), en lotes y cada lote
+en una transacción junto con la nueva marca. Lo ejecuta el comando rollup_events.
+
+window_totals() y trending() responden con las tablas agregadas: los días completos de
+la ventana salen de la tabla diaria y las horas sueltas de los extremos de la horaria, así
+que el coste depende del número de buckets y no del número de eventos.
+"""
+import datetime
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from recetario_app.models import RecipeDailyRollup, RecipeEvent, RecipeHourlyRollup, RollupWatermark
+
+WATERMARK = "recipe_events"
+DEFAULT_BATCH_SIZE = 10_000
+UTC = datetime.timezone.utc
+
+
+def aggregate_events(batch_size=DEFAULT_BATCH_SIZE, lag=None):
+    """
+    Agrega los eventos nuevos y devuelve cuántos se han procesado.
+
+    Con `lag` (timedelta) se dejan para la siguiente ejecución los eventos más recientes
+    que ese margen. En PostgreSQL los ids se asignan antes del COMMIT, así que una
+    transacción lenta puede confirmar un id menor que la marca ya avanzada; el margen debe
+    superar la duración de las transacciones que insertan eventos.
+    """
+    total = 0
+    while processed := aggregate_batch(batch_size, lag):
+        total += processed
+    return total
+
+
+def aggregate_batch(batch_size, lag=None):
+    with transaction.atomic(using=router.db_for_write(RollupWatermark)):
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        events = RecipeEvent.objects.filter(pk__gt=watermark.last_event_id)
+        if lag is not None:
+            recent = events.filter(created_at__gt=timezone.now() - lag).order_by("pk").values_list("pk", flat=True)
+            first_recent = recent.first()
+            if first_recent is not None:
+                events = events.filter(pk__lt=first_recent)
+        ids = list(events.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return 0
+        batch = RecipeEvent.objects.filter(pk__gt=watermark.last_event_id, pk__lte=ids[-1])
+        add_to_rollup(RecipeHourlyRollup, bucket_totals(batch, TruncHour("created_at", tzinfo=UTC)))
+        add_to_rollup(RecipeDailyRollup, bucket_totals(batch, TruncDate("created_at", tzinfo=UTC)))
+        watermark.last_event_id = ids[-1]
+        watermark.save(update_fields=["last_event_id"])
+    return len(ids)
+
+
+def bucket_totals(events, bucket):
+    return (
+        events.annotate(bucket=bucket)
+        .values("recipe", "bucket")
+        .annotate(
+            orders=Sum("quantity", filter=Q(kind=RecipeEvent.ORDER), default=0),
+            reviews=Sum("quantity", filter=Q(kind=RecipeEvent.REVIEW), default=0),
+        )
+        .order_by()
+    )
+
+
+def add_to_rollup(model, rows):
+    """Suma las filas {recipe, bucket, orders, reviews} a los buckets existentes o los crea"""
+    rows = list(rows)
+    if not rows:
+        return
+    existing = {
+        (rollup.recipe_id, rollup.bucket): rollup
+        for rollup in model.objects.filter(
+            recipe__in={row["recipe"] for row in rows}, bucket__in={row["bucket"] for row in rows}
+        )
+    }
+    rollups = []
+    for row in rows:
+        rollup = existing.get((row["recipe"], row["bucket"])) or model(recipe_id=row["recipe"], bucket=row["bucket"])
+        rollup.orders += row["orders"]
+        rollup.reviews += row["reviews"]
+        rollups.append(rollup)
+    model.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["recipe", "bucket"],
+        update_fields=["orders", "reviews"],
+        batch_size=1000,
+    )
+
+
+def window_buckets(since, until):
+    """
+    Reparte [since, until) en filtros sobre la tabla horaria y la diaria.
+
+    `since` se redondea a su hora; el bucket horario en curso cuenta aunque la hora no
+    haya terminado.
+    """
+    since = since.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+    until = until.astimezone(UTC)
+    first_day = since.replace(hour=0)
+    if first_day < since:
+        first_day += datetime.timedelta(days=1)
+    last_day = until.replace(hour=0, minute=0, second=0, microsecond=0)
+    if first_day >= last_day:
+        return Q(bucket__gte=since, bucket__lt=until), None
+    hourly = Q(bucket__gte=since, bucket__lt=first_day) | Q(bucket__gte=last_day, bucket__lt=until)
+    daily = Q(bucket__gte=first_day.date(), bucket__lt=last_day.date())
+    return hourly, daily
+
+
+def window_rollups(since, until=None, recipe_id=None):
+    until = until or timezone.now()
+    hourly, daily = window_buckets(since, until)
+    querysets = [RecipeHourlyRollup.objects.filter(hourly)]
+    if daily is not None:
+        querysets.append(RecipeDailyRollup.objects.filter(daily))
+    if recipe_id is not None:
+        querysets = [queryset.filter(recipe_id=recipe_id) for queryset in querysets]
+    return querysets
+
+
+def window_totals(since, until=None, recipe_id=None):
+    """{"orders": ..., "reviews": ...} entre since y until (por defecto, ahora)"""
+    totals = Counter(orders=0, reviews=0)
+    for queryset in window_rollups(since, until, recipe_id):
+        totals.update(queryset.aggregate(orders=Sum("orders", default=0), reviews=Sum("reviews", default=0)))
+    return dict(totals)
+
+
+def trending(limit=10, since=None, until=None, by="orders"):
+    """
+    Las `limit` recetas con más pedidos (by="orders") o reseñas (by="reviews") en la
+    ventana, por defecto los últimos 7 días: [(recipe_id, total), ...]
+
+    Los totales por receta de la tabla horaria y de la diaria se unen con UNION ALL y se
+    suman, ordenan y recortan en la misma consulta.
+    """
+    if by not in ("orders", "reviews"):
+        raise ValueError("by debe ser 'orders' o 'reviews'")
+    until = until or timezone.now()
+    since = since or until - datetime.timedelta(days=7)
+    first, *others = [
+        queryset.values(recipe_ref=F("recipe")).annotate(total=Sum(by)).values_list("recipe_ref", "total").order_by()
+        for queryset in window_rollups(since, until)
+    ]
+    buckets = first.union(*others, all=True) if others else first
+    sql, params = buckets.query.sql_with_params()
+    connection = connections[buckets.db]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT recipe_ref, SUM(total) AS total FROM ({sql}) AS buckets "
+            f"GROUP BY recipe_ref ORDER BY total DESC, recipe_ref LIMIT %s",
+            (*params, limit),
+        )
+        return cursor.fetchall()
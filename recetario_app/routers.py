@@ -0,0 +1,105 @@
+"""
+Reparto de lecturas entre réplicas y escrituras en la base de datos principal.
+
+PrimaryReplicaRouter manda las lecturas de recetario_app a una réplica elegida al azar
+según DATABASE_REPLICA_WEIGHTS y todas las escrituras (save, delete, update(),
+bulk_create, select_for_update...) a `default`. En cuanto una petición escribe en
+recetario_app, el resto de sus lecturas van también a `default`, para que lea lo que acaba de escribir aunque
+las réplicas vayan con retraso. PrimaryPinMiddleware delimita esa "petición"; fuera de una
+petición (comandos, scripts) el contexto dura lo que dure el hilo.
+
+Sin réplicas configuradas todo va a `default`. Para leer de la principal a propósito:
+
+    with use_primary():
+        ...
+
+Los comandos que trabajan sobre la base de datos de test (benchmark_queries,
+check_query_plans...) deben ejecutarse sin DATABASE_REPLICA_URLS.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+ROUTED_APPS = {"recetario_app"}
+
+_pinned = ContextVar("recetario_pinned_to_primary", default=False)
+
+
+def pin_to_primary():
+    _pinned.set(True)
+
+
+def pinned_to_primary():
+    return _pinned.get()
+
+
+@contextmanager
+def use_primary():
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def __init__(self):
+        weights = getattr(settings, "DATABASE_REPLICA_WEIGHTS", {})
+        self.replicas = list(weights)
+        self.weights = [weights[alias] for alias in self.replicas]
+        self.databases = {DEFAULT_DB_ALIAS, *self.replicas}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS or not self.replicas or pinned_to_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choices(self.replicas, self.weights)[0]
+
+    def db_for_write(self, model, **hints):
+        # Solo fijan las escrituras de las apps cuyas lecturas van a las réplicas: guardar
+        # la sesión o el último acceso de un usuario no cambia de dónde se lee el catálogo.
+        if model._meta.app_label in ROUTED_APPS:
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas son copias de la principal: un objeto leído de una réplica puede
+        # relacionarse con otro de la principal.
+        if obj1._state.db in self.databases and obj2._state.db in self.databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación (o con sync_sqlite_replicas).
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Cada petición empieza leyendo de las réplicas, independientemente de las anteriores"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+    async def __acall__(self, request):
+        token = _pinned.set(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,59 @@
+"""
+Conversión de modelos a diccionarios para las respuestas JSON.
+
+Estas funciones no hacen consultas: esperan que las relaciones vengan ya cargadas con
+recipe_queryset() (select_related + prefetch_related), de modo que serializar una página
+cuesta lo mismo sea cual sea su tamaño.
+"""
+from django.db.models import Prefetch
+
+from recetario_app.models import Recipe, RecipeStats, Restaurant, RestaurantConfig
+
+
+def recipe_queryset(queryset=None):
+    """Recetas con chef, estadísticas, restaurantes y sus configuraciones: 2 consultas"""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return queryset.select_related("chef", "recipestats").prefetch_related(
+        Prefetch("restaurants", queryset=Restaurant.objects.select_related("restaurantconfig").order_by("pk"))
+    )
+
+
+def chef_data(chef):
+    return {"id": chef.pk, "name": chef.name, "specialty": chef.specialty, "recipe_count": chef.recipe_count}
+
+
+def config_data(restaurant):
+    try:
+        return restaurant.restaurantconfig.settings
+    except RestaurantConfig.DoesNotExist:
+        return None
+
+
+def restaurant_data(restaurant):
+    return {
+        "id": restaurant.pk,
+        "name": restaurant.name,
+        "location": restaurant.location,
+        "recipe_count": restaurant.recipe_count,
+        "settings": config_data(restaurant),
+    }
+
+
+def stats_data(recipe):
+    try:
+        stats = recipe.recipestats
+    except RecipeStats.DoesNotExist:
+        return None
+    return {"total_orders": stats.total_orders, "positive_reviews": stats.positive_reviews}
+
+
+def recipe_data(recipe):
+    return {
+        "id": recipe.pk,
+        "title": recipe.title,
+        "preparation_time": recipe.preparation_time,
+        "chef": chef_data(recipe.chef),
+        "stats": stats_data(recipe),
+        "restaurants": [restaurant_data(restaurant) for restaurant in recipe.restaurants.all()],
+    }
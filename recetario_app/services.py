@@ -0,0 +1,233 @@
+"""
+Operaciones de mantenimiento sobre el catálogo que trabajan por conjuntos (una sentencia
+para muchas filas) en lugar de fila a fila.
+"""
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from recetario_app.config_settings import config_restrictions, config_services
+from recetario_app.models import Chef, ChefRestaurant, Recipe, Restaurant, RestaurantRestriction, RestaurantService
+
+MenuLink = Recipe.restaurants.through
+
+# Lo emite sync_menus una vez por llamada, con sender=Restaurant y `added` y `removed`:
+# listas de (restaurant_id, recipe_id) de los enlaces creados y borrados.
+menus_synced = Signal()
+
+
+def counted_recipes():
+    """Subconsultas con el número real de recetas por chef y por restaurante"""
+    per_chef = Recipe.objects.filter(chef=OuterRef("pk")).values("chef").annotate(n=Count("pk")).values("n")
+    per_restaurant = (
+        MenuLink.objects.filter(restaurant=OuterRef("pk")).values("restaurant").annotate(n=Count("pk")).values("n")
+    )
+    return Coalesce(Subquery(per_chef), 0), Coalesce(Subquery(per_restaurant), 0)
+
+
+def recipe_count_mismatches():
+    """Chefs y restaurantes cuyo recipe_count no coincide con las filas reales"""
+    per_chef, per_restaurant = counted_recipes()
+    chefs = Chef.objects.alias(actual=per_chef).exclude(recipe_count=F("actual"))
+    restaurants = Restaurant.objects.alias(actual=per_restaurant).exclude(recipe_count=F("actual"))
+    return chefs, restaurants
+
+
+@transaction.atomic
+def rebuild_recipe_counts():
+    """Recalcula recipe_count de chefs y restaurantes con dos UPDATE; devuelve las filas corregidas"""
+    per_chef, per_restaurant = counted_recipes()
+    chefs = Chef.objects.exclude(recipe_count=per_chef).update(recipe_count=per_chef)
+    restaurants = Restaurant.objects.exclude(recipe_count=per_restaurant).update(recipe_count=per_restaurant)
+    return chefs, restaurants
+
+
+@transaction.atomic
+def apply_chef_restaurant_deltas(deltas):
+    """
+    Suma {(chef_id, restaurant_id): recetas} a ChefRestaurant: crea las filas que faltan y
+    borra las que se quedan sin recetas. Los incrementos van en un INSERT ... ON CONFLICT DO
+    UPDATE y los decrementos en un UPDATE, ambos con executemany, más un DELETE: el número de
+    consultas no depende del número de pares y dos escrituras concurrentes no se pisan.
+    """
+    deltas = {pair: delta for pair, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    db = router.db_for_write(ChefRestaurant)
+    connection = connections[db]
+    table = connection.ops.quote_name(ChefRestaurant._meta.db_table)
+    added = [(pair, delta) for pair, delta in deltas.items() if delta > 0]
+    removed = [(pair, delta) for pair, delta in deltas.items() if delta < 0]
+    with connection.cursor() as cursor:
+        if added:
+            locations = dict(
+                Restaurant.objects.using(db)
+                .filter(pk__in={restaurant for (_, restaurant), _ in added})
+                .values_list("pk", "location")
+            )
+            cursor.executemany(
+                f"INSERT INTO {table} (chef_id, restaurant_id, location, recipes) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (restaurant_id, chef_id) DO UPDATE SET recipes = {table}.recipes + excluded.recipes",
+                [(chef, restaurant, locations[restaurant], delta) for (chef, restaurant), delta in added],
+            )
+        if removed:
+            cursor.executemany(
+                f"UPDATE {table} SET recipes = recipes + %s WHERE chef_id = %s AND restaurant_id = %s",
+                [(delta, chef, restaurant) for (chef, restaurant), delta in removed],
+            )
+    if removed:
+        ChefRestaurant.objects.using(db).filter(
+            chef_id__in={chef for (chef, _), _ in removed},
+            restaurant_id__in={restaurant for (_, restaurant), _ in removed},
+            recipes=0,
+        ).delete()
+
+
+def chef_restaurant_sql(connection):
+    """
+    (SELECT de las filas que debería tener ChefRestaurant según los menús, condición de las
+    filas de ChefRestaurant que no tienen ningún enlace de menú)
+    """
+    quote = connection.ops.quote_name
+    table = quote(ChefRestaurant._meta.db_table)
+    links = quote(MenuLink._meta.db_table)
+    recipes = quote(Recipe._meta.db_table)
+    restaurants = quote(Restaurant._meta.db_table)
+    expected = (
+        f"SELECT recipe.chef_id AS chef_id, link.restaurant_id AS restaurant_id, restaurant.location AS location, "
+        f"COUNT(*) AS recipes FROM {links} link "
+        f"JOIN {recipes} recipe ON recipe.id = link.recipe_id "
+        f"JOIN {restaurants} restaurant ON restaurant.id = link.restaurant_id "
+        f"GROUP BY recipe.chef_id, link.restaurant_id, restaurant.location"
+    )
+    unlinked = (
+        f"NOT EXISTS (SELECT 1 FROM {links} link JOIN {recipes} recipe ON recipe.id = link.recipe_id "
+        f"WHERE recipe.chef_id = {table}.chef_id AND link.restaurant_id = {table}.restaurant_id)"
+    )
+    return expected, unlinked
+
+
+def chef_restaurant_mismatches():
+    """
+    Compara ChefRestaurant con los menús en una sola consulta. Devuelve (filas que sobran,
+    filas que faltan o no coinciden).
+    """
+    connection = connections[router.db_for_read(ChefRestaurant)]
+    table = connection.ops.quote_name(ChefRestaurant._meta.db_table)
+    expected, unlinked = chef_restaurant_sql(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT (SELECT COUNT(*) FROM {table} WHERE {unlinked}), "
+            f"(SELECT COUNT(*) FROM ({expected}) expected LEFT JOIN {table} ON {table}.chef_id = expected.chef_id "
+            f"AND {table}.restaurant_id = expected.restaurant_id AND {table}.location = expected.location "
+            f"AND {table}.recipes = expected.recipes WHERE {table}.id IS NULL)"
+        )
+        return cursor.fetchone()
+
+
+def rebuild_chef_restaurants():
+    """
+    Corrige ChefRestaurant a partir de los menús con dos sentencias: un DELETE de los pares
+    sin enlaces de menú y un INSERT ... SELECT ... ON CONFLICT DO UPDATE de los que faltan o
+    no coinciden. Devuelve las filas borradas y las escritas.
+    """
+    db = router.db_for_write(ChefRestaurant)
+    connection = connections[db]
+    table = connection.ops.quote_name(ChefRestaurant._meta.db_table)
+    expected, unlinked = chef_restaurant_sql(connection)
+    with transaction.atomic(using=db), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {unlinked}")
+        deleted = cursor.rowcount
+        # "WHERE true": sin él SQLite tomaría el ON CONFLICT por la condición de un JOIN.
+        cursor.execute(
+            f"INSERT INTO {table} (chef_id, restaurant_id, location, recipes) "
+            f"SELECT chef_id, restaurant_id, location, recipes FROM ({expected}) expected WHERE true "
+            f"ON CONFLICT (restaurant_id, chef_id) "
+            f"DO UPDATE SET location = excluded.location, recipes = excluded.recipes "
+            f"WHERE {table}.location <> excluded.location OR {table}.recipes <> excluded.recipes"
+        )
+        written = cursor.rowcount
+    return deleted, written
+
+
+@transaction.atomic
+def sync_menus(menus, prune=True, batch_size=5000):
+    """
+    Deja el menú de cada restaurante de `menus` ({restaurant_id: [recipe_ids]}) con esas
+    recetas; con prune=False solo añade las que faltan. Los restaurantes que no aparecen no
+    se tocan.
+
+    Lee los enlaces actuales de esos restaurantes, inserta y borra solo la diferencia en
+    lotes y mantiene Restaurant.recipe_count y ChefRestaurant sin pasar por m2m_changed,
+    todo en una transacción. Emite menus_synced una vez. Devuelve (enlaces creados,
+    enlaces borrados).
+    """
+    # El diff se lee de la principal: en una réplica con retraso saldría mal.
+    db = router.db_for_write(MenuLink)
+    desired = {(restaurant, recipe) for restaurant, recipes in menus.items() for recipe in recipes}
+    restaurant_ids = list(menus)
+    current = {}
+    for start in range(0, len(restaurant_ids), batch_size):
+        links = MenuLink.objects.using(db).filter(restaurant_id__in=restaurant_ids[start : start + batch_size])
+        for pk, restaurant, recipe in links.values_list("pk", "restaurant", "recipe"):
+            current[restaurant, recipe] = pk
+    added = sorted(desired - current.keys())
+    removed = sorted(current.keys() - desired) if prune else []
+    if not added and not removed:
+        return 0, 0
+
+    recipe_ids = sorted({recipe for _, recipe in added + removed})
+    chefs = {}
+    for start in range(0, len(recipe_ids), batch_size):
+        recipes = Recipe.objects.using(db).filter(pk__in=recipe_ids[start : start + batch_size])
+        chefs.update(recipes.values_list("pk", "chef"))
+    missing = [recipe for recipe in recipe_ids if recipe not in chefs]
+    if missing:
+        raise ValueError(f"No existen las recetas {missing[:10]}")
+
+    # Con 100k enlaces instanciar modelos cuesta más que escribirlos: executemany directo.
+    connection = connections[db]
+    links_table = connection.ops.quote_name(MenuLink._meta.db_table)
+    restaurants_table = connection.ops.quote_name(Restaurant._meta.db_table)
+    removed_ids = [current[pair] for pair in removed]
+    for start in range(0, len(removed_ids), batch_size):
+        MenuLink.objects.using(db).filter(pk__in=removed_ids[start : start + batch_size]).delete()
+
+    per_restaurant, per_chef = Counter(), Counter()
+    for delta, pairs in ((1, added), (-1, removed)):
+        for restaurant, recipe in pairs:
+            per_restaurant[restaurant] += delta
+            per_chef[chefs[recipe], restaurant] += delta
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {links_table} (restaurant_id, recipe_id) VALUES (%s, %s)", added)
+        cursor.executemany(
+            f"UPDATE {restaurants_table} SET recipe_count = recipe_count + %s WHERE id = %s",
+            [(delta, restaurant) for restaurant, delta in per_restaurant.items() if delta],
+        )
+    apply_chef_restaurant_deltas(per_chef)
+
+    menus_synced.send(sender=Restaurant, added=added, removed=removed)
+    return len(added), len(removed)
+
+
+def sync_config_tables(configs):
+    """
+    Reescribe las filas de RestaurantService y RestaurantRestriction de las configuraciones
+    dadas a partir de su settings. Hace cuatro consultas sea cual sea el número de configs.
+    """
+    ids = [config.pk for config in configs]
+    RestaurantService.objects.filter(config_id__in=ids).delete()
+    RestaurantRestriction.objects.filter(config_id__in=ids).delete()
+    RestaurantService.objects.bulk_create(
+        RestaurantService(config_id=config.pk, name=name)
+        for config in configs
+        for name in config_services(config.settings)
+    )
+    RestaurantRestriction.objects.bulk_create(
+        RestaurantRestriction(config_id=config.pk, dish=dish, restricted=restricted)
+        for config in configs
+        for dish, restricted in config_restrictions(config.settings).items()
+    )
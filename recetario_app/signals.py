@@ -0,0 +1,156 @@
+"""
+Receptores que mantienen los datos desnormalizados del catálogo.
+
+Las operaciones masivas (bulk_create, QuerySet.update, SQL directo) no emiten señales;
+quien las use tiene que llamar después a services.rebuild_recipe_counts() y
+services.rebuild_chef_restaurants() y, para RestaurantConfig, a refresh_derived_fields(),
+services.sync_config_tables() y config_cache.invalidate_many(). Todas pasan inadvertidas a snapshot.catalog_snapshot hasta
+que se reconstruye (CATALOG_SNAPSHOT["MAX_AGE"]).
+"""
+from django.db.models import Count, F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from recetario_app.config_cache import config_cache
+from recetario_app.models import Chef, ChefRestaurant, Recipe, RecipeStats, Restaurant, RestaurantConfig
+from recetario_app.services import apply_chef_restaurant_deltas, menus_synced, sync_config_tables
+from recetario_app.snapshot import catalog_snapshot
+
+MenuLink = Recipe.restaurants.through
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_chef(sender, instance, raw, update_fields=None, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and "chef" not in update_fields and "chef_id" not in update_fields:
+        return
+    instance._previous_chef_id = sender.objects.filter(pk=instance.pk).values_list("chef_id", flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_chef_recipes(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        Chef.objects.filter(pk=instance.chef_id).update(recipe_count=F("recipe_count") + 1)
+        return
+    previous = instance.__dict__.pop("_previous_chef_id", None)
+    if previous is not None and previous != instance.chef_id:
+        Chef.objects.filter(pk=previous).update(recipe_count=F("recipe_count") - 1)
+        Chef.objects.filter(pk=instance.chef_id).update(recipe_count=F("recipe_count") + 1)
+        deltas = {}
+        for restaurant in MenuLink.objects.filter(recipe=instance).values_list("restaurant_id", flat=True):
+            deltas[previous, restaurant] = -1
+            deltas[instance.chef_id, restaurant] = 1
+        apply_chef_restaurant_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_recipe_menus(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed.
+    restaurants = list(MenuLink.objects.filter(recipe=instance).values_list("restaurant_id", flat=True))
+    if restaurants:
+        Restaurant.objects.filter(pk__in=restaurants).update(recipe_count=F("recipe_count") - 1)
+        apply_chef_restaurant_deltas({(instance.chef_id, restaurant): -1 for restaurant in restaurants})
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_chef_recipe(sender, instance, **kwargs):
+    Chef.objects.filter(pk=instance.chef_id).update(recipe_count=F("recipe_count") - 1)
+
+
+@receiver(m2m_changed, sender=MenuLink)
+def count_restaurant_recipes(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Mantiene Restaurant.recipe_count y ChefRestaurant desde ambos lados de la relación.
+
+    En post_add pk_set solo contiene los enlaces que se han creado de verdad, pero en
+    remove trae todos los pedidos aunque no existan, y clear no trae ninguno: en esos
+    casos se leen los enlaces existentes en pre_* para descontar solo lo que se borra.
+    """
+    own, other = ("restaurant", "recipe") if reverse else ("recipe", "restaurant")
+    if action in ("pre_remove", "pre_clear"):
+        links = sender.objects.filter(**{own: instance})
+        if action == "pre_remove":
+            links = links.filter(**{f"{other}__in": pk_set})
+        instance._removed_menu_links = set(links.values_list(f"{other}_id", flat=True))
+        return
+    if action == "post_add":
+        changed = pk_set
+        delta = 1
+    elif action in ("post_remove", "post_clear"):
+        changed = instance.__dict__.pop("_removed_menu_links", set())
+        delta = -1
+    else:
+        return
+    if not changed:
+        return
+    if reverse:
+        Restaurant.objects.filter(pk=instance.pk).update(recipe_count=F("recipe_count") + delta * len(changed))
+        per_chef = Recipe.objects.filter(pk__in=changed).values_list("chef").annotate(n=Count("pk")).order_by()
+        apply_chef_restaurant_deltas({(chef, instance.pk): delta * n for chef, n in per_chef})
+    else:
+        Restaurant.objects.filter(pk__in=changed).update(recipe_count=F("recipe_count") + delta)
+        apply_chef_restaurant_deltas({(instance.chef_id, restaurant): delta for restaurant in changed})
+
+
+@receiver(post_save, sender=Restaurant)
+def copy_restaurant_location(sender, instance, created, raw, update_fields=None, **kwargs):
+    if raw or created or (update_fields is not None and "location" not in update_fields):
+        return
+    ChefRestaurant.objects.filter(restaurant=instance).exclude(location=instance.location).update(
+        location=instance.location
+    )
+
+
+@receiver(post_save, sender=RestaurantConfig)
+def sync_restaurant_config_tables(sender, instance, **kwargs):
+    sync_config_tables([instance])
+
+
+@receiver(post_save, sender=RestaurantConfig)
+@receiver(post_delete, sender=RestaurantConfig)
+def invalidate_restaurant_config(sender, instance, using, **kwargs):
+    config_cache.invalidate(instance.restaurant_id, using=using)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def mark_snapshot_recipe(sender, instance, using, **kwargs):
+    catalog_snapshot.mark_recipes([instance.pk], using=using)
+
+
+@receiver(post_save, sender=RecipeStats)
+@receiver(post_delete, sender=RecipeStats)
+def mark_snapshot_stats(sender, instance, using, **kwargs):
+    catalog_snapshot.mark_recipes([instance.recipe_id], using=using)
+
+
+@receiver(m2m_changed, sender=MenuLink)
+def mark_snapshot_menus(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if not catalog_snapshot.loaded:
+        return
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        catalog_snapshot.mark_recipes([instance.pk], using=using)
+    elif reverse and action in ("post_add", "post_remove"):
+        catalog_snapshot.mark_recipes(pk_set, using=using)
+    elif reverse and action == "pre_clear":
+        recipes = sender.objects.using(using).filter(restaurant=instance).values_list("recipe_id", flat=True)
+        catalog_snapshot.mark_recipes(recipes, using=using)
+
+
+@receiver(menus_synced)
+def mark_snapshot_synced_menus(sender, added, removed, **kwargs):
+    catalog_snapshot.mark_recipes({recipe for _, recipe in added} | {recipe for _, recipe in removed})
+
+
+@receiver(post_save, sender=Chef)
+@receiver(post_delete, sender=Chef)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantConfig)
+@receiver(post_delete, sender=RestaurantConfig)
+def mark_snapshot_dimensions(sender, using, **kwargs):
+    # Los servicios (RestaurantService) se copian de RestaurantConfig en su post_save.
+    catalog_snapshot.mark_dimensions(using=using)
@@ -0,0 +1,446 @@
+"""
+Copia del catálogo en memoria, por columnas, para filtrar recetas sin ir a la base de datos.
+
+    catalog_snapshot.recipe_ids(min_time=30, max_time=90, specialty="Cocina española",
+                                location="Madrid", services=["delivery"])
+    -> [ids de receta en orden]
+
+Cada receta es una posición en arrays compactos (array de la biblioteca estándar, leídos
+como arrays de NumPy si está instalado): id, tiempo de preparación, chef, pedidos y reseñas
+positivas, y si la receta tiene fila de RecipeStats (min_orders, como el JOIN de
+filter_queryset, descarta las que no la tienen). Las especialidades, ciudades y servicios se guardan como enteros con un
+diccionario por columna, y el menú de cada receta en formato CSR: los restaurantes de la
+receta en la posición i son menu_restaurants[menu_start[i]:menu_start[i + 1]].
+
+Los filtros se evalúan como máscaras: primero sobre chefs y restaurantes (indexados por
+id, pocas filas) y después sobre las recetas. Con NumPy son operaciones vectorizadas; sin
+NumPy se hace el mismo cálculo con bucles de Python, bastante más lento.
+
+Las señales de signals.py marcan las recetas que cambian; antes de la siguiente consulta
+se releen de la base de datos y se guardan aparte (overlay), tapando su posición en los
+arrays. Con más de MAX_OVERLAY recetas releídas, o pasados MAX_AGE segundos, se reconstruye
+entera (CATALOG_SNAPSHOT en settings.py). Lo que no emite señales (bulk_create, update(),
+el búfer de contadores, fast_delete con skip_signals) y las escrituras de otros procesos
+solo se ven tras la reconstrucción. La reconstrucción se hace fuera del bloqueo del estado:
+las señales no esperan a que termine.
+
+filter_queryset() es la consulta del ORM equivalente a cada combinación de filtros.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from dataclasses import dataclass, replace
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Exists, OuterRef
+
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, RestaurantService
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULTS = {"MAX_AGE": 300, "MAX_OVERLAY": 10_000}
+MISSING = -1  # código de un chef o restaurante que ya no existe
+BATCH_SIZE = 10_000
+
+MenuLink = Recipe.restaurants.through
+RecipeRow = namedtuple("RecipeRow", "preparation_time chef has_stats total_orders positive_reviews restaurants")
+
+
+class Dictionary:
+    """Textos codificados como enteros 0, 1, 2... en orden de aparición"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+@dataclass
+class Dimensions:
+    """Chefs y restaurantes; cada array se indexa directamente por id"""
+
+    specialties: Dictionary
+    locations: Dictionary
+    services: Dictionary
+    chef_specialty: array
+    restaurant_location: array
+    restaurant_services: dict  # código de servicio -> bytearray con 1 en los restaurantes que lo ofrecen
+
+
+@dataclass
+class Recipes:
+    ids: array
+    preparation_time: array
+    chef: array
+    has_stats: bytearray
+    total_orders: array
+    positive_reviews: array
+    menu_start: array
+    menu_restaurants: array
+    max_chef: int
+    max_restaurant: int
+
+
+@dataclass
+class State:
+    recipes: Recipes
+    dimensions: Dimensions
+    deleted: bytearray  # 1 en las posiciones tapadas por el overlay
+    overlay: dict  # id -> RecipeRow, o None si la receta se ha borrado
+    built_at: float
+
+
+def load_recipes(using):
+    """Recetas, estadísticas y menús, recorridos en orden de id y unidos por mezcla"""
+    ids, times, chefs = array("q"), array("i"), array("q")
+    rows = Recipe.objects.using(using).order_by("pk").values_list("pk", "preparation_time", "chef")
+    for pk, preparation_time, chef in rows.iterator(chunk_size=BATCH_SIZE):
+        ids.append(pk)
+        times.append(preparation_time)
+        chefs.append(chef)
+    size = len(ids)
+
+    has_stats = bytearray(size)
+    orders, reviews = array("q", bytes(8 * size)), array("q", bytes(8 * size))
+    row = 0
+    stats = RecipeStats.objects.using(using).order_by("recipe")
+    stats = stats.values_list("recipe", "total_orders", "positive_reviews")
+    for recipe, total, positive in stats.iterator(chunk_size=BATCH_SIZE):
+        while row < size and ids[row] < recipe:
+            row += 1
+        if row < size and ids[row] == recipe:
+            has_stats[row] = 1
+            orders[row], reviews[row] = total, positive
+
+    menu_start, menu = array("q", [0]), array("q")
+    row = 0
+    links = MenuLink.objects.using(using).order_by("recipe", "restaurant").values_list("recipe", "restaurant")
+    for recipe, restaurant in links.iterator(chunk_size=BATCH_SIZE):
+        while row < size and ids[row] < recipe:
+            menu_start.append(len(menu))
+            row += 1
+        if row < size and ids[row] == recipe:
+            menu.append(restaurant)
+    while len(menu_start) <= size:
+        menu_start.append(len(menu))
+
+    return Recipes(
+        ids, times, chefs, has_stats, orders, reviews, menu_start, menu,
+        max_chef=max(chefs, default=0), max_restaurant=max(menu, default=0),
+    )
+
+
+def load_dimensions(using, min_chefs=0, min_restaurants=0):
+    """`min_*`: tamaño mínimo de los arrays, para que cualquier id de las recetas sea una posición válida"""
+    specialties, locations, services = Dictionary(), Dictionary(), Dictionary()
+    chefs = list(Chef.objects.using(using).values_list("pk", "specialty"))
+    chef_specialty = array("i", [MISSING]) * (max([min_chefs, *(pk for pk, _ in chefs)]) + 1)
+    for pk, specialty in chefs:
+        chef_specialty[pk] = specialties.encode(specialty)
+
+    restaurants = list(Restaurant.objects.using(using).values_list("pk", "location"))
+    restaurant_location = array("i", [MISSING]) * (max([min_restaurants, *(pk for pk, _ in restaurants)]) + 1)
+    for pk, location in restaurants:
+        restaurant_location[pk] = locations.encode(location)
+
+    restaurant_services = {}
+    for restaurant, name in RestaurantService.objects.using(using).values_list("config__restaurant", "name"):
+        flags = restaurant_services.setdefault(services.encode(name), bytearray(len(restaurant_location)))
+        flags[restaurant] = 1
+    return Dimensions(specialties, locations, services, chef_specialty, restaurant_location, restaurant_services)
+
+
+def load_overlay(using, recipe_ids):
+    """{id: RecipeRow} de las recetas dadas que siguen existiendo"""
+    rows = {
+        pk: [preparation_time, chef, False, 0, 0, []]
+        for pk, preparation_time, chef in Recipe.objects.using(using)
+        .filter(pk__in=recipe_ids)
+        .values_list("pk", "preparation_time", "chef")
+    }
+    stats = RecipeStats.objects.using(using).filter(recipe__in=rows)
+    for recipe, total, positive in stats.values_list("recipe", "total_orders", "positive_reviews"):
+        rows[recipe][2:5] = True, total, positive
+    for recipe, restaurant in MenuLink.objects.using(using).filter(recipe__in=rows).values_list("recipe", "restaurant"):
+        rows[recipe][5].append(restaurant)
+    return {pk: RecipeRow(*row) for pk, row in rows.items()}
+
+
+class Query:
+    """Una combinación de filtros ya traducida a códigos del diccionario"""
+
+    def __init__(self, dimensions, min_time, max_time, specialty, location, services, min_orders):
+        self.min_time, self.max_time, self.min_orders = min_time, max_time, min_orders
+        self.dimensions = dimensions
+        self.empty = False
+        self.specialty = None
+        if specialty is not None:
+            self.specialty = dimensions.specialties.codes.get(specialty)
+            self.empty |= self.specialty is None
+        # 0/1 por id de restaurante, o None si no se filtra por restaurante
+        self.restaurants = None
+        if location is not None or services:
+            self.restaurants = self.match_restaurants(dimensions, location, services)
+            self.empty |= not any(self.restaurants)
+
+    @staticmethod
+    def match_restaurants(dimensions, location, services):
+        size = len(dimensions.restaurant_location)
+        code = dimensions.locations.codes.get(location, MISSING) if location is not None else None
+        flags = [dimensions.restaurant_services.get(dimensions.services.codes.get(name)) for name in services]
+        if any(flag is None for flag in flags) or code == MISSING:
+            return bytearray(size)
+        if np is not None:
+            mask = np.ones(size, dtype=bool)
+            if code is not None:
+                mask &= np.frombuffer(dimensions.restaurant_location, dtype=np.int32) == code
+            for flag in flags:
+                mask &= np.frombuffer(flag, dtype=np.uint8).astype(bool)
+            return bytearray(mask.astype(np.uint8).tobytes())
+        return bytearray(
+            (code is None or dimensions.restaurant_location[pk] == code) and all(flag[pk] for flag in flags)
+            for pk in range(size)
+        )
+
+    def matches(self, preparation_time, chef, has_stats, total_orders, restaurants):
+        """Comprueba una receta del overlay"""
+        if self.min_time is not None and preparation_time < self.min_time:
+            return False
+        if self.max_time is not None and preparation_time > self.max_time:
+            return False
+        if self.min_orders is not None and (not has_stats or total_orders < self.min_orders):
+            return False
+        if self.specialty is not None:
+            specialties = self.dimensions.chef_specialty
+            if chef >= len(specialties) or specialties[chef] != self.specialty:
+                return False
+        if self.restaurants is not None:
+            size = len(self.restaurants)
+            return any(restaurant < size and self.restaurants[restaurant] for restaurant in restaurants)
+        return True
+
+
+def scan_numpy(state, query):
+    recipes = state.recipes
+    mask = np.frombuffer(state.deleted, dtype=bool) == False  # noqa: E712
+    if query.min_time is not None or query.max_time is not None:
+        times = np.frombuffer(recipes.preparation_time, dtype=np.int32)
+        if query.min_time is not None:
+            mask &= times >= query.min_time
+        if query.max_time is not None:
+            mask &= times <= query.max_time
+    if query.min_orders is not None:
+        mask &= np.frombuffer(recipes.has_stats, dtype=bool)
+        mask &= np.frombuffer(recipes.total_orders, dtype=np.int64) >= query.min_orders
+    if query.specialty is not None:
+        specialties = np.frombuffer(state.dimensions.chef_specialty, dtype=np.int32)
+        mask &= specialties[np.frombuffer(recipes.chef, dtype=np.int64)] == query.specialty
+    if query.restaurants is not None:
+        restaurants = np.frombuffer(query.restaurants, dtype=np.uint8)
+        hits = restaurants[np.frombuffer(recipes.menu_restaurants, dtype=np.int64)]
+        # Hay algún restaurante válido entre menu_start[i] y menu_start[i + 1] si la suma
+        # acumulada de aciertos crece en ese tramo.
+        cumulative = np.concatenate(([0], np.cumsum(hits, dtype=np.int64)))
+        start = np.frombuffer(recipes.menu_start, dtype=np.int64)
+        mask &= cumulative[start[1:]] > cumulative[start[:-1]]
+    return np.frombuffer(recipes.ids, dtype=np.int64)[mask].tolist()
+
+
+def scan_python(state, query):
+    """Lo mismo que scan_numpy columna a columna, reduciendo la lista de posiciones candidatas"""
+    recipes = state.recipes
+    rows = [row for row, deleted in enumerate(state.deleted) if not deleted]
+    if query.min_time is not None:
+        times, low = recipes.preparation_time, query.min_time
+        rows = [row for row in rows if times[row] >= low]
+    if query.max_time is not None:
+        times, high = recipes.preparation_time, query.max_time
+        rows = [row for row in rows if times[row] <= high]
+    if query.min_orders is not None:
+        has_stats, orders, low = recipes.has_stats, recipes.total_orders, query.min_orders
+        rows = [row for row in rows if has_stats[row] and orders[row] >= low]
+    if query.specialty is not None:
+        specialties, chefs, code = state.dimensions.chef_specialty, recipes.chef, query.specialty
+        rows = [row for row in rows if specialties[chefs[row]] == code]
+    if query.restaurants is not None:
+        matching, menu, start = query.restaurants.__getitem__, recipes.menu_restaurants, recipes.menu_start
+        rows = [row for row in rows if any(map(matching, menu[start[row] : start[row + 1]]))]
+    ids = recipes.ids
+    return [ids[row] for row in rows]
+
+
+class CatalogSnapshot:
+    def __init__(self, max_age=None, max_overlay=None, using=None):
+        options = {**DEFAULTS, **getattr(settings, "CATALOG_SNAPSHOT", {})}
+        self.max_age = options["MAX_AGE"] if max_age is None else max_age
+        self.max_overlay = options["MAX_OVERLAY"] if max_overlay is None else max_overlay
+        self.using = using
+        self._state = None
+        self._lock = threading.Lock()
+        # Solo un hilo reconstruye a la vez; los demás que la necesitan esperan su resultado.
+        self._build_lock = threading.Lock()
+        self._dirty_recipes = set()
+        self._dirty_dimensions = False
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    def database(self):
+        # La principal: las señales llegan antes de que las réplicas tengan el cambio. Sin
+        # pasar por router.db_for_write, que fijaría el resto de la petición a la principal.
+        return self.using or DEFAULT_DB_ALIAS
+
+    def recipe_ids(self, *, min_time=None, max_time=None, specialty=None, location=None, services=(), min_orders=None):
+        """Ids de las recetas que cumplen todos los filtros, en orden"""
+        state = self.state()
+        query = Query(state.dimensions, min_time, max_time, specialty, location, services, min_orders)
+        if query.empty:
+            return []
+        found = scan_numpy(state, query) if np is not None else scan_python(state, query)
+        extra = [
+            pk
+            for pk, row in state.overlay.items()
+            if row is not None
+            and query.matches(row.preparation_time, row.chef, row.has_stats, row.total_orders, row.restaurants)
+        ]
+        return sorted(found + extra) if extra else found
+
+    def state(self):
+        """El estado actual, tras aplicar los cambios pendientes o reconstruirlo si toca"""
+        with self._lock:
+            if not self._expired():
+                return self._refresh()
+        with self._build_lock:
+            with self._lock:
+                # Otro hilo puede haberlo reconstruido mientras se esperaba.
+                if not self._expired():
+                    return self._refresh()
+                # La reconstrucción ya lee estos cambios; los que se marquen mientras dura
+                # se aplican después sobre el estado nuevo.
+                self._dirty_recipes, self._dirty_dimensions = set(), False
+            state = self.build()
+            with self._lock:
+                self._state = state
+                return self._refresh()
+
+    def _expired(self):
+        state = self._state
+        return (
+            state is None
+            or time.monotonic() - state.built_at > self.max_age
+            or len(state.overlay) + len(self._dirty_recipes) > self.max_overlay
+        )
+
+    def _refresh(self):
+        """Aplica al estado los cambios marcados; se llama con self._lock"""
+        state = self._state
+        dirty, self._dirty_recipes = self._dirty_recipes, set()
+        dimensions, self._dirty_dimensions = self._dirty_dimensions, False
+        if dimensions:
+            state = replace(
+                state,
+                dimensions=load_dimensions(self.database(), state.recipes.max_chef, state.recipes.max_restaurant),
+            )
+        if dirty:
+            state = self.apply(state, dirty)
+        self._state = state
+        return state
+
+    def build(self):
+        using = self.database()
+        # Primero las recetas: los arrays de chefs y restaurantes cubren todos sus ids.
+        recipes = load_recipes(using)
+        dimensions = load_dimensions(using, recipes.max_chef, recipes.max_restaurant)
+        return State(recipes, dimensions, bytearray(len(recipes.ids)), {}, time.monotonic())
+
+    def apply(self, state, recipe_ids):
+        recipe_ids = sorted(recipe_ids)
+        loaded = load_overlay(self.database(), recipe_ids)
+        overlay, deleted = dict(state.overlay), bytearray(state.deleted)
+        ids = state.recipes.ids
+        for pk in recipe_ids:
+            overlay[pk] = loaded.get(pk)
+            row = bisect_left(ids, pk)
+            if row < len(ids) and ids[row] == pk:
+                deleted[row] = 1
+        return replace(state, overlay=overlay, deleted=deleted)
+
+    def mark_recipes(self, recipe_ids, using=None):
+        """Las recetas se releen antes de la próxima consulta (y otra vez tras el COMMIT)"""
+        if not self.loaded:
+            return
+        recipe_ids = list(recipe_ids)
+        self._add_dirty(recipe_ids)
+        transaction.on_commit(partial(self._add_dirty, recipe_ids), using=using)
+
+    def mark_dimensions(self, using=None):
+        """Chefs, restaurantes y servicios se releen antes de la próxima consulta"""
+        if not self.loaded:
+            return
+        self._add_dirty((), dimensions=True)
+        transaction.on_commit(partial(self._add_dirty, (), dimensions=True), using=using)
+
+    def _add_dirty(self, recipe_ids, dimensions=False):
+        with self._lock:
+            self._dirty_recipes.update(recipe_ids)
+            self._dirty_dimensions |= dimensions
+
+    def clear(self):
+        with self._lock:
+            self._state = None
+            self._dirty_recipes = set()
+            self._dirty_dimensions = False
+
+    def nbytes(self):
+        """Memoria ocupada por los arrays (sin contar el overlay ni los diccionarios)"""
+        state = self.state()
+        recipes, dimensions = state.recipes, state.dimensions
+        columns = [
+            recipes.ids, recipes.preparation_time, recipes.chef, recipes.has_stats, recipes.total_orders,
+            recipes.positive_reviews,
+            recipes.menu_start, recipes.menu_restaurants,
+            dimensions.chef_specialty, dimensions.restaurant_location, state.deleted,
+        ]
+        columns += list(dimensions.restaurant_services.values())
+        return sum(len(column) * getattr(column, "itemsize", 1) for column in columns)
+
+
+def filter_queryset(
+    queryset, *, min_time=None, max_time=None, specialty=None, location=None, services=(), min_orders=None
+):
+    """Los mismos filtros que CatalogSnapshot.recipe_ids sobre un QuerySet de Recipe"""
+    if min_time is not None:
+        queryset = queryset.filter(preparation_time__gte=min_time)
+    if max_time is not None:
+        queryset = queryset.filter(preparation_time__lte=max_time)
+    if min_orders is not None:
+        queryset = queryset.filter(recipestats__total_orders__gte=min_orders)
+    if specialty is not None:
+        queryset = queryset.filter(chef__specialty=specialty)
+    if location is not None or services:
+        restaurants = Restaurant.objects.all()
+        if location is not None:
+            restaurants = restaurants.filter(location=location)
+        for name in services:
+            restaurants = restaurants.filter(
+                Exists(RestaurantService.objects.filter(config__restaurant=OuterRef("pk"), name=name))
+            )
+        queryset = queryset.available_in(restaurants=restaurants)
+    return queryset
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -1,3 +1,926 @@
-from django.test import TestCase
+import datetime
+import json
+import statistics
+import threading
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recetario_app import querycache
+from recetario_app.benchmarks import build_dataset
+from recetario_app.config_cache import ConfigCache, config_cache
+from recetario_app.config_settings import parse_opening_hours
+from recetario_app.counters import CounterBuffer
+from recetario_app.deletion import fast_delete
+from recetario_app.export import export_lines
+from recetario_app.fts import fts_available
+from recetario_app.models import (
+    Chef,
+    ChefRestaurant,
+    Recipe,
+    RecipeDailyRollup,
+    RecipeEvent,
+    RecipeHourlyRollup,
+    RecipeStats,
+    Restaurant,
+    RestaurantConfig,
+    RollupWatermark,
+)
+from recetario_app.pagination import encode_cursor
+from recetario_app.querywatch import NPlusOneDetected, QueryBudgetExceeded, query_watch
+from recetario_app.rollups import WATERMARK, aggregate_events, trending, window_totals
+from recetario_app.routers import PrimaryPinMiddleware, PrimaryReplicaRouter, pinned_to_primary
+from recetario_app.services import (
+    chef_restaurant_mismatches,
+    menus_synced,
+    rebuild_chef_restaurants,
+    sync_menus,
+)
+from recetario_app.snapshot import CatalogSnapshot, catalog_snapshot, filter_queryset
+
+
+def median_ms(run, repeat=7):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def add_replica(test):
+    """
+    Alias "replica" con su propia conexión a la base de datos de test. Solo ve lo que se
+    ha confirmado, así que hace falta un TransactionTestCase.
+    """
+    connections.settings["replica"] = {**connections["default"].settings_dict}
+    allow = mock.patch.object(type(test), "databases", {*test.databases, "replica"})
+    allow.start()
+
+    def remove():
+        allow.stop()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    test.addCleanup(remove)
+    return connections["replica"]
+
+
+class CatalogTestCase(TestCase):
+    """Un catálogo pequeño y comprobaciones de los datos que mantienen las señales"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roca = Chef.objects.create(name="Joan Roca", specialty="Cocina española")
+        cls.bottura = Chef.objects.create(name="Massimo Bottura", specialty="Cocina italiana")
+        cls.celler = Restaurant.objects.create(name="El Celler de Can Roca", location="Girona")
+        cls.francescana = Restaurant.objects.create(name="Osteria Francescana", location="Módena")
+        cls.diverxo = Restaurant.objects.create(name="DiverXO", location="Madrid")
+        cls.paella = Recipe.objects.create(title="Paella", preparation_time=60, chef=cls.roca)
+        cls.bacalao = Recipe.objects.create(title="Bacalao", preparation_time=45, chef=cls.roca)
+        cls.risotto = Recipe.objects.create(title="Risotto", preparation_time=30, chef=cls.bottura)
+        cls.paella.restaurants.add(cls.celler, cls.diverxo)
+        cls.bacalao.restaurants.add(cls.celler)
+        cls.risotto.restaurants.add(cls.francescana, cls.diverxo)
+
+    def check(self, command):
+        """Falla si `command --check` encuentra datos desnormalizados incorrectos"""
+        call_command(command, "--check", stdout=StringIO())
+
+    def assertConsistent(self):
+        self.check("rebuild_recipe_counts")
+
+
+class RecipeCountTests(CatalogTestCase):
+    def test_signals_keep_counts(self):
+        self.assertConsistent()
+        self.assertEqual(Chef.objects.get(pk=self.roca.pk).recipe_count, 2)
+        self.assertEqual(Restaurant.objects.get(pk=self.diverxo.pk).recipe_count, 2)
+        self.diverxo.recipe_set.remove(self.paella)
+        self.celler.recipe_set.add(self.risotto)
+        self.bacalao.chef = self.bottura
+        self.bacalao.save()
+        self.assertConsistent()
+        self.celler.recipe_set.clear()
+        self.risotto.restaurants.clear()
+        self.paella.delete()
+        self.assertConsistent()
+        self.assertEqual(Chef.objects.get(pk=self.roca.pk).recipe_count, 0)
+
+    def test_stale_save_keeps_count(self):
+        stale = Restaurant.objects.get(pk=self.francescana.pk)
+        self.paella.restaurants.add(self.francescana)
+        self.bacalao.restaurants.add(self.francescana)
+        stale.location = "Modena"
+        stale.save()
+        self.assertEqual(Restaurant.objects.get(pk=self.francescana.pk).recipe_count, 3)
+        stale_chef = Chef.objects.get(pk=self.bottura.pk)
+        Recipe.objects.create(title="Tortellini", preparation_time=90, chef=self.bottura)
+        stale_chef.save(update_fields=["name", "recipe_count"])
+        self.assertEqual(Chef.objects.get(pk=self.bottura.pk).recipe_count, 2)
+        self.assertConsistent()
+
+    def test_save_reinserts_deleted_row(self):
+        restaurant = Restaurant.objects.create(name="Mugaritz", location="Errenteria")
+        Restaurant.objects.filter(pk=restaurant.pk).delete()
+        restaurant.save()
+        self.assertEqual(Restaurant.objects.get(pk=restaurant.pk).name, "Mugaritz")
+        self.assertConsistent()
+
+
+class RestaurantConfigLookupTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        RestaurantConfig.objects.create(
+            restaurant=cls.celler,
+            settings={"services": ["delivery", "takeaway", "dine-in"], "restricted_dishes": {"alcohol": True}},
+        )
+        RestaurantConfig.objects.create(
+            restaurant=cls.francescana,
+            settings={"services": ["dine-in"], "restricted_dishes": {"alcohol": False}},
+        )
+        RestaurantConfig.objects.create(restaurant=cls.diverxo, settings={"services": ["delivery"]})
+
+    def assertRestaurants(self, queryset, expected):
+        # Traducido a las tablas derivadas: el WHERE no lee el JSON.
+        self.assertNotIn('"settings"', str(queryset.query).partition(" WHERE ")[2])
+        self.assertEqual(set(queryset.values_list("restaurant", flat=True)), {r.pk for r in expected})
+
+    def test_keyword_lookups(self):
+        configs = RestaurantConfig.objects
+        self.assertRestaurants(configs.filter(settings__services__contains="delivery"), [self.celler, self.diverxo])
+        self.assertRestaurants(configs.filter(settings__services__icontains="DINE"), [self.celler, self.francescana])
+        self.assertRestaurants(configs.filter(settings__services__2__isnull=False), [self.celler])
+        self.assertRestaurants(configs.exclude(settings__services__1__isnull=False), [self.francescana, self.diverxo])
+        self.assertRestaurants(configs.filter(settings__restricted_dishes__alcohol=True), [self.celler])
+        self.assertRestaurants(configs.filter(settings__restricted_dishes__alcohol__isnull=True), [self.diverxo])
+
+    def test_q_lookups(self):
+        configs = RestaurantConfig.objects
+        self.assertRestaurants(
+            configs.filter(Q(settings__services__contains="dine-in") & ~Q(settings__restricted_dishes__alcohol=True)),
+            [self.francescana],
+        )
+        self.assertRestaurants(
+            configs.filter(
+                Q(settings__services__2__isnull=False) | Q(settings__restricted_dishes__alcohol=False),
+                restaurant__location__in=["Girona", "Módena"],
+            ),
+            [self.celler, self.francescana],
+        )
+        self.assertRestaurants(configs.exclude(Q(settings__services__contains="delivery")), [self.francescana])
+        self.assertEqual(configs.get(Q(settings__restricted_dishes__alcohol=False)).restaurant_id, self.francescana.pk)
+
+    def test_follows_settings_changes(self):
+        config = RestaurantConfig.objects.get(restaurant=self.francescana)
+        config.settings = {"services": ["dine-in", "delivery"]}
+        config.save()
+        self.assertRestaurants(
+            RestaurantConfig.objects.filter(Q(settings__services__contains="delivery")),
+            [self.celler, self.francescana, self.diverxo],
+        )
+        self.assertRestaurants(RestaurantConfig.objects.filter(settings__restricted_dishes__alcohol=False), [])
+
+
+class JSONPatchTests(CatalogTestCase):
+    def setUp(self):
+        RestaurantConfig.objects.bulk_upsert(
+            [
+                (self.celler.pk, {"services": ["delivery"], "restricted_dishes": {"alcohol": True}}),
+                RestaurantConfig(
+                    restaurant=self.diverxo, settings={"services": [], 'menú "degustación"': {"platos": 12}}
+                ),
+            ]
+        )
+
+    def settings(self, restaurant):
+        """settings tal como está en la base de datos, comprobando que no hay claves repetidas"""
+        def unique_keys(pairs):
+            self.assertEqual(len(pairs), len(dict(pairs)), pairs)
+            return dict(pairs)
+
+        raw = RestaurantConfig.objects.filter(restaurant=restaurant).values_list(Cast("settings", TextField()))
+        return json.loads(raw.get()[0], object_pairs_hook=unique_keys)
+
+    def test_bulk_upsert(self):
+        self.assertEqual(self.settings(self.diverxo), {"services": [], 'menú "degustación"': {"platos": 12}})
+        self.assertEqual(RestaurantConfig.objects.get(restaurant=self.celler).service_count, 1)
+        # Reemplaza las existentes y crea las que faltan, con sus tablas derivadas.
+        with CaptureQueriesContext(connection) as queries:
+            RestaurantConfig.objects.bulk_upsert(
+                [
+                    (self.celler.pk, {"services": ["takeaway", "dine-in"]}),
+                    (self.francescana.pk, {"services": ["delivery"], "restricted_dishes": {"alcohol": False}}),
+                ]
+            )
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(self.settings(self.celler), {"services": ["takeaway", "dine-in"]})
+        self.assertEqual(RestaurantConfig.objects.get(restaurant=self.celler).service_count, 2)
+        configs = RestaurantConfig.objects
+        self.assertEqual(
+            set(configs.filter(settings__services__contains="delivery").values_list("restaurant", flat=True)),
+            {self.francescana.pk},
+        )
+        self.assertFalse(configs.filter(settings__restricted_dishes__alcohol__isnull=False, restaurant=self.celler))
+
+    def test_patch(self):
+        changed = RestaurantConfig.objects.patch(
+            {"restaurant__location": "Girona"},
+            {
+                "restricted_dishes.alcohol": False,
+                "restricted_dishes.cerdo": True,
+                "services[]": "terraza",
+                "notas": "ñ",
+            },
+        )
+        self.assertEqual(changed, 1)
+        self.assertEqual(
+            self.settings(self.celler),
+            {
+                "services": ["delivery", "terraza"],
+                "restricted_dishes": {"alcohol": False, "cerdo": True},
+                "notas": "ñ",
+            },
+        )
+        config = RestaurantConfig.objects.get(restaurant=self.celler)
+        self.assertEqual(config.service_count, 2)
+        restrictions = set(config.restriction_rows.values_list("dish", "restricted"))
+        self.assertEqual(restrictions, {("alcohol", False), ("cerdo", True)})
+        self.assertEqual(RestaurantConfig.objects.patch(Q(restaurant=self.francescana), {"services[]": "x"}), 0)
+
+    def test_patch_escaped_keys(self):
+        # Claves que JSONField guarda con escapes: comillas y caracteres no ASCII.
+        RestaurantConfig.objects.patch(
+            {"restaurant": self.diverxo},
+            {'menú "degustación".platos': 14, 'menú "degustación".precio': 365, 'a"[b': {"c": 1}, "niño": True},
+        )
+        RestaurantConfig.objects.patch({"restaurant": self.diverxo}, {"niño": False, 'a"[b': {"d": 2}})
+        self.assertEqual(
+            self.settings(self.diverxo),
+            {"services": [], 'menú "degustación"': {"platos": 14, "precio": 365}, 'a"[b': {"d": 2}, "niño": False},
+        )
+        with self.assertRaises(ValueError):
+            RestaurantConfig.objects.patch(None, {'menú "degustación"[]': 1})
+
+
+class OpeningHoursTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        hours = {
+            cls.celler: {"weekdays": "12pm-11pm", "weekends": "10am-11pm"},
+            # Los viernes por la noche cierra ya en sábado.
+            cls.francescana: {"weekdays": "6pm-2am", "weekends": None},
+            cls.diverxo: {"weekdays": "8am-10pm", "weekends": "8pm-3am"},
+        }
+        for restaurant, opening_hours in hours.items():
+            RestaurantConfig.objects.create(restaurant=restaurant, settings={"opening_hours": opening_hours})
+
+    def test_parse_opening_hours(self):
+        self.assertEqual(parse_opening_hours("12pm-11pm"), (720, 1380))
+        self.assertEqual(parse_opening_hours("10:30am-22:00"), (630, 1320))
+        self.assertEqual(parse_opening_hours("6pm-2am"), (1080, 1560))
+        self.assertEqual(parse_opening_hours("12am-12pm"), (0, 720))
+        # Misma apertura y cierre: abierto 24 horas.
+        self.assertEqual(parse_opening_hours("9:30-9:30"), (570, 2010))
+        for closed in (None, "", "cerrado", "13pm-2pm", "10am", "10am-11pm-12pm"):
+            with self.subTest(value=closed):
+                self.assertEqual(parse_opening_hours(closed), (None, None))
+
+    def assertOpen(self, queryset, expected):
+        self.assertEqual(set(queryset.values_list("restaurant", flat=True)), {r.pk for r in expected})
+
+    def test_open_at(self):
+        configs = RestaurantConfig.objects
+        self.assertOpen(configs.open_at("weekdays", datetime.time(12)), [self.celler, self.diverxo])
+        self.assertOpen(configs.open_at("weekdays", 23 * 60), [self.francescana])
+        # Martes a la 1:00: sigue abierto el horario del lunes.
+        self.assertOpen(configs.open_at("weekdays", datetime.time(1)), [self.francescana])
+        self.assertOpen(configs.open_at("weekdays", datetime.time(2)), [])
+        self.assertOpen(configs.open_at("weekends", datetime.time(22)), [self.celler, self.diverxo])
+        with self.assertRaises(ValueError):
+            configs.open_at("festivos", datetime.time(12))
+
+    def test_open_at_across_weekend(self):
+        configs = RestaurantConfig.objects
+        # Sábado a la 1:00: horario del viernes (laborable) y no el del sábado por la noche.
+        self.assertOpen(configs.open_at("weekends", datetime.time(1), previous_day_type="weekdays"), [self.francescana])
+        # Lunes a las 2:00: horario del domingo.
+        self.assertOpen(configs.open_at("weekdays", datetime.time(2), previous_day_type="weekends"), [self.diverxo])
+        saturday = timezone.make_aware(datetime.datetime(2026, 10, 17, 1, 0))
+        with mock.patch("recetario_app.models.timezone.localtime", return_value=saturday):
+            self.assertOpen(configs.open_now(), [self.francescana])
+        monday = timezone.make_aware(datetime.datetime(2026, 10, 19, 1, 0))
+        with mock.patch("recetario_app.models.timezone.localtime", return_value=monday):
+            self.assertOpen(configs.open_now(), [self.diverxo])
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Tiempos repetidos: la página siguiente tiene que desempatar por id.
+        for number in range(9):
+            recipe = Recipe.objects.create(title=f"Tapa {number}", preparation_time=30 + number % 3 * 15, chef=cls.roca)
+            recipe.restaurants.add(cls.diverxo if number % 2 else cls.celler)
+            RecipeStats.objects.create(recipe=recipe, total_orders=number, positive_reviews=0)
+
+    def pages(self, url):
+        """Recorre el listado siguiendo `next`; devuelve los ids de cada página y sus consultas"""
+        pages, queries, cursor = [], [], None
+        while True:
+            params = {"limit": 4} if cursor is None else {"limit": 4, "cursor": cursor}
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([result["id"] for result in data["results"]])
+            queries.append(len(captured))
+            cursor = data["next"]
+            if cursor is None:
+                return pages, queries
+
+    def test_round_trip(self):
+        pages, queries = self.pages("/recetario/recipes/")
+        expected = list(Recipe.objects.order_by("preparation_time", "pk").values_list("pk", flat=True))
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 4])
+        # Chef, estadísticas y restaurantes con sus configuraciones: las mismas consultas en cada página.
+        self.assertEqual(queries, [2, 2, 2])
+
+        pages, queries = self.pages("/recetario/chefs/")
+        self.assertEqual(pages, [sorted([self.roca.pk, self.bottura.pk])])
+
+        pages, queries = self.pages(f"/recetario/restaurants/{self.diverxo.pk}/menu/")
+        expected = self.diverxo.recipe_set.order_by("preparation_time", "pk").values_list("pk", flat=True)
+        self.assertEqual([pk for page in pages for pk in page], list(expected))
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_invalid_cursor(self):
+        for params in (
+            {"cursor": "no es un cursor"},
+            {"cursor": encode_cursor([30])},
+            {"cursor": encode_cursor(["30", 1])},
+            {"limit": "0"},
+            {"limit": "diez"},
+            {"min_time": "media hora"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get("/recetario/recipes/", params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.assertEqual(self.client.get("/recetario/chefs/", {"cursor": encode_cursor([1, 2])}).status_code, 400)
+
+
+class QueryWatchTests(CatalogTestCase):
+    def test_lazy_foreign_key(self):
+        with query_watch(threshold=3) as report:
+            names = [recipe.chef.name for recipe in Recipe.objects.all()]
+        self.assertEqual(len(names), 3)
+        self.assertEqual(report.count, 4)
+        [(shape, site, count, lazy)] = report.n_plus_one()
+        self.assertEqual(count, 3)
+        self.assertTrue(lazy)
+        self.assertIn("recetario_app_chef", shape)
+        self.assertIn(f"{__file__}:", site)
+        self.assertIn("N+1 (carga perezosa de relación) x3", report.summary())
+
+    def test_lazy_reverse_relation(self):
+        with query_watch(threshold=3) as report:
+            for restaurant in Restaurant.objects.all():
+                list(restaurant.recipe_set.all())
+        [(shape, site, count, lazy)] = report.n_plus_one()
+        self.assertEqual(count, 3)
+        self.assertTrue(lazy)
+
+    def test_prefetched_relations(self):
+        with query_watch(threshold=2, raise_on_n_plus_one=True) as report:
+            for recipe in Recipe.objects.select_related("chef").prefetch_related("restaurants"):
+                recipe.chef.name, list(recipe.restaurants.all())
+        self.assertEqual(report.count, 2)
+        self.assertEqual(report.n_plus_one(), [])
+
+    def test_same_shape_from_different_lines_is_not_n_plus_one(self):
+        with query_watch(threshold=2) as report:
+            Chef.objects.filter(pk__in=[self.roca.pk, self.bottura.pk]).first()
+            Chef.objects.filter(pk__in=[self.roca.pk, self.bottura.pk, 0]).first()
+        # Las listas IN se colapsan: una sola forma, pero desde dos líneas.
+        [(shape, count, _)] = report.groups()
+        self.assertEqual(count, 2)
+        self.assertIn("IN (...)", shape)
+        self.assertEqual(report.n_plus_one(), [])
+
+    def test_checks(self):
+        with self.assertRaises(NPlusOneDetected):
+            with query_watch(threshold=3, raise_on_n_plus_one=True):
+                [recipe.chef.name for recipe in Recipe.objects.all()]
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_watch(budget=1):
+                list(Chef.objects.all())
+                list(Restaurant.objects.all())
+
+    def test_middleware_headers(self):
+        options = {"ENABLED": True, "THRESHOLD": 2, "BUDGET": None, "RAISE": True}
+        with self.settings(QUERY_WATCH=options):
+            response = Client().get("/recetario/recipes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Query-Count"], "2")
+
+
+class ChefRestaurantTests(CatalogTestCase):
+    def assertConsistent(self):
+        self.check("rebuild_chef_restaurants")
+        for location in ("Girona", "Madrid", "Módena"):
+            expected = Chef.objects.filter(recipe__restaurants__location=location).distinct()
+            self.assertQuerySetEqual(
+                Chef.objects.with_recipe_in(location=location).order_by("pk"), expected.order_by("pk")
+            )
+
+    def test_signals_keep_chef_restaurants(self):
+        self.assertConsistent()
+        self.francescana.recipe_set.add(self.paella, self.bacalao)
+        self.paella.restaurants.remove(self.diverxo)
+        self.assertConsistent()
+        self.risotto.chef = self.roca
+        self.risotto.save()
+        self.celler.location = "Madrid"
+        self.celler.save()
+        self.assertConsistent()
+        self.diverxo.recipe_set.clear()
+        self.bacalao.delete()
+        self.assertConsistent()
+
+    def test_check_detects_drift(self):
+        ChefRestaurant.objects.filter(chef=self.roca).update(recipes=7)
+        ChefRestaurant.objects.filter(chef=self.bottura, restaurant=self.diverxo).update(location="Lima")
+        ChefRestaurant.objects.filter(chef=self.bottura, restaurant=self.francescana).delete()
+        ChefRestaurant.objects.create(chef=self.bottura, restaurant=self.celler, location="Girona", recipes=1)
+        with self.assertNumQueries(1):
+            self.assertEqual(chef_restaurant_mismatches(), (1, 4))
+        with self.assertRaises(CommandError):
+            self.check("rebuild_chef_restaurants")
+        # El DELETE y el INSERT ... ON CONFLICT, más el SAVEPOINT y su RELEASE.
+        with self.assertNumQueries(4):
+            self.assertEqual(rebuild_chef_restaurants(), (1, 4))
+        self.assertEqual(chef_restaurant_mismatches(), (0, 0))
+        self.assertEqual(rebuild_chef_restaurants(), (0, 0))
+        self.assertConsistent()
+
+
+class SyncMenusTests(CatalogTestCase):
+    def assertConsistent(self):
+        self.check("rebuild_recipe_counts")
+        self.check("rebuild_chef_restaurants")
+
+    def menu(self, restaurant):
+        return set(restaurant.recipe_set.values_list("pk", flat=True))
+
+    def test_sync_menus(self):
+        received = []
+        menus_synced.connect(lambda sender, **kwargs: received.append(kwargs), weak=False, dispatch_uid="test")
+        self.addCleanup(menus_synced.disconnect, dispatch_uid="test")
+        added, removed = sync_menus({
+            self.celler.pk: [self.bacalao.pk, self.risotto.pk],
+            self.francescana.pk: [],
+        })
+        self.assertEqual((added, removed), (1, 2))
+        self.assertEqual(self.menu(self.celler), {self.bacalao.pk, self.risotto.pk})
+        self.assertEqual(self.menu(self.francescana), set())
+        self.assertEqual(self.menu(self.diverxo), {self.paella.pk, self.risotto.pk})
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]["added"], [(self.celler.pk, self.risotto.pk)])
+        self.assertConsistent()
+
+        self.assertEqual(sync_menus({self.diverxo.pk: [self.bacalao.pk]}, prune=False), (1, 0))
+        self.assertEqual(self.menu(self.diverxo), {self.paella.pk, self.risotto.pk, self.bacalao.pk})
+        self.assertEqual(sync_menus({self.diverxo.pk: [self.bacalao.pk]}, prune=False), (0, 0))
+        self.assertConsistent()
+
+    def test_missing_recipe(self):
+        with self.assertRaises(ValueError):
+            sync_menus({self.celler.pk: [self.paella.pk, 999_999]})
+        self.assertEqual(self.menu(self.celler), {self.paella.pk, self.bacalao.pk})
+        self.assertConsistent()
+
+
+class FastDeleteTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for recipe in (cls.paella, cls.bacalao, cls.risotto):
+            RecipeStats.objects.create(recipe=recipe, total_orders=10, positive_reviews=5)
+            RecipeEvent.objects.create(recipe=recipe, kind=RecipeEvent.ORDER)
+        for restaurant in (cls.celler, cls.diverxo):
+            RestaurantConfig.objects.create(restaurant=restaurant, settings={"services": ["delivery"]})
+
+    def deleted_rows(self, result):
+        # ChefRestaurant se cuenta o no según si sus filas se borran en cascada o antes, al
+        # descontar los menús que llegan a cero (también en QuerySet.delete()).
+        return {label: n for label, n in result[1].items() if label != ChefRestaurant._meta.label}
+
+    def assertDeletesLikeDjango(self, queryset):
+        with transaction.atomic():
+            expected = self.deleted_rows(queryset.all().delete())
+            transaction.set_rollback(True)
+        for skip_signals in (False, True):
+            with self.subTest(skip_signals=skip_signals), transaction.atomic():
+                result = fast_delete(queryset.all(), skip_signals=skip_signals, batch_size=1)
+                self.assertEqual(self.deleted_rows(result), expected)
+                self.assertFalse(queryset.exists())
+                self.check("rebuild_recipe_counts")
+                self.check("rebuild_chef_restaurants")
+                transaction.set_rollback(True)
+
+    def test_chef(self):
+        self.assertDeletesLikeDjango(Chef.objects.filter(pk=self.roca.pk))
+
+    def test_restaurants(self):
+        self.assertDeletesLikeDjango(Restaurant.objects.filter(location__in=["Girona", "Madrid"]))
+
+    def test_command_skip_signals(self):
+        self.addCleanup(config_cache.clear)
+        self.assertIsNotNone(config_cache.get(self.diverxo.pk))
+        call_command("fast_delete", "restaurant", str(self.diverxo.pk), "--skip-signals", stdout=StringIO())
+        self.assertIsNone(config_cache.get(self.diverxo.pk))
+        self.check("rebuild_recipe_counts")
+        self.check("rebuild_chef_restaurants")
+
+
+class RecipeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        build_dataset(5000)
+
+    def setUp(self):
+        if not fts_available(connection):
+            self.skipTest("La base de datos no tiene el índice FTS5")
+
+    def icontains(self, *terms):
+        queryset = Recipe.objects.all()
+        for term in terms:
+            queryset = queryset.filter(title__icontains=term)
+        return queryset
+
+    def test_same_recipes_as_icontains(self):
+        for terms in (["Risotto"], ["risotto", "cordero"], ["4321"]):
+            with self.subTest(terms=terms):
+                found = set(Recipe.objects.search(" ".join(terms)).values_list("pk", flat=True))
+                self.assertTrue(found)
+                self.assertEqual(found, set(self.icontains(*terms).values_list("pk", flat=True)))
+
+    def test_ordered_by_rank(self):
+        search = Recipe.objects.search("risotto cordero")
+        # Un solo MATCH, en el JOIN: no una subconsulta por receta.
+        self.assertEqual(str(search.query).count(" MATCH "), 1)
+        ranks = [recipe.rank for recipe in search]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_faster_than_icontains(self):
+        """
+        Con términos selectivos el índice tiene que ganar al LIKE '%...%', que recorre la
+        tabla entera. (Con palabras que están en una de cada cinco recetas ambos leen casi
+        lo mismo.)
+        """
+        for terms in (["4321"], ["432"], ["paella", "4321"]):
+            with self.subTest(terms=terms):
+                # Un QuerySet nuevo en cada repetición: el mismo guardaría el resultado.
+                search = median_ms(lambda: list(Recipe.objects.search(" ".join(terms)).values_list("pk")))
+                scan = median_ms(lambda: list(self.icontains(*terms).values_list("pk")))
+                self.assertLess(search, scan)
+
+
+class CounterBufferTests(TransactionTestCase):
+    # Fuera de una transacción de test: en SQLite las claves ajenas se comprueban al
+    # hacer COMMIT, que es donde fallaba una receta borrada.
+
+    def setUp(self):
+        self.buffer = CounterBuffer(flush_interval=3600, max_pending=3, enabled=True)
+        self.addCleanup(self.buffer._stop.set)
+        chef = Chef.objects.create(name="Joan Roca", specialty="Cocina española")
+        self.with_stats, self.without_stats, self.deleted = (
+            Recipe.objects.create(title=title, preparation_time=30, chef=chef)
+            for title in ("Bacalao", "Paella", "Pato")
+        )
+        RecipeStats.objects.create(recipe=self.with_stats, total_orders=10, positive_reviews=5)
+
+    def test_flush_adds_increments(self):
+        self.buffer.add(self.with_stats.pk, orders=2)
+        self.buffer.add(self.with_stats.pk, orders=1, reviews=1)
+        self.buffer.add(self.without_stats.pk, reviews=4)
+        self.assertEqual(self.buffer.pending(self.with_stats.pk), (3, 1))
+        self.assertEqual(self.buffer.flush(), 2)
+        stats = dict(RecipeStats.objects.values_list("recipe", "total_orders"))
+        self.assertEqual(stats, {self.with_stats.pk: 13, self.without_stats.pk: 0})
+        self.assertEqual(RecipeStats.objects.get(recipe=self.without_stats).positive_reviews, 4)
+        self.assertEqual(RecipeEvent.objects.count(), 3)
+        self.assertEqual(self.buffer.pending(self.with_stats.pk), (0, 0))
+
+    def test_deleted_recipe_is_dropped(self):
+        deleted_id = self.deleted.pk
+        self.buffer.add(deleted_id, orders=1)
+        self.buffer.add(self.without_stats.pk, orders=1)
+        self.deleted.delete()
+        with self.assertLogs("recetario_app.counters", "WARNING"):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.pending(deleted_id), (0, 0))
+        self.assertFalse(RecipeEvent.objects.filter(recipe_id=deleted_id).exists())
+        # El búfer sigue funcionando: con MAX_PENDING recetas escribe en la misma llamada.
+        with self.assertLogs("recetario_app.counters", "WARNING"):
+            for recipe_id in (deleted_id, self.with_stats.pk, self.without_stats.pk):
+                self.buffer.add(recipe_id, orders=1)
+        self.assertEqual(self.buffer.pending(self.with_stats.pk), (0, 0))
+        self.assertEqual(RecipeStats.objects.get(recipe=self.with_stats).total_orders, 11)
+        self.assertEqual(RecipeStats.objects.get(recipe=self.without_stats).total_orders, 2)
+
+    def test_in_flight_increments_stay_pending(self):
+        seen = []
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.startswith("UPDATE"):
+                seen.append(self.buffer.pending(self.with_stats.pk))
+            return execute(sql, params, many, context)
+
+        self.buffer.add(self.with_stats.pk, orders=2, reviews=1)
+        with connection.execute_wrapper(wrapper):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(seen, [(2, 1)])
+        self.assertEqual(self.buffer.pending(self.with_stats.pk), (0, 0))
+
+    def test_failed_size_flush_is_retried(self):
+        def locked(execute, sql, params, many, context):
+            if sql.startswith("UPDATE"):
+                raise OperationalError("database is locked")
+            return execute(sql, params, many, context)
+
+        recipe_ids = [self.with_stats.pk, self.without_stats.pk, self.deleted.pk]
+        with connection.execute_wrapper(locked), self.assertLogs("recetario_app.counters", "ERROR"):
+            # La tercera receta llena el búfer: el error no llega a quien registra el pedido.
+            for recipe_id in recipe_ids:
+                self.buffer.add(recipe_id, orders=1)
+            self.buffer.add(self.with_stats.pk, reviews=1)
+        self.assertEqual(self.buffer.pending(self.with_stats.pk), (1, 1))
+        self.assertEqual(self.buffer.pending(self.deleted.pk), (1, 0))
+        self.assertFalse(RecipeEvent.objects.exists())
+        # Lo que haría el hilo en segundo plano en el siguiente intervalo.
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(RecipeStats.objects.get(recipe=self.with_stats).total_orders, 11)
+        self.assertEqual(RecipeStats.objects.get(recipe=self.with_stats).positive_reviews, 6)
+        self.assertEqual(RecipeStats.objects.filter(total_orders=1).count(), 2)
+
+
+class RollupTests(CatalogTestCase):
+    since = datetime.datetime(2026, 10, 10, 22, 0, tzinfo=datetime.timezone.utc)
+    until = datetime.datetime(2026, 10, 13, 3, 30, tzinfo=datetime.timezone.utc)
+
+    def event(self, recipe, kind, quantity, day, hour, minute=0):
+        created_at = datetime.datetime(2026, 10, day, hour, minute, tzinfo=datetime.timezone.utc)
+        return RecipeEvent.objects.create(recipe=recipe, kind=kind, quantity=quantity, created_at=created_at)
+
+    def setUp(self):
+        # Ventana: horas sueltas el día 10 (22-24h) y el 13 (0-3:30h), días completos 11 y 12.
+        self.event(self.paella, RecipeEvent.ORDER, 2, 10, 22, 15)
+        self.event(self.paella, RecipeEvent.ORDER, 3, 11, 12)
+        self.event(self.paella, RecipeEvent.REVIEW, 1, 13, 3, 10)
+        self.event(self.risotto, RecipeEvent.ORDER, 4, 12, 8)
+        self.event(self.bacalao, RecipeEvent.ORDER, 4, 13, 1)
+        # Fuera de la ventana.
+        self.event(self.bacalao, RecipeEvent.ORDER, 50, 10, 21, 59)
+        self.event(self.risotto, RecipeEvent.ORDER, 50, 13, 4)
+
+    def test_build_and_watermark(self):
+        self.assertEqual(aggregate_events(batch_size=3), 7)
+        watermark = RollupWatermark.objects.get(name=WATERMARK)
+        self.assertEqual(watermark.last_event_id, RecipeEvent.objects.latest("pk").pk)
+        paella = RecipeHourlyRollup.objects.filter(recipe=self.paella)
+        self.assertEqual(sorted(paella.values_list("orders", "reviews")), [(0, 1), (2, 0), (3, 0)])
+        daily = RecipeDailyRollup.objects.get(recipe=self.paella, bucket=datetime.date(2026, 10, 13))
+        self.assertEqual((daily.orders, daily.reviews), (0, 1))
+        self.assertEqual(window_totals(self.since, self.until), {"orders": 13, "reviews": 1})
+        self.assertEqual(window_totals(self.since, self.until, self.paella.pk), {"orders": 5, "reviews": 1})
+
+        # Solo se suman los eventos posteriores a la marca, también en un bucket existente.
+        self.assertEqual(aggregate_events(), 0)
+        self.event(self.paella, RecipeEvent.ORDER, 1, 11, 12, 30)
+        self.assertEqual(aggregate_events(), 1)
+        daily = RecipeDailyRollup.objects.get(recipe=self.paella, bucket=datetime.date(2026, 10, 11))
+        self.assertEqual(daily.orders, 4)
+        self.assertEqual(window_totals(self.since, self.until), {"orders": 14, "reviews": 1})
+
+    def test_lag_leaves_recent_events(self):
+        recent = RecipeEvent.objects.create(recipe=self.paella, kind=RecipeEvent.ORDER, quantity=1)
+        self.assertEqual(aggregate_events(lag=datetime.timedelta(minutes=5)), 7)
+        self.assertEqual(RollupWatermark.objects.get().last_event_id, recent.pk - 1)
+        self.assertEqual(aggregate_events(), 1)
+
+    def test_trending(self):
+        aggregate_events()
+        # La paella suma buckets horarios y diarios; el bacalao y el risotto empatan a 4.
+        with self.assertNumQueries(1):
+            top = trending(since=self.since, until=self.until)
+        self.assertEqual(top, [(self.paella.pk, 5), (self.bacalao.pk, 4), (self.risotto.pk, 4)])
+        self.assertEqual(trending(limit=2, since=self.since, until=self.until)[1], (self.bacalao.pk, 4))
+        self.assertEqual(trending(limit=1, since=self.since, until=self.until, by="reviews"), [(self.paella.pk, 1)])
+        # Una ventana dentro de un mismo día solo usa la tabla horaria.
+        since = datetime.datetime(2026, 10, 13, 0, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(trending(since=since, until=self.until), [(self.bacalao.pk, 4), (self.paella.pk, 0)])
+        with self.assertRaises(ValueError):
+            trending(by="pk")
+
+
+class QueryCacheTests(TransactionTestCase):
+    def setUp(self):
+        querycache.backend().clear()
+        self.replica = add_replica(self)
+        self.chef = Chef.objects.create(name="Joan Roca", specialty="Cocina española")
+        route = mock.patch.object(PrimaryReplicaRouter, "db_for_read", return_value="replica")
+        route.start()
+        self.addCleanup(route.stop)
+
+    def read(self, queryset):
+        """(resultado, consultas en default, consultas en la réplica)"""
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(self.replica) as replica:
+            result = list(queryset.values_list("name", flat=True))
+        return result, len(primary), len(replica)
+
+    def test_reads_primary_within_replica_lag(self):
+        queryset = Chef.objects.filter(specialty="Cocina española").cached()
+        self.assertEqual(self.read(queryset), (["Joan Roca"], 1, 0))
+        self.assertEqual(self.read(queryset), (["Joan Roca"], 0, 0))
+        # Con .using() se lee de donde se pide.
+        self.assertEqual(self.read(queryset.using("replica")), (["Joan Roca"], 0, 1))
+
+        later = time.time() + settings.QUERY_CACHE_REPLICA_LAG + 1
+        with mock.patch("recetario_app.querycache.time.time", return_value=later):
+            self.assertEqual(self.read(queryset.order_by("-pk")), (["Joan Roca"], 0, 1))
+            # Una escritura vuelve a abrir el margen para las consultas sobre esa tabla.
+            Chef.objects.create(name="Dabiz Muñoz", specialty="Cocina española")
+            self.assertEqual(self.read(queryset.order_by("pk")), (["Joan Roca", "Dabiz Muñoz"], 1, 0))
+
+    def test_versions_without_writes_are_old(self):
+        querycache.backend().clear()
+        queryset = Chef.objects.filter(specialty="Cocina española").cached()
+        self.assertEqual(self.read(queryset), (["Joan Roca"], 0, 1))
+        self.assertEqual(self.read(queryset), (["Joan Roca"], 0, 0))
+
+
+class RestaurantDetailTests(CatalogTestCase):
+    def test_config_and_stats(self):
+        RecipeStats.objects.create(recipe=self.paella, total_orders=10, positive_reviews=4)
+        RecipeStats.objects.create(recipe=self.risotto, total_orders=5, positive_reviews=5)
+        data = self.client.get(f"/recetario/restaurants/{self.diverxo.pk}/").json()
+        self.assertEqual(data["stats"], {"total_orders": 15, "positive_reviews": 9})
+        self.assertEqual(data["recipe_count"], 2)
+        self.assertIsNone(data["settings"])
+
+
+class ExportTests(CatalogTestCase):
+    def test_wsgi_streams_sync_iterator(self):
+        response = self.client.get("/recetario/export/recipes/?format=csv")
+        self.assertFalse(response.is_async)
+        self.assertEqual(b"".join(response.streaming_content).decode(), "".join(export_lines("csv")))
+
+    async def test_asgi_streams_async_iterator(self):
+        # Con un iterador síncrono Django lo convertiría en lista antes de enviar nada.
+        response = await AsyncClient().get("/recetario/export/recipes/?format=ndjson")
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        expected = await sync_to_async(lambda: "".join(export_lines("ndjson")))()
+        self.assertEqual(b"".join(chunks).decode(), expected)
+        self.assertEqual(len(expected.splitlines()), 3)
+
+
+class PrimaryReplicaRouterTests(CatalogTestCase):
+    @override_settings(DATABASE_REPLICA_WEIGHTS={"replica": 1})
+    def test_catalog_write_pins_reads_to_primary(self):
+        router = PrimaryReplicaRouter()
+
+        def view(request):
+            before = router.db_for_read(Recipe)
+            self.paella.preparation_time = 55
+            self.paella.save()
+            return before, router.db_for_read(Recipe), router.db_for_read(Chef)
+
+        self.assertEqual(PrimaryPinMiddleware(view)(None), ("replica", "default", "default"))
+        # La siguiente petición vuelve a leer de las réplicas.
+        self.assertEqual(PrimaryPinMiddleware(lambda request: router.db_for_read(Recipe))(None), "replica")
+
+    @override_settings(DATABASE_REPLICA_WEIGHTS={"replica": 1})
+    def test_other_apps_do_not_pin(self):
+        router = PrimaryReplicaRouter()
+
+        def view(request):
+            session = SessionStore()
+            session["restaurant"] = self.diverxo.pk
+            session.save()
+            User.objects.create_user("maitre")
+            return router.db_for_write(User), pinned_to_primary(), router.db_for_read(Recipe)
+
+        self.assertEqual(PrimaryPinMiddleware(view)(None), ("default", False, "replica"))
+
+
+class CatalogSnapshotTests(CatalogTestCase):
+    def test_reading_does_not_pin_to_primary(self):
+        def view(request):
+            return CatalogSnapshot().recipe_ids(location="Madrid"), pinned_to_primary()
+
+        recipe_ids, pinned = PrimaryPinMiddleware(view)(None)
+        self.assertEqual(recipe_ids, sorted([self.paella.pk, self.risotto.pk]))
+        self.assertFalse(pinned)
+
+    def test_refreshes_from_signals(self):
+        catalog_snapshot.clear()
+        self.addCleanup(catalog_snapshot.clear)
+        filters = [
+            {"location": "Madrid"},
+            {"specialty": "Cocina española", "max_time": 50},
+            {"location": "Girona", "min_time": 40},
+        ]
+
+        def assertMatchesOrm():
+            for kwargs in filters:
+                expected = filter_queryset(Recipe.objects.all(), **kwargs).order_by("pk")
+                expected = list(expected.values_list("pk", flat=True))
+                self.assertEqual(catalog_snapshot.recipe_ids(**kwargs), expected, kwargs)
+
+        assertMatchesOrm()
+        self.bacalao.preparation_time = 20
+        self.bacalao.save()
+        self.diverxo.recipe_set.add(self.bacalao)
+        self.celler.location = "Madrid"
+        self.celler.save()
+        self.risotto.delete()
+        assertMatchesOrm()
+
+    def test_min_orders_requires_stats(self):
+        RecipeStats.objects.create(recipe=self.paella, total_orders=3, positive_reviews=1)
+        RecipeStats.objects.create(recipe=self.bacalao, total_orders=0, positive_reviews=0)
+        snapshot = CatalogSnapshot()
+        for min_orders in (-1, 0, 1):
+            expected = filter_queryset(Recipe.objects.order_by("pk"), min_orders=min_orders)
+            self.assertEqual(snapshot.recipe_ids(min_orders=min_orders), list(expected.values_list("pk", flat=True)))
+        self.assertEqual(snapshot.recipe_ids(min_orders=0), [self.paella.pk, self.bacalao.pk])
+        # Lo mismo para las recetas releídas en el overlay.
+        snapshot.mark_recipes([self.paella.pk, self.risotto.pk])
+        self.assertEqual(snapshot.recipe_ids(min_orders=0), [self.paella.pk, self.bacalao.pk])
+
+    def test_build_does_not_block_marks(self):
+        snapshot = CatalogSnapshot()
+        marked = threading.Event()
+        build = snapshot.build
+
+        def build_while_marking():
+            # Una señal de otro hilo en mitad de la reconstrucción no espera a que termine.
+            thread = threading.Thread(target=lambda: (snapshot._add_dirty([self.paella.pk]), marked.set()))
+            thread.start()
+            thread.join(timeout=5)
+            return build()
+
+        with mock.patch.object(snapshot, "build", build_while_marking):
+            state = snapshot.state()
+        self.assertTrue(marked.is_set())
+        self.assertIn(self.paella.pk, state.overlay)
+
+
+class ConfigCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.replica = add_replica(self)
+        self.diverxo = Restaurant.objects.create(name="DiverXO", location="Madrid")
+        self.config = RestaurantConfig.objects.create(restaurant=self.diverxo, settings={"services": ["delivery"]})
+
+    def get(self, cache):
+        """(configuración, consultas en default, consultas en la réplica)"""
+        with (
+            mock.patch.object(PrimaryReplicaRouter, "db_for_read", return_value="replica"),
+            CaptureQueriesContext(connection) as primary,
+            CaptureQueriesContext(self.replica) as replica,
+        ):
+            value = cache.get(self.diverxo.pk)
+        return value, len(primary), len(replica)
+
+    def test_reads_primary_after_invalidation(self):
+        cache = ConfigCache(replica_lag=60)
+        cache.invalidate(self.diverxo.pk)
+        # Una réplica podría no tener aún el cambio: el fallo se lee de la principal.
+        self.assertEqual(self.get(cache), (self.config.settings, 1, 0))
+        self.assertEqual(self.get(cache), (self.config.settings, 0, 0))
+        cache.clear()
+        self.assertEqual(self.get(cache), (self.config.settings, 0, 1))
+
+    def test_reads_replica_after_lag(self):
+        cache = ConfigCache(replica_lag=0)
+        cache.invalidate(self.diverxo.pk)
+        self.assertEqual(self.get(cache), (self.config.settings, 0, 1))
\ No newline at end of file
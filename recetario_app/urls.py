@@ -3,4 +3,15 @@ from django.urls import path
 from . import views
 app_name = 'recetario'
 urlpatterns = [
-]
\ No newline at end of file
+    path('recipes/', views.recipe_list, name='recipe-list'),
+    path('recipes/search/', views.recipe_search, name='recipe-search'),
+    path('recipes/<int:pk>/', views.recipe_detail, name='recipe-detail'),
+    path('chefs/', views.chef_list, name='chef-list'),
+    path('chefs/<int:pk>/', views.chef_detail, name='chef-detail'),
+    path('restaurants/<int:pk>/', views.restaurant_detail, name='restaurant-detail'),
+    path('restaurants/<int:pk>/config/', views.restaurant_config, name='restaurant-config'),
+    path('restaurants/<int:pk>/menu/', views.restaurant_menu, name='restaurant-menu'),
+    path('leaderboard/specialty/<str:specialty>/', views.specialty_leaderboard, name='specialty-leaderboard'),
+    path('leaderboard/location/<str:location>/', views.location_leaderboard, name='location-leaderboard'),
+    path('export/recipes/', views.export_recipes, name='export-recipes'),
+]
@@ -1,3 +1,211 @@
-from django.shortcuts import render
+"""
+Vistas de lectura en JSON.
 
-# Create your views here.
+Son asíncronas y usan el ORM asíncrono (aget, acount, async for): con uvicorn un cliente
+lento no ocupa un hilo mientras espera. Siguen funcionando con WSGI, donde Django las
+ejecuta en su propio bucle de eventos.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Exists, OuterRef, Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_GET
+
+from recetario_app.config_cache import config_cache
+from recetario_app.export import FORMATS, aexport_lines, export_lines
+from recetario_app.models import Chef, Recipe, RecipeStats, Restaurant, menu_entries
+from recetario_app.pagination import InvalidPage, akeyset_page, parse_limit
+from recetario_app.serializers import chef_data, recipe_data, recipe_queryset, restaurant_data
+
+RECIPE_ORDER = ("preparation_time", "pk")
+CHEF_ORDER = ("pk",)
+
+
+def bad_request(message):
+    return JsonResponse({"error": message}, status=400)
+
+
+def int_param(request, name):
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidPage(f"{name} debe ser un entero") from None
+
+
+def filter_recipes(queryset, params):
+    """Filtros de ?specialty=, ?location=, ?min_time= y ?max_time="""
+    if params.get("specialty"):
+        queryset = queryset.filter(chef__specialty=params["specialty"])
+    if params.get("location"):
+        queryset = queryset.available_in(location=params["location"])
+    if params.get("min_time") is not None:
+        queryset = queryset.filter(preparation_time__gte=params["min_time"])
+    if params.get("max_time") is not None:
+        queryset = queryset.filter(preparation_time__lte=params["max_time"])
+    return queryset
+
+
+def recipe_params(request):
+    return {
+        "specialty": request.GET.get("specialty"),
+        "location": request.GET.get("location"),
+        "min_time": int_param(request, "min_time"),
+        "max_time": int_param(request, "max_time"),
+    }
+
+
+async def recipe_page(request, queryset):
+    queryset = filter_recipes(queryset, recipe_params(request))
+    recipes, next_cursor = await akeyset_page(
+        recipe_queryset(queryset), RECIPE_ORDER, request.GET.get("cursor"), parse_limit(request.GET.get("limit"))
+    )
+    return {"results": [recipe_data(recipe) for recipe in recipes], "next": next_cursor}
+
+
+@require_GET
+async def recipe_list(request):
+    try:
+        return JsonResponse(await recipe_page(request, Recipe.objects.all()))
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+
+
+@require_GET
+async def recipe_detail(request, pk):
+    recipe = await aget_object_or_404(recipe_queryset(), pk=pk)
+    return JsonResponse(recipe_data(recipe))
+
+
+@require_GET
+async def recipe_search(request):
+    """?q=palabras: búsqueda por título ordenada por relevancia (ver Recipe.objects.search)"""
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+    # search() comprueba la primera vez si existe la tabla FTS5, y eso no puede hacerse
+    # desde el bucle de eventos.
+    queryset = await sync_to_async(Recipe.objects.search)(request.GET.get("q", ""))
+    queryset = recipe_queryset(queryset)[:limit]
+    return JsonResponse({"results": [recipe_data(recipe) async for recipe in queryset]})
+
+
+@require_GET
+async def chef_list(request):
+    queryset = Chef.objects.all()
+    if request.GET.get("specialty"):
+        queryset = queryset.filter(specialty=request.GET["specialty"])
+    try:
+        chefs, next_cursor = await akeyset_page(
+            queryset, CHEF_ORDER, request.GET.get("cursor"), parse_limit(request.GET.get("limit"))
+        )
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+    return JsonResponse({"results": [chef_data(chef) for chef in chefs], "next": next_cursor})
+
+
+@require_GET
+async def chef_detail(request, pk):
+    chef = await aget_object_or_404(Chef, pk=pk)
+    try:
+        page = await recipe_page(request, Recipe.objects.filter(chef=chef))
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+    return JsonResponse({"chef": chef_data(chef), **page})
+
+
+@require_GET
+async def restaurant_detail(request, pk):
+    """Ficha del restaurante: configuración y totales de pedidos del menú"""
+    restaurant = await aget_object_or_404(Restaurant, pk=pk)
+    # Una detrás de otra: el ORM de Django ejecuta las consultas de una petición en un
+    # único hilo, así que lanzarlas con asyncio.gather no las solaparía.
+    config = await sync_to_async(config_cache.get)(restaurant.pk)
+    stats = await RecipeStats.objects.filter(recipe__restaurants=restaurant).aaggregate(
+        total_orders=Sum("total_orders"), positive_reviews=Sum("positive_reviews")
+    )
+    return JsonResponse({
+        "id": restaurant.pk,
+        "name": restaurant.name,
+        "location": restaurant.location,
+        "recipe_count": restaurant.recipe_count,
+        "settings": config,
+        "stats": stats,
+    })
+
+
+@require_GET
+async def restaurant_config(request, pk):
+    settings = await sync_to_async(config_cache.get)(pk)
+    if settings is None:
+        return JsonResponse({"error": "El restaurante no tiene configuración"}, status=404)
+    return JsonResponse({"restaurant": pk, "settings": settings})
+
+
+@require_GET
+async def restaurant_menu(request, pk):
+    restaurant = await aget_object_or_404(Restaurant.objects.select_related("restaurantconfig"), pk=pk)
+    try:
+        page = await recipe_page(request, Recipe.objects.filter(restaurants=restaurant))
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+    return JsonResponse({"restaurant": restaurant_data(restaurant), **page})
+
+
+def leaderboard_data(stats):
+    recipe = stats.recipe
+    return {
+        "recipe": {"id": recipe.pk, "title": recipe.title, "chef": chef_data(recipe.chef)},
+        "positive_percentage": stats.positive_percentage,
+        "total_orders": stats.total_orders,
+        "positive_reviews": stats.positive_reviews,
+    }
+
+
+async def leaderboard(request, queryset):
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+        min_orders = int_param(request, "min_orders")
+    except InvalidPage as exc:
+        return bad_request(str(exc))
+    if min_orders is not None:
+        queryset = queryset.filter(total_orders__gte=min_orders)
+    queryset = queryset.leaderboard().select_related("recipe__chef")[:limit]
+    return JsonResponse({"results": [leaderboard_data(stats) async for stats in queryset]})
+
+
+@require_GET
+async def specialty_leaderboard(request, specialty):
+    """Recetas mejor valoradas de los chefs de una especialidad"""
+    # Con EXISTS el planificador recorre el índice del porcentaje y comprueba la
+    # especialidad fila a fila; con un JOIN empieza por los chefs y ordena todas sus recetas.
+    recipes = Recipe.objects.filter(pk=OuterRef("recipe"), chef__specialty=specialty)
+    return await leaderboard(request, RecipeStats.objects.filter(Exists(recipes)))
+
+
+@require_GET
+async def location_leaderboard(request, location):
+    """Recetas mejor valoradas de los restaurantes de una ciudad"""
+    menus = menu_entries(location=location).filter(recipe=OuterRef("recipe"))
+    return await leaderboard(request, RecipeStats.objects.filter(Exists(menus)))
+
+
+@require_GET
+def export_recipes(request):
+    """Catálogo completo en streaming: ?format=ndjson (por defecto) o ?format=csv"""
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in FORMATS:
+        return bad_request(f"format debe ser uno de {', '.join(FORMATS)}")
+    # Cada servidor necesita su tipo de iterador: con el otro, Django lo consume entero en
+    # memoria antes de responder.
+    if isinstance(request, ASGIRequest):
+        lines = aexport_lines(export_format)
+    else:
+        lines = export_lines(export_format)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="recipes.{export_format}"'
+    return response
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_from_url, replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,14 +46,65 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'recetario_app.routers.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'recetario_app.querywatch.QueryWatchMiddleware',
 ]
 
+# Registro de consultas por petición y detección de N+1 (recetario_app/querywatch.py).
+# Se activa en staging con QUERY_WATCH=1.
+QUERY_WATCH = {
+    'ENABLED': os.environ.get('QUERY_WATCH') == '1',
+    'THRESHOLD': 5,
+    'BUDGET': None,
+    'RAISE': False,
+}
+
+# Caché de resultados de QuerySet.cached() (recetario_app/querycache.py). LocMemCache es
+# LRU y por proceso; con varios procesos usa p.ej.
+# QUERY_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# QUERY_CACHE_LOCATION=/var/tmp/recetario-querycache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'querycache': {
+        'BACKEND': os.environ.get('QUERY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('QUERY_CACHE_LOCATION', 'recetario-querycache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+QUERY_CACHE_ALIAS = 'querycache'
+# Segundos tras escribir en una tabla en los que los fallos de la caché de QuerySet se leen de la principal.
+QUERY_CACHE_REPLICA_LAG = 5
+
+# Caché en memoria de RestaurantConfig.settings por restaurante (recetario_app/config_cache.py).
+RESTAURANT_CONFIG_CACHE = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 60,
+    # Segundos tras invalidar una entrada en los que sus fallos se leen de la principal.
+    'REPLICA_LAG': 5,
+}
+
+# Búfer de los contadores de RecipeStats (recetario_app/counters.py).
+STATS_BUFFER = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 5.0,
+    'MAX_PENDING': 1000,
+}
+
+# Copia en columnas del catálogo para filtrar recetas en memoria (recetario_app/snapshot.py).
+CATALOG_SNAPSHOT = {
+    'MAX_AGE': 300,
+    'MAX_OVERLAY': 10000,
+}
+
 ROOT_URLCONF = 'sistema_gestion_restaurantes.urls'
 
 TEMPLATES = [
@@ -76,13 +130,18 @@ WSGI_APPLICATION = 'sistema_gestion_restaurantes.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DATABASE_URL (docker-compose.yml) o db.sqlite3 ajustada; ver database.py.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_url(os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'), BASE_DIR, os.environ),
 }
 
+# Réplicas de lectura (opcionales) y su peso; ver recetario_app/routers.py.
+REPLICA_DATABASES, DATABASE_REPLICA_WEIGHTS = replica_databases(
+    os.environ.get('DATABASE_REPLICA_URLS', ''), os.environ.get('DATABASE_REPLICA_WEIGHTS', ''), BASE_DIR, os.environ
+)
+DATABASES.update(REPLICA_DATABASES)
+DATABASE_ROUTERS = ['recetario_app.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators